@@ -0,0 +1,106 @@
+""" scriptable stand-in for edl.py / mtk.py / spd.py used by the benchmarks
+  copy it under the real tool's name: the name picks the command syntax and progress format
+  (edl/mtk print bkerler-style sector progress, spd prints "x/y MB" lines)
+
+  behaviour comes from the environment so the flash code runs it unchanged:
+    DEVTICAL_FAKE_LINES   progress lines per partition (default 50)
+    DEVTICAL_FAKE_LOG     extra plain log lines per partition (default 5)
+    DEVTICAL_FAKE_DELAY   seconds spent per partition, spread over the progress lines (default 0)
+    DEVTICAL_FAKE_FAIL    partition name that fails
+  images are read and discarded, so pipes from archives are drained like a real tool does
+"""
+import os
+import sys
+import time
+
+READ_SIZE = 1024 * 1024
+
+def env_number(name, default, kind=int):
+    try:
+        return kind(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+LINES = env_number("DEVTICAL_FAKE_LINES", 50)
+LOG_LINES = env_number("DEVTICAL_FAKE_LOG", 5)
+DELAY = env_number("DEVTICAL_FAKE_DELAY", 0.0, float)
+FAIL = os.environ.get("DEVTICAL_FAKE_FAIL", "")
+STYLE = "spd" if "spd" in os.path.basename(sys.argv[0]).lower() else "sector"
+
+def drain(path):
+    total = 0
+    try:
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(READ_SIZE)
+                if not chunk:
+                    break
+                total += len(chunk)
+    except OSError as e:
+        print(f"ERROR: cannot read {path}: {e}", flush=True)
+        return None
+    return total
+
+def progress_line(step, size):
+    done = size * step // LINES if LINES else size
+    percent = 100.0 * step / LINES if LINES else 100.0
+    if STYLE == "spd":
+        return f"Writing {done / 1048576:.2f}/{size / 1048576:.2f} MB ({percent:.1f}%) 24.0 MB/s"
+    sectors = max(1, size // 512)
+    return (f"Progress: |{'#' * int(percent // 10):<10}| {percent:.1f}% Write "
+            f"(Sector 0x{sectors * step // max(1, LINES):x} of 0x{sectors:x}) 24.0 MB/s")
+
+def write_partition(partition, path):
+    for i in range(LOG_LINES):
+        print(f"[{partition}] handshake step {i + 1}/{LOG_LINES}")
+    size = drain(path)
+    if size is None:
+        return False
+    pause = DELAY / LINES if LINES else 0
+    for step in range(1, LINES + 1):
+        if pause:
+            time.sleep(pause)
+        print(progress_line(step, size))
+    sys.stdout.flush()
+    if partition == FAIL:
+        print(f"ERROR: write to {partition} failed", flush=True)
+        return False
+    print(f"Wrote {size} bytes to {partition}", flush=True)
+    return True
+
+def handle(args):
+    """Run one command (edl/mtk: --flash/--erase/--read, spd: writepart/erasepart/readpart)"""
+    if not args:
+        return False
+    command = args[0].lstrip("-")
+    if command in ("flash", "writepart") and len(args) >= 3:
+        return write_partition(args[1], args[2])
+    if command in ("erase", "erasepart") and len(args) >= 2:
+        print(f"Erased {args[1]}", flush=True)
+        return args[1] != FAIL
+    if command in ("read", "readpart") and len(args) >= 3:
+        with open(args[2], "wb") as f:
+            f.write(b"\0" * 4096)
+        print(f"Read {args[1]}", flush=True)
+        return True
+    if command == "version":
+        print("fake_tool 1.0", flush=True)
+        return True
+    return False
+
+def main():
+    args = sys.argv[1:]
+    # Strip the port: edl/mtk take "--port PORT", spd takes the port as its first argument
+    if "--port" in args:
+        i = args.index("--port")
+        args = args[:i] + args[i + 2:]
+    elif STYLE == "spd" and args and not args[0].startswith("-"):
+        args = args[1:]
+    if "--session" in args:
+        for line in sys.stdin:
+            print("OK" if handle(line.split()) else "ERROR", flush=True)
+        return 0
+    return 0 if handle(args) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
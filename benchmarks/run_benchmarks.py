@@ -0,0 +1,426 @@
+""" devtical benchmark suite: measures devtical's own overhead with fake flashing tools
+  flash: FlashThread end to end (spawn, output parsing, signals, journal) for 1/10/100 partitions on
+         1/8 concurrent devices, with the GUI thread's timer latency sampled while it runs;
+         --driver core runs the Qt-free FlashOperation instead, like devtical-cli.py does
+  parse: ROMScraper page parsing on generated search-result and device pages and on the saved pages in
+         fixtures/, once per installed HTML backend (selectolax, lxml, html.parser) with the speedup
+         over html.parser
+
+  python benchmarks/run_benchmarks.py -o results.json
+  python benchmarks/run_benchmarks.py --quick --compare results.json
+  results are JSON so two runs can be compared; --compare exits 1 when a result regressed
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_FORMAT = "devtical-bench"
+RESULTS_VERSION = 1
+FAKE_TOOLS = {"qualcomm": ("edl_path", "edl.py"), "mtk": ("mtk_path", "mtk.py"),
+              "spreadtrum": ("spd_path", "spd.py")}
+# Metric compared between runs for each group; lower is better for all of them
+PRIMARY_METRICS = {"flash": "per_partition_ms", "parse": "ms_per_page"}
+LATENCY_PROBE_MS = 5
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+# Saved pages in fixtures/ are named after the parser they exercise
+PAGE_KINDS = ("search", "device", "mediafire")
+FLASH_TIMEOUT = 600
+
+class Workbench:
+    """Temporary HOME with fake tools, images and FDLs, so runs never touch ~/.devtical"""
+    def __init__(self, image_size):
+        self.root = tempfile.mkdtemp(prefix="devtical-bench-")
+        self.image_size = image_size
+        self.tools_dir = os.path.join(self.root, "tools")
+        self.images_dir = os.path.join(self.root, "images")
+        os.makedirs(self.tools_dir)
+        os.makedirs(self.images_dir)
+        for _, tool_name in FAKE_TOOLS.values():
+            shutil.copy(os.path.join(BENCH_DIR, "fake_tool.py"), os.path.join(self.tools_dir, tool_name))
+        self.fdl1 = self.write_file(os.path.join(self.root, "FDL1.bin"), 4096)
+        self.fdl2 = self.write_file(os.path.join(self.root, "FDL2.bin"), 4096)
+
+    def write_file(self, path, size):
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(os.urandom(min(size, 4096)) * (size // 4096) + os.urandom(size % 4096))
+        return path
+
+    def images(self, count):
+        return [(self.write_file(os.path.join(self.images_dir, f"part{i:03d}.img"), self.image_size), f"part{i:03d}")
+                for i in range(count)]
+
+    def tool_path(self, device_type):
+        return os.path.join(self.tools_dir, FAKE_TOOLS[device_type][1])
+
+    def settings(self, device_type, session):
+        from devtical_core import DEFAULT_SETTINGS
+        settings = dict(DEFAULT_SETTINGS)
+        for key, tool_name in FAKE_TOOLS.values():
+            settings[key] = os.path.join(self.tools_dir, tool_name)
+        settings.update({"backup_enable": False, "diff_flash": False, "sparse_convert": False})
+        if session:
+            settings["edl_session_cmd"] = settings["mtk_session_cmd"] = settings["spd_session_cmd"] = "--session"
+        else:
+            settings["session_enable"] = False
+        return settings
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+def tool_baseline_ms(bench, device_type, samples=5):
+    """Cost of one fake tool run without devtical in between, to separate its overhead"""
+    image_path, partition = bench.images(1)[0]
+    args = ["BENCH0", "writepart", partition, image_path] if device_type == "spreadtrum" else \
+           ["--port", "BENCH0", "--flash", partition, image_path]
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        subprocess.run(["python", bench.tool_path(device_type)] + args, stdout=subprocess.DEVNULL, check=False)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def run_flash(bench, device_type, partitions, devices, session):
+    """One FlashThread per device, all started together, until every one reports finished"""
+    from PySide6.QtCore import Qt, QTimer
+    from PySide6.QtWidgets import QApplication
+    import main
+    from devtical_core import job_journal
+
+    app = QApplication.instance() or QApplication([])
+    settings = bench.settings(device_type, session)
+    files = bench.images(partitions)
+    counts = {"log_lines": 0, "transfer_events": 0, "finished": 0, "failed": 0}
+    lateness = []
+    views, bars, threads = [], [], []
+
+    for device in range(devices):
+        thread = main.FlashThread(device_type, files, f"BENCH{device}", "flash", settings)
+        if device_type == "spreadtrum":
+            thread.set_fdl_files(bench.fdl1, bench.fdl2)
+        if settings.get("journal_enable", True):
+            thread.set_journal(job_journal())
+        # Same receivers as the main window and station mode
+        view = main.LogView(int(settings["log_max_lines"]), f"bench-{device}")
+        bar = main.ModernProgressBar()
+        thread.log_signal.connect(view.append, Qt.DirectConnection)
+        thread.transfer_signal.connect(bar.set_transfer)
+        thread.progress_signal.connect(bar.setValue)
+        def count_log(_, counts=counts):
+            counts["log_lines"] += 1
+        def count_transfer(_, counts=counts):
+            counts["transfer_events"] += 1
+        def on_finished(success, _, counts=counts):
+            counts["finished"] += 1
+            counts["failed"] += 0 if success else 1
+            if counts["finished"] == devices:
+                app.quit()
+        thread.log_signal.connect(count_log, Qt.DirectConnection)
+        thread.transfer_signal.connect(count_transfer)
+        thread.finished_signal.connect(on_finished)
+        views.append(view)
+        bars.append(bar)
+        threads.append(thread)
+
+    probe = QTimer()
+    probe.setInterval(LATENCY_PROBE_MS)
+    last = [time.perf_counter()]
+    def sample():
+        now = time.perf_counter()
+        lateness.append(max(0.0, (now - last[0]) * 1000 - LATENCY_PROBE_MS))
+        last[0] = now
+    probe.timeout.connect(sample)
+    timeout = QTimer()
+    timeout.setSingleShot(True)
+    timeout.timeout.connect(app.quit)
+    timeout.start(FLASH_TIMEOUT * 1000)
+
+    started = time.perf_counter()
+    probe.start()
+    for thread in threads:
+        thread.start()
+    app.exec()
+    wall = time.perf_counter() - started
+    probe.stop()
+    timeout.stop()
+    for thread in threads:
+        thread.stop()
+        thread.wait()
+    for view in views:
+        view.flush()
+        if view.spill_file:
+            view.spill_file.close()
+
+    return {
+        "wall_s": round(wall, 4),
+        "per_partition_ms": round(wall * 1000 / partitions, 3),
+        "log_lines": counts["log_lines"],
+        "transfer_events": counts["transfer_events"],
+        "events_per_s": round((counts["log_lines"] + counts["transfer_events"]) / wall, 1) if wall else 0.0,
+        "gui_latency_p50_ms": round(percentile(lateness, 0.5), 3),
+        "gui_latency_p95_ms": round(percentile(lateness, 0.95), 3),
+        "gui_latency_max_ms": round(max(lateness, default=0.0), 3),
+        "failed_devices": counts["failed"] + devices - counts["finished"],
+    }
+
+def run_flash_core(bench, device_type, partitions, devices, session):
+    """Same as run_flash() with FlashOperation on plain threads, without Qt"""
+    from devtical_core import FlashOperation, job_journal
+
+    settings = bench.settings(device_type, session)
+    files = bench.images(partitions)
+    lock = threading.Lock()
+    counts = {"log_lines": 0, "transfer_events": 0, "failed": 0}
+    def count(key, _):
+        with lock:
+            counts[key] += 1
+    def on_finished(success, _):
+        if not success:
+            with lock:
+                counts["failed"] += 1
+
+    workers = []
+    for device in range(devices):
+        operation = FlashOperation(device_type, files, f"BENCH{device}", "flash", settings)
+        if device_type == "spreadtrum":
+            operation.set_fdl_files(bench.fdl1, bench.fdl2)
+        if settings.get("journal_enable", True):
+            operation.set_journal(job_journal())
+        operation.log_signal.connect(lambda message: count("log_lines", message))
+        operation.transfer_signal.connect(lambda transfer: count("transfer_events", transfer))
+        operation.finished_signal.connect(on_finished)
+        workers.append(threading.Thread(target=operation.run))
+
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(FLASH_TIMEOUT)
+    wall = time.perf_counter() - started
+    return {
+        "wall_s": round(wall, 4),
+        "per_partition_ms": round(wall * 1000 / partitions, 3),
+        "log_lines": counts["log_lines"],
+        "transfer_events": counts["transfer_events"],
+        "events_per_s": round((counts["log_lines"] + counts["transfer_events"]) / wall, 1) if wall else 0.0,
+        "failed_devices": counts["failed"],
+    }
+
+def search_page(posts):
+    cards = "".join(
+        f'<div class="fa-grid-post-column-bg"><img src="/t/{i}.jpg"><h3 class="fa-grid-post-heading">'
+        f'<a href="https://firmwarefile.com/device-{i}">Device {i} Stock Firmware</a></h3><p>{"lorem ipsum " * 20}</p></div>'
+        for i in range(posts))
+    pages = "".join(f'<a class="page" href="https://firmwarefile.com/page/{n}?s=bench">{n}</a>' for n in range(2, 8))
+    return f"<html><head><title>bench</title></head><body>{cards}<nav>{pages}</nav></body></html>"
+
+def device_page(links):
+    hosts = ["https://drive.google.com/file/d/{}AbC_-/view", "https://www.mediafire.com/file/{}/rom.zip",
+             "https://mega.nz/file/{}#key", "https://firmwarefile.com/related-{}"]
+    body = "".join(f'<p>{"firmware notes " * 10}<a href="{hosts[i % len(hosts)].format(i)}">Download {i}</a></p>'
+                   for i in range(links))
+    return (f"<html><head><title>Bench Device Flash File</title></head><body><div id=\"article-block\">"
+            f"<h2>Bench Device Stock Firmware</h2><strong>Flash File</strong>{body}</div></body></html>")
+
+def load_scraper():
+    spec = importlib.util.spec_from_file_location("rom_scraper", os.path.join(ROOT, "minimal-RomScarper.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def parse_cases():
+    """(name, page kind, content) for the generated pages and every saved page in fixtures/"""
+    cases = [(f"{kind}/{size}", kind, page(size).encode("utf-8"))
+             for kind, page, size in (("search", search_page, 20), ("search", search_page, 200),
+                                      ("device", device_page, 50), ("device", device_page, 500))]
+    for file_name in sorted(os.listdir(FIXTURES_DIR)):
+        kind, ext = os.path.splitext(file_name)
+        if ext == ".html" and kind in PAGE_KINDS:
+            with open(os.path.join(FIXTURES_DIR, file_name), "rb") as f:
+                cases.append((f"fixture/{kind}", kind, f.read()))
+    return cases
+
+def run_parse(scraper, kind, content, rounds):
+    if kind == "search":
+        parse = lambda: scraper.parse_device_links(content)
+    elif kind == "device":
+        parse = lambda: scraper.parse_download_links(content, "https://firmwarefile.com/device-1")
+    else:
+        text = content.decode("utf-8")
+        parse = lambda: [scraper.parse_mediafire_direct_url(text)]
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        found = len(parse())
+        for _ in range(rounds):
+            started = time.perf_counter()
+            parse()
+            timings.append((time.perf_counter() - started) * 1000)
+    return {"ms_per_page": round(statistics.median(timings), 3), "min_ms": round(min(timings), 3),
+            "items_per_page": found}
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path, threshold):
+    """Print the change of each primary metric against a saved run; returns the number of regressions"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("format") != RESULTS_FORMAT:
+        print(f"{baseline_path} is not a devtical benchmark result", file=sys.stderr)
+        return 0
+    previous = {entry["id"]: entry for entry in baseline.get("results", [])}
+    regressions = 0
+    print(f"\n{'benchmark':<48} {'metric':<18} {'before':>10} {'after':>10} {'change':>8}")
+    for entry in results["results"]:
+        metric = PRIMARY_METRICS[entry["group"]]
+        old = previous.get(entry["id"], {}).get("metrics", {}).get(metric)
+        new = entry["metrics"].get(metric)
+        if not old or new is None:
+            print(f"{entry['id']:<48} {metric:<18} {'-':>10} {new:>10}")
+            continue
+        change = (new - old) * 100.0 / old
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{entry['id']:<48} {metric:<18} {old:>10} {new:>10} {change:>+7.1f}%{flag}")
+    return regressions
+
+def parse_list(text, kind=int):
+    return [kind(item) for item in text.split(",") if item.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description='devtical benchmark suite')
+    parser.add_argument('-o', '--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', metavar='JSON', help='Compare with an earlier results file')
+    parser.add_argument('--threshold', type=float, default=20.0,
+                       help='Percent slowdown reported as a regression (default: 20)')
+    parser.add_argument('--partitions', default='1,10,100', help='Partition counts (default: 1,10,100)')
+    parser.add_argument('--devices', default='1,8', help='Concurrent device counts (default: 1,8)')
+    parser.add_argument('--device-types', default='qualcomm',
+                       help='Comma separated from qualcomm, mtk, spreadtrum (default: qualcomm)')
+    parser.add_argument('--session', action='store_true',
+                       help='Also run every flash benchmark through a persistent tool session')
+    parser.add_argument('--driver', choices=('qt', 'core'), default='qt',
+                       help='qt: FlashThread with GUI receivers (default), core: FlashOperation without Qt')
+    parser.add_argument('--lines', type=int, default=50, help='Progress lines the fake tool prints per partition')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds the fake tool spends per partition')
+    parser.add_argument('--image-size', type=int, default=256 * 1024, help='Bytes per fake image')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per flash benchmark, the median is kept')
+    parser.add_argument('--parse-rounds', type=int, default=20, help='Parses per scraper benchmark')
+    parser.add_argument('--html-parsers', help='Comma separated HTML backends to time (default: all installed)')
+    parser.add_argument('--only', choices=('flash', 'parse'), help='Run one group only')
+    parser.add_argument('--quick', action='store_true', help='Small matrix for a fast smoke run')
+
+    args = parser.parse_args()
+    if args.quick:
+        args.partitions, args.devices, args.repeat, args.parse_rounds = '1,10', '1', 1, 5
+
+    bench = Workbench(args.image_size)
+    # Journal, hash cache, tool cache and log spill all go to the throwaway HOME
+    os.environ["HOME"] = bench.root
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    os.environ.update({"DEVTICAL_FAKE_LINES": str(args.lines), "DEVTICAL_FAKE_DELAY": str(args.delay)})
+    sys.path.insert(0, ROOT)
+
+    results = {
+        "format": RESULTS_FORMAT,
+        "version": RESULTS_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git": git_revision(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count()},
+        "config": {"driver": args.driver, "lines": args.lines, "delay": args.delay, "image_size": args.image_size,
+                   "repeat": args.repeat, "parse_rounds": args.parse_rounds},
+        "results": [],
+    }
+    try:
+        if args.only != 'parse':
+            flash = run_flash if args.driver == 'qt' else run_flash_core
+            for device_type in parse_list(args.device_types, str):
+                baseline = tool_baseline_ms(bench, device_type)
+                for session in ([False, True] if args.session else [False]):
+                    for devices in parse_list(args.devices):
+                        for partitions in parse_list(args.partitions):
+                            mode = "session" if session else "spawn"
+                            runs = [flash(bench, device_type, partitions, devices, session)
+                                    for _ in range(max(1, args.repeat))]
+                            metrics = dict(sorted(runs, key=lambda run: run["wall_s"])[len(runs) // 2])
+                            metrics["tool_baseline_ms"] = round(baseline, 3)
+                            metrics["overhead_ms"] = round(metrics["per_partition_ms"] - baseline, 3)
+                            entry = {"id": f"flash/{args.driver}/{device_type}/{mode}/p{partitions}/d{devices}",
+                                     "group": "flash",
+                                     "params": {"driver": args.driver, "device_type": device_type, "mode": mode,
+                                                "partitions": partitions, "devices": devices},
+                                     "metrics": metrics}
+                            results["results"].append(entry)
+                            latency = f"  gui p95 {metrics['gui_latency_p95_ms']:.1f} ms" \
+                                if "gui_latency_p95_ms" in metrics else ""
+                            print(f"{entry['id']:<48} {metrics['per_partition_ms']:>9.1f} ms/partition "
+                                  f"(tool {baseline:.1f}){latency}  {metrics['events_per_s']:.0f} events/s", flush=True)
+        if args.only != 'flash':
+            try:
+                importlib.import_module("bs4")
+            except ImportError:
+                print("⚠️ beautifulsoup4 not installed, skipping the scraper benchmarks")
+            else:
+                scraper_module = load_scraper()
+                backends = parse_list(args.html_parsers, str) if args.html_parsers else scraper_module.HTML_BACKENDS
+                for name, kind, content in parse_cases():
+                    reference = None
+                    for backend in backends:
+                        scraper = scraper_module.ROMScraper(base_delay=0, html_backend=backend)
+                        metrics = run_parse(scraper, kind, content, args.parse_rounds)
+                        if backend == "html.parser":
+                            reference = metrics["ms_per_page"]
+                        entry = {"id": f"parse/{backend}/{name}", "group": "parse",
+                                 "params": {"backend": backend, "page": kind, "case": name,
+                                            "bytes": len(content)},
+                                 "metrics": metrics}
+                        results["results"].append(entry)
+                    # Backends are timed before html.parser, so the speedup is filled in afterwards
+                    for entry in results["results"][-len(backends):]:
+                        if reference and entry["metrics"]["ms_per_page"]:
+                            entry["metrics"]["speedup"] = round(reference / entry["metrics"]["ms_per_page"], 2)
+                        speedup = f"  x{entry['metrics']['speedup']:.1f} vs html.parser" \
+                            if "speedup" in entry["metrics"] else ""
+                        print(f"{entry['id']:<48} {entry['metrics']['ms_per_page']:>9.2f} ms/page{speedup}", flush=True)
+    finally:
+        bench.cleanup()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"❌ {regressions} benchmark(s) slower by more than {args.threshold:.0f}%")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+""" headless devtical: run a flash / FRP job file without the Qt UI
+  job files are JSON (or YAML when PyYAML is installed) and progress is reported as JSON lines on stdout
+
+  example job:
+    {
+      "device": "qualcomm",
+      "port": "/dev/ttyUSB0",
+      "operation": "flash",
+      "images": [{"file": "boot.img", "partition": "boot"}, "system.img"],
+      "settings": {"backup_enable": false}
+    }
+  use "firmware": "package_dir" (or a .zip / .tar / .7z / .pac) instead of "images" to flash the
+  package's rawprogram / scatter layout; single archive members are written as "rom.zip::boot.img"
+
+  flash jobs are journaled in ~/.devtical/jobs.sqlite: --jobs lists unfinished ones and
+  --resume ID continues one from its first incomplete partition
+"""
+import argparse
+import glob
+import json
+import os
+import signal
+import sqlite3
+import sys
+import time
+
+from devtical_core import (DEFAULT_SETTINGS, HashCache, FlashOperation, check_image,
+                           classify_device, describe_job, firmware_entry_path, index_firmware, job_journal,
+                           load_manifest, split_member_path, enumerate_ports, PortMonitor)
+
+OPERATIONS = ("flash", "frp", "advance_frp")
+
+class JobError(Exception):
+    pass
+
+def load_job(job_path):
+    """Read a job file and resolve image paths relative to it"""
+    with open(job_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if job_path.lower().endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise JobError("PyYAML is required for YAML job files (pip install pyyaml)")
+        job = yaml.safe_load(text)
+    else:
+        job = json.loads(text)
+    if not isinstance(job, dict):
+        raise JobError("Job file must contain a mapping")
+
+    base_dir = os.path.dirname(os.path.abspath(job_path))
+    def resolve(path):
+        return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+    if not job.get("port"):
+        raise JobError("Job is missing 'port'")
+    job["operation"] = job.get("operation", "flash")
+    if job["operation"] not in OPERATIONS:
+        raise JobError(f"Unknown operation: {job['operation']} (expected one of {', '.join(OPERATIONS)})")
+    if not job.get("device"):
+        # Same VID/PID lookup and heuristics as the GUI
+        port = next((p for p in enumerate_ports() if p["device"] == job["port"]), None)
+        description = job.get("port_description") or (port["description"] if port else "")
+        job["device"], _ = classify_device(f"{job['port']} - {description}", port)
+
+    images = job.get("images", [])
+    if not images and job.get("firmware"):
+        # Partition map from the package's rawprogram/scatter/PAC layout
+        firmware = resolve(job["firmware"])
+        index = index_firmware(firmware)
+        images = [{"file": firmware_entry_path(firmware, entry), "partition": entry["partition"]}
+                  for entry in index["partitions"] if not entry["missing"]]
+    if isinstance(images, str):
+        images = sorted(glob.glob(resolve(images)))
+    files = []
+    for image in images:
+        if isinstance(image, str):
+            image = {"file": image}
+        file_path = resolve(image["file"])
+        partition = image.get("partition") or os.path.basename(file_path).replace('.img', '')
+        if not os.path.isfile(split_member_path(file_path)[0]):
+            raise JobError(f"Image not found: {file_path}")
+        files.append((file_path, partition))
+    if job["operation"] == "flash" and not files:
+        raise JobError("Flash job has no images")
+    job["files"] = files
+
+    for key in ("fdl1", "fdl2", "pac"):
+        if job.get(key):
+            job[key] = resolve(job[key])
+    return job
+
+def load_resume_job(journal, job_id, port=None):
+    """Job dict for an unfinished journal entry, shaped like load_job()'s result"""
+    entry = journal.get_job(job_id)
+    if entry is None:
+        raise JobError(f"No journaled job #{job_id}")
+    if entry["status"] == "completed":
+        raise JobError(f"Job #{job_id} already completed")
+    if journal.is_live(entry):
+        raise JobError(f"Job #{job_id} is still running")
+    # The device may come back on a different port after a cable drop
+    return {"device": entry["device_type"], "port": port or entry["com_port"], "operation": entry["operation"],
+            "files": entry["files"], "fdl1": entry["fdl1"], "fdl2": entry["fdl2"], "pac": entry["pac"]}
+
+def load_settings(settings_path, overrides):
+    settings = dict(DEFAULT_SETTINGS)
+    if settings_path:
+        with open(settings_path, "r", encoding="utf-8") as f:
+            settings.update(json.load(f))
+    settings.update(overrides or {})
+    return settings
+
+def emit(event, **fields):
+    record = {"event": event, "time": round(time.time(), 3)}
+    record.update(fields)
+    sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+def verify_images(files):
+    """Hash images against any manifest next to them. Returns the damaged ones."""
+    hash_cache = HashCache()
+    manifests = {}
+    bad = []
+    for file_path, _ in files:
+        directory = os.path.dirname(file_path)
+        if directory not in manifests:
+            manifests[directory] = load_manifest(directory)
+        status, digest = check_image(file_path, manifests[directory], hash_cache)
+        emit("hash", file=file_path, status=status, sha256=digest)
+        if status in ("mismatch", "truncated"):
+            bad.append(file_path)
+    hash_cache.save()
+    return bad
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless devtical flasher')
+    parser.add_argument('job', nargs='?', help='Job file (JSON, or YAML with PyYAML installed)')
+    parser.add_argument('-s', '--settings',
+                       help='JSON file with tool settings (defaults match the GUI)')
+    parser.add_argument('--no-verify', action='store_true',
+                       help='Skip checking images against their checksum manifest')
+    parser.add_argument('-w', '--wait', type=int, metavar='SECONDS',
+                       help='Wait up to SECONDS for the port to appear before starting')
+    parser.add_argument('--jobs', action='store_true',
+                       help='List unfinished journaled flash jobs and exit')
+    parser.add_argument('--resume', type=int, metavar='ID',
+                       help='Resume journaled job ID from its first incomplete partition')
+    parser.add_argument('-p', '--port',
+                       help='Port to use with --resume (defaults to the journaled one)')
+
+    args = parser.parse_args()
+    if not args.job and not args.jobs and args.resume is None:
+        parser.error("a job file, --jobs or --resume is required")
+
+    try:
+        journal = job_journal()
+    except (OSError, sqlite3.Error) as e:
+        journal = None
+        emit("log", message=f"⚠️ Job journal unavailable: {e}")
+    if args.jobs:
+        for entry in journal.incomplete_jobs() if journal else []:
+            emit("job", id=entry["id"], status=entry["status"], device=entry["device_type"],
+                 port=entry["com_port"], done=entry["done"] or 0, total=entry["total"],
+                 summary=describe_job(entry))
+        return 0
+
+    try:
+        if args.resume is not None:
+            if journal is None:
+                raise JobError("Cannot resume without the job journal")
+            job = load_resume_job(journal, args.resume, args.port)
+            settings = load_settings(args.settings, None)
+        else:
+            job = load_job(args.job)
+            settings = load_settings(args.settings, job.get("settings"))
+    except (OSError, ValueError, JobError) as e:
+        emit("finished", success=False, message=str(e))
+        return 1
+
+    if job["files"] and not args.no_verify:
+        bad = verify_images(job["files"])
+        if bad:
+            emit("finished", success=False,
+                 message="Images do not match their checksum or are truncated: " +
+                         ", ".join(os.path.basename(path) for path in bad))
+            return 1
+
+    operation = FlashOperation(job["device"], job["files"], job["port"], job["operation"], settings)
+    if job.get("fdl1") or job.get("fdl2"):
+        operation.set_fdl_files(job.get("fdl1"), job.get("fdl2"))
+    if job.get("pac"):
+        operation.set_pac_file(job["pac"])
+    if journal and (settings.get("journal_enable", True) or args.resume is not None):
+        operation.set_journal(journal, args.resume)
+    monitor = None
+    if args.wait:
+        # Wait for the port (e.g. a device rebooting into EDL) instead of failing on a missing port
+        settings["port_wait_timeout"] = args.wait
+        monitor = PortMonitor()
+        monitor.log_signal.connect(lambda message: emit("log", message=message))
+        monitor.port_added.connect(lambda port: emit("port_added", **port))
+        monitor.port_removed.connect(lambda port: emit("port_removed", **port))
+        monitor.start()
+        operation.set_device_table(monitor.table)
+
+    result = {"success": False, "message": "Operation did not report a result"}
+    def on_finished(success, message):
+        result["success"] = success
+        result["message"] = message
+
+    operation.log_signal.connect(lambda message: emit("log", message=message))
+    operation.progress_signal.connect(lambda value: emit("progress", value=value))
+    operation.transfer_signal.connect(
+        lambda transfer: emit("transfer", **{k: v for k, v in transfer.items() if k != "event"}))
+    operation.operation_started.connect(lambda name: emit("started", operation=name))
+    operation.finished_signal.connect(on_finished)
+
+    signal.signal(signal.SIGINT, lambda signum, frame: operation.stop())
+    operation.run()
+    if monitor:
+        monitor.stop()
+    if operation.job_id:
+        result["job"] = operation.job_id
+    emit("finished", **result)
+    return 0 if result["success"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
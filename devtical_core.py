@@ -0,0 +1,3014 @@
+"""devtical core: Qt-free flashing logic shared by the GUI (main.py) and the
+headless CLI (devtical-cli.py).
+
+Nothing in this module may import Qt; the CLI relies on it to start fast
+on machines without a display.
+"""
+import os
+import subprocess
+import threading
+import json
+import re
+import queue
+import struct
+import tempfile
+import hashlib
+import mmap
+import time
+import zlib
+import codecs
+import selectors
+import socket
+import errno
+import io
+import posixpath
+import shutil
+import sqlite3
+import tarfile
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_SETTINGS = {
+    "mtk_path": "mtk.py",
+    "edl_path": "edl.py",
+    "avb_path": "avbtool",
+    "backup_dir": "",
+    "flash_cmd": "--flash {partition} {file}",
+    "erase_cmd": "--erase {partition}",
+    "read_cmd": "--read {partition} {file}",
+    "patch_cmd": "patch_vbmeta --input {input} --output {output}",
+    "basic_frp_partitions": "frp,metadata,userdata",
+    "advanced_frp_partitions": "frp,metadata,userdata,persist",
+    "dark_mode": False,
+    "backup_enable": True,
+    "auto_detect": True,
+    "sparse_convert": False,
+    "diff_flash": False,
+    # Device types whose flash tool reads images front to back without seeking;
+    # only these are fed archive members through a FIFO instead of a temp file
+    "archive_stream_types": "",
+    "journal_enable": True,
+    "port_wait_timeout": 30,
+    "log_max_lines": 5000,
+    # SPD Client
+    "spd_path": "spd.py",
+    "spd_flash_cmd": "writepart {partition} {file} --fdl1 {fdl1} --fdl2 {fdl2}",
+    "spd_erase_cmd": "erasepart {partition} --fdl1 {fdl1} --fdl2 {fdl2}",
+    "spd_read_cmd": "readpart {partition} {file} --fdl1 {fdl1} --fdl2 {fdl2}",
+    "spd_extract_cmd": "extractpac {pac_file}",
+    "spd_adv_frp_cmd": "writepart {partition} zero.bin --fdl1 {fdl1} --fdl2 {fdl2}",
+    # XYN Client
+    "xyn_path": "xyn_cli.py",
+    "xyn_flash_cmd": "write {partition} {file}",
+    "xyn_erase_cmd": "erase {partition} --force",
+    "xyn_read_cmd": "read {partition} {file}",
+    "xyn_detect_cmd": "detect",
+    "xyn_partitions_cmd": "partitions",
+    "xyn_adv_frp_cmd": "erase {partition} --force",
+    # Tool sessions
+    "session_enable": True,
+    "edl_session_cmd": "",
+    "mtk_session_cmd": "",
+    "spd_session_cmd": "",
+    "xyn_session_cmd": "",
+    "session_ok_pattern": r"^(OK|DONE)\b",
+    "session_error_pattern": r"^(ERR|ERROR|FAIL)",
+    # Differential flashing
+    "edl_hash_cmd": "",
+    "mtk_hash_cmd": "",
+    "spd_hash_cmd": "",
+    "xyn_hash_cmd": "",
+    # Station mode
+    "station_max_parallel": 4
+}
+
+class Event:
+    """Minimal stand-in for a Qt signal: connect() callbacks, emit() calls them in order"""
+    def __init__(self):
+        self.callbacks = []
+
+    def connect(self, callback):
+        self.callbacks.append(callback)
+
+    def emit(self, *args):
+        for callback in self.callbacks:
+            callback(*args)
+
+SPARSE_MAGIC = 0xED26FF3A
+SPARSE_HEADER = struct.Struct("<IHHHHIIII")
+SPARSE_CHUNK = struct.Struct("<HHII")
+CHUNK_TYPE_RAW = 0xCAC1
+CHUNK_TYPE_FILL = 0xCAC2
+CHUNK_TYPE_DONT_CARE = 0xCAC3
+CHUNK_TYPE_CRC32 = 0xCAC4
+
+SPARSE_BLOCK_SIZE = 4096
+SPARSE_MIN_SIZE = 16 * 1024 * 1024
+SPARSE_MIN_ZERO_RATIO = 0.5
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+def format_size(size):
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024.0:
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} TB"
+
+def read_sparse_info(file_path):
+    """Parse an Android sparse image header and chunk table.
+
+    Returns None for raw images, otherwise a dict with the block size,
+    expanded size, bytes of real data (raw and fill chunks) and whether
+    the chunk table runs past the end of the file.
+    """
+    with open(file_path, 'rb') as f:
+        header = f.read(SPARSE_HEADER.size)
+        if len(header) < SPARSE_HEADER.size:
+            return None
+        (magic, major, minor, file_hdr_sz, chunk_hdr_sz,
+         blk_sz, total_blks, total_chunks, _) = SPARSE_HEADER.unpack(header)
+        if magic != SPARSE_MAGIC or major != 1:
+            return None
+            
+        file_size = os.fstat(f.fileno()).st_size
+        offset = file_hdr_sz
+        data_blocks = 0
+        truncated = False
+        for _ in range(total_chunks):
+            f.seek(offset)
+            chunk = f.read(SPARSE_CHUNK.size)
+            if len(chunk) < SPARSE_CHUNK.size:
+                truncated = True
+                break
+            chunk_type, _, chunk_sz, total_sz = SPARSE_CHUNK.unpack(chunk)
+            if chunk_type in (CHUNK_TYPE_RAW, CHUNK_TYPE_FILL):
+                data_blocks += chunk_sz
+            offset += total_sz
+            if offset > file_size:
+                truncated = True
+                break
+                
+    return {
+        "block_size": blk_sz,
+        "total_chunks": total_chunks,
+        "expanded_size": blk_sz * total_blks,
+        "data_size": blk_sz * data_blocks,
+        "truncated": truncated
+    }
+
+def estimate_zero_ratio(file_path, block_size=4096, samples=256):
+    """Estimate the fraction of all-zero blocks by sampling evenly across the file"""
+    size = os.path.getsize(file_path)
+    blocks = size // block_size
+    if blocks == 0:
+        return 0.0
+    zero_block = bytes(block_size)
+    step = max(1, blocks // samples)
+    checked = zeros = 0
+    with open(file_path, 'rb') as f:
+        for block in range(0, blocks, step):
+            f.seek(block * block_size)
+            checked += 1
+            if f.read(block_size) == zero_block:
+                zeros += 1
+    return zeros / checked
+
+def scan_sparse_runs(file_path, block_size=4096, buffer_size=4 * 1024 * 1024):
+    """Split a raw image into runs of (chunk_type, first_block, block_count)"""
+    zero_block = bytes(block_size)
+    zero_buffer = bytes(buffer_size)
+    runs = []
+    block = 0
+    
+    def add(chunk_type, count):
+        if runs and runs[-1][0] == chunk_type:
+            runs[-1][2] += count
+        else:
+            runs.append([chunk_type, block, count])
+    
+    with open(file_path, 'rb') as f:
+        while True:
+            data = f.read(buffer_size)
+            if not data:
+                break
+            if len(data) == buffer_size and data == zero_buffer:
+                add(CHUNK_TYPE_DONT_CARE, buffer_size // block_size)
+                block += buffer_size // block_size
+                continue
+            view = memoryview(data)
+            for start in range(0, len(data), block_size):
+                is_zero = view[start:start + block_size] == zero_block
+                add(CHUNK_TYPE_DONT_CARE if is_zero else CHUNK_TYPE_RAW, 1)
+                block += 1
+    return runs
+
+def iter_sparse_image(file_path, block_size=4096, buffer_size=4 * 1024 * 1024):
+    """Stream a raw image as an Android sparse image, skipping all-zero blocks.
+
+    The image size must be a multiple of block_size. Yields bytes objects.
+    """
+    runs = scan_sparse_runs(file_path, block_size, buffer_size)
+    total_blocks = sum(run[2] for run in runs)
+    yield SPARSE_HEADER.pack(SPARSE_MAGIC, 1, 0, SPARSE_HEADER.size, SPARSE_CHUNK.size,
+                             block_size, total_blocks, len(runs), 0)
+    with open(file_path, 'rb') as f:
+        for chunk_type, first_block, count in runs:
+            if chunk_type == CHUNK_TYPE_DONT_CARE:
+                yield SPARSE_CHUNK.pack(chunk_type, 0, count, SPARSE_CHUNK.size)
+                continue
+            yield SPARSE_CHUNK.pack(chunk_type, 0, count, SPARSE_CHUNK.size + count * block_size)
+            f.seek(first_block * block_size)
+            remaining = count * block_size
+            while remaining:
+                data = f.read(min(buffer_size, remaining))
+                if not data:
+                    raise IOError(f"Unexpected end of image: {file_path}")
+                remaining -= len(data)
+                yield data
+
+def sparse_matches_raw(sparse_path, raw_path, buffer_size=4 * 1024 * 1024):
+    """Check that a raw dump holds every raw and fill chunk of a sparse image.
+
+    Don't-care chunks are not written by the flash, so they are not compared.
+    """
+    with open(sparse_path, 'rb') as sparse, open(raw_path, 'rb') as raw:
+        (_, _, _, file_hdr_sz, _, blk_sz, _, total_chunks, _) = SPARSE_HEADER.unpack(sparse.read(SPARSE_HEADER.size))
+        sparse.seek(file_hdr_sz)
+        offset = 0
+        for _ in range(total_chunks):
+            chunk_type, _, chunk_sz, total_sz = SPARSE_CHUNK.unpack(sparse.read(SPARSE_CHUNK.size))
+            length = chunk_sz * blk_sz
+            if chunk_type == CHUNK_TYPE_RAW:
+                raw.seek(offset)
+                remaining = length
+                while remaining:
+                    expected = sparse.read(min(buffer_size, remaining))
+                    if not expected or raw.read(len(expected)) != expected:
+                        return False
+                    remaining -= len(expected)
+            elif chunk_type == CHUNK_TYPE_FILL:
+                fill = sparse.read(4)
+                pattern = fill * (blk_sz // 4)
+                raw.seek(offset)
+                for _ in range(chunk_sz):
+                    if raw.read(blk_sz) != pattern:
+                        return False
+            else:
+                sparse.seek(total_sz - SPARSE_CHUNK.size, os.SEEK_CUR)
+            offset += length
+    return True
+
+def write_sparse_image(file_path, output_path, block_size=4096):
+    """Convert a raw image to a sparse image file, returning the written size"""
+    written = 0
+    with open(output_path, 'wb') as out:
+        for data in iter_sparse_image(file_path, block_size):
+            out.write(data)
+            written += len(data)
+    return written
+
+HASH_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".devtical", "hash_cache.json")
+HASH_READ_SIZE = 8 * 1024 * 1024
+MANIFEST_NAMES = ("SHA256SUMS", "SHA1SUMS", "MD5SUMS", "checksums.txt")
+MANIFEST_SUFFIXES = (".sha256", ".sha1", ".md5")
+DIGEST_ALGORITHMS = {32: "md5", 40: "sha1", 64: "sha256"}
+
+def hash_file(file_path, algorithms=("sha256",), length=None):
+    """Hash a file (or its first length bytes) in one pass over an mmap, returning {algorithm: hexdigest}"""
+    hashers = {name: hashlib.new(name) for name in algorithms}
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if length is not None:
+            size = min(size, length)
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, size, HASH_READ_SIZE):
+                        block = view[offset:offset + HASH_READ_SIZE]
+                        for hasher in hashers.values():
+                            hasher.update(block)
+                        block.release()
+                finally:
+                    view.release()
+    return {name: hasher.hexdigest() for name, hasher in hashers.items()}
+
+def load_manifest(directory):
+    """Collect expected digests from checksum files in a directory.
+
+    Understands the "<hexdigest>  <filename>" format written by sha256sum,
+    sha1sum and md5sum. Returns {filename: (algorithm, hexdigest)}.
+    """
+    manifest = {}
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return manifest
+        
+    for name in names:
+        if name not in MANIFEST_NAMES and not name.lower().endswith(MANIFEST_SUFFIXES):
+            continue
+        try:
+            with open(os.path.join(directory, name), 'r', errors='replace') as f:
+                for line in f:
+                    parts = line.strip().split(None, 1)
+                    if len(parts) != 2:
+                        continue
+                    digest, file_name = parts[0].lower(), parts[1].lstrip('*')
+                    algorithm = DIGEST_ALGORITHMS.get(len(digest))
+                    if algorithm and all(c in "0123456789abcdef" for c in digest):
+                        manifest[os.path.basename(file_name)] = (algorithm, digest)
+        except OSError:
+            continue
+    return manifest
+
+class HashCache:
+    """Persistent digests keyed by path and validated against size, mtime and inode"""
+    def __init__(self, cache_path=HASH_CACHE_PATH):
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(cache_path, 'r') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def stat_key(file_path):
+        st = os.stat(file_path)
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "inode": st.st_ino}
+
+    def lookup(self, file_path, algorithm="sha256"):
+        """Cached digest, or None if missing or the file changed since it was hashed"""
+        file_path = os.path.abspath(file_path)
+        try:
+            key = self.stat_key(file_path)
+        except OSError:
+            return None
+        with self.lock:
+            entry = self.entries.get(file_path)
+        if not entry or any(entry.get(k) != v for k, v in key.items()):
+            return None
+        return entry.get("digests", {}).get(algorithm)
+
+    def get_digests(self, file_path, algorithms=("sha256",)):
+        """Return digests for all algorithms, hashing only what is not cached"""
+        file_path = os.path.abspath(file_path)
+        key = self.stat_key(file_path)
+        with self.lock:
+            entry = self.entries.get(file_path)
+            if not entry or any(entry.get(k) != v for k, v in key.items()):
+                entry = dict(key, digests={})
+            digests = dict(entry["digests"])
+        
+        missing = [name for name in algorithms if name not in digests]
+        if missing:
+            digests.update(hash_file(file_path, missing))
+            # Only store the result if the file did not change while hashing
+            if self.stat_key(file_path) == key:
+                with self.lock:
+                    self.entries[file_path] = dict(key, digests=digests)
+                    self.dirty = True
+        return {name: digests[name] for name in algorithms}
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            entries = dict(self.entries)
+            self.dirty = False
+        try:
+            # Merge with entries written by other windows or flash threads
+            try:
+                with open(self.cache_path, 'r') as f:
+                    entries = dict(json.load(f), **entries)
+            except (OSError, ValueError):
+                pass
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass
+
+def check_image(file_path, manifest, hash_cache):
+    """Check one image against its manifest entry.
+
+    Returns (status, sha256) where status is "verified", "hashed" (no
+    manifest entry), "mismatch", "truncated" (sparse chunk table runs
+    past the end of the file) or "archived" (checked by the archive's own
+    CRC while it is streamed).
+    """
+    if split_member_path(file_path)[1] is not None:
+        return "archived", ""
+    sparse_info = read_sparse_info(file_path)
+    if sparse_info and sparse_info["truncated"]:
+        return "truncated", ""
+        
+    expected = manifest.get(os.path.basename(file_path))
+    algorithms = ["sha256"]
+    if expected and expected[0] not in algorithms:
+        algorithms.append(expected[0])
+        
+    digests = hash_cache.get_digests(file_path, algorithms)
+    if expected is None:
+        return "hashed", digests["sha256"]
+    if digests[expected[0]] == expected[1]:
+        return "verified", digests["sha256"]
+    return "mismatch", digests["sha256"]
+
+BACKUP_ROOT = os.path.join(os.path.expanduser("~"), ".devtical", "backups")
+BACKUP_BLOCK_SIZE = 1024 * 1024
+
+class BackupStore:
+    """Content-addressed store for compressed partition backups.
+
+    Partitions are cut into fixed-size blocks that are stored once under
+    objects/ by the SHA-256 of their content, so blocks shared between
+    partitions, devices and sessions take no extra space. Every backup
+    session gets a directory of per-partition manifests listing the blocks.
+    """
+    def __init__(self, root=None, block_size=BACKUP_BLOCK_SIZE):
+        self.root = root or BACKUP_ROOT
+        self.block_size = block_size
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.sessions_dir = os.path.join(self.root, "sessions")
+
+    def new_session(self, label, info=None):
+        name = time.strftime("%Y%m%d-%H%M%S") + "_" + re.sub(r'[^A-Za-z0-9_.-]', '_', label)
+        session_dir = os.path.join(self.sessions_dir, name)
+        os.makedirs(session_dir, exist_ok=True)
+        with open(os.path.join(session_dir, "session.json"), 'w') as f:
+            json.dump(dict(info or {}, created=time.time()), f, indent=2)
+        return session_dir
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest + ".z")
+
+    def store_block(self, block):
+        """Store one block if it is new; returns (digest, compressed bytes written)"""
+        digest = hashlib.sha256(block).hexdigest()
+        path = self.object_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        data = zlib.compress(block, 6)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return digest, len(data)
+
+    def ingest(self, session_dir, partition_name, source_path):
+        """Stream a partition dump into the store and write its manifest"""
+        whole = hashlib.sha256()
+        blocks = []
+        size = new_bytes = 0
+        with open(source_path, 'rb') as f:
+            while True:
+                block = f.read(self.block_size)
+                if not block:
+                    break
+                whole.update(block)
+                digest, written = self.store_block(block)
+                blocks.append(digest)
+                size += len(block)
+                new_bytes += written
+                
+        manifest = {
+            "partition": partition_name,
+            "size": size,
+            "block_size": self.block_size,
+            "sha256": whole.hexdigest(),
+            "blocks": blocks
+        }
+        with open(os.path.join(session_dir, partition_name + ".json"), 'w') as f:
+            json.dump(manifest, f)
+        return {"partition": partition_name, "size": size, "new_bytes": new_bytes}
+
+    def restore(self, manifest_path, output_path):
+        """Rebuild a partition image from its manifest, verifying the whole-image digest"""
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        whole = hashlib.sha256()
+        with open(output_path, 'wb') as out:
+            for digest in manifest["blocks"]:
+                with open(self.object_path(digest), 'rb') as f:
+                    block = zlib.decompress(f.read())
+                whole.update(block)
+                out.write(block)
+        if whole.hexdigest() != manifest["sha256"]:
+            raise IOError(f"Restored image does not match backup digest: {manifest_path}")
+        return manifest["size"]
+
+FIRMWARE_INDEX_NAME = ".devtical-index.json"
+FIRMWARE_INDEX_VERSION = 2
+FIRMWARE_INDEX_DIR = os.path.join(os.path.expanduser("~"), ".devtical", "index")
+RAWPROGRAM_PATTERN = re.compile(r'^rawprogram.*\.xml$', re.IGNORECASE)
+SCATTER_PATTERN = re.compile(r'.*_scatter\.txt$', re.IGNORECASE)
+SCATTER_LINE = re.compile(r'^\s*(-\s+)?([A-Za-z_][A-Za-z0-9_]*)\s*:\s*(.*?)\s*$')
+PAC_HEADER = struct.Struct("<48sI512s512sII")
+PAC_HEADER_SIZE = 2124
+PAC_MAGIC_OFFSET = 2116
+PAC_MAGIC = 0xFFFAFFFA
+PAC_ENTRY = struct.Struct("<I512s512s504sIIIIIIII")
+PAC_ENTRY_SIZE = 2580
+
+def parse_int(value, default=None):
+    """Parse decimal or 0x-prefixed numbers from layout files"""
+    try:
+        return int(str(value).strip(), 0)
+    except (TypeError, ValueError):
+        return default
+
+def parse_rawprogram(xml_path):
+    """Read <program> entries from a Qualcomm rawprogram*.xml"""
+    entries = []
+    for _, element in ET.iterparse(xml_path):
+        if element.tag != "program":
+            continue
+        attrs = element.attrib
+        file_name = attrs.get("filename", "").strip()
+        if file_name and attrs.get("label"):
+            sector_size = parse_int(attrs.get("SECTOR_SIZE_IN_BYTES"), 512)
+            sectors = parse_int(attrs.get("num_partition_sectors"), 0)
+            entries.append({
+                "partition": attrs["label"],
+                "file": file_name,
+                "size": sectors * sector_size if sectors else None,
+                "start_sector": parse_int(attrs.get("start_sector")),
+                "sector_size": sector_size,
+                "lun": parse_int(attrs.get("physical_partition_number"), 0),
+                "sparse": attrs.get("sparse", "false").lower() == "true"
+            })
+        element.clear()
+    return entries
+
+def parse_scatter(scatter_path):
+    """Read downloadable partitions from an MTK *_Android_scatter.txt"""
+    with open(scatter_path, 'r', errors='replace') as f:
+        return parse_scatter_lines(f)
+
+def parse_scatter_lines(lines):
+    entries = []
+    current = None
+    for line in lines:
+        match = SCATTER_LINE.match(line)
+        if not match:
+            continue
+        dash, key, value = match.groups()
+        if dash or key == "partition_index":
+            current = {}
+            entries.append(current)
+        if current is not None:
+            current[key] = value
+            
+    partitions = []
+    for entry in entries:
+        file_name = entry.get("file_name", "NONE")
+        if entry.get("is_download", "true").lower() != "true" or file_name in ("", "NONE"):
+            continue
+        if "partition_name" not in entry:
+            continue
+        partitions.append({
+            "partition": entry["partition_name"],
+            "file": file_name,
+            "size": parse_int(entry.get("partition_size")),
+            "address": parse_int(entry.get("linear_start_addr")),
+            "region": entry.get("region")
+        })
+    return partitions
+
+def decode_utf16(raw):
+    return raw.decode("utf-16-le", errors="replace").split("\0", 1)[0]
+
+class PacArchive:
+    """Read-only Spreadtrum/Unisoc PAC file over mmap.
+
+    The header and file table are parsed in place and every member is
+    exposed as a memoryview slice of the mapping, so nothing is copied
+    until it is written out. Release views from member_view() before
+    close().
+    """
+    def __init__(self, pac_path):
+        self.path = pac_path
+        self.file = open(pac_path, 'rb')
+        self.map = None
+        self.view = None
+        try:
+            self.size = os.fstat(self.file.fileno()).st_size
+            if self.size < PAC_HEADER_SIZE:
+                raise ValueError(f"Not a PAC file: {pac_path}")
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.map)
+            self.entries = self.read_table()
+        except Exception:
+            self.close()
+            raise
+
+    def read_table(self):
+        if struct.unpack_from("<I", self.map, PAC_MAGIC_OFFSET)[0] != PAC_MAGIC:
+            raise ValueError(f"Bad PAC magic: {self.path}")
+        _, _, _, _, file_count, table_offset = PAC_HEADER.unpack_from(self.map)
+        file_count = min(file_count, max(0, self.size - table_offset) // PAC_ENTRY_SIZE)
+        
+        entries = []
+        for index in range(file_count):
+            (_, file_id, name, _, size_high, offset_high, size, _, _,
+             offset, _, _) = PAC_ENTRY.unpack_from(self.map, table_offset + index * PAC_ENTRY_SIZE)
+            # Newer PACs keep the high halves of 64-bit sizes in the old version field
+            if (offset_high or size_high) and (offset_high << 32 | offset) + (size_high << 32 | size) <= self.size:
+                size |= size_high << 32
+                offset |= offset_high << 32
+            if not size or offset + size > self.size:
+                continue
+            entries.append({
+                "id": decode_utf16(file_id),
+                "name": decode_utf16(name),
+                "size": size,
+                "offset": offset
+            })
+        return entries
+
+    def find(self, file_id):
+        for entry in self.entries:
+            if entry["id"].lower() == file_id.lower():
+                return entry
+        return None
+
+    def member_view(self, entry):
+        return self.view[entry["offset"]:entry["offset"] + entry["size"]]
+
+    def write_member(self, entry, output_path, chunk_size=HASH_READ_SIZE):
+        """Write one member straight from the mapping"""
+        view = self.member_view(entry)
+        try:
+            with open(output_path, 'wb') as out:
+                for offset in range(0, len(view), chunk_size):
+                    out.write(view[offset:offset + chunk_size])
+        finally:
+            view.release()
+        return entry["size"]
+
+    def close(self):
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_pac_entries(pac_path):
+    """Read the file table of a PAC without extracting it"""
+    with PacArchive(pac_path) as pac:
+        return pac.entries
+
+FDL_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".devtical", "fdl")
+FDL_IDS = {"FDL1.bin": ("FDL", "FDL1"), "FDL2.bin": ("FDL2",)}
+
+def extract_fdls(pac_path, hash_cache=None, cache_dir=FDL_CACHE_DIR):
+    """Return (fdl1_path, fdl2_path, cached) for a PAC.
+
+    FDLs are written once under cache_dir/<PAC sha256>/. The PAC digest
+    comes from the stat-validated hash cache, so repeat runs with the same
+    PAC do not open it at all.
+    """
+    hash_cache = hash_cache or HashCache()
+    digest = hash_cache.get_digests(pac_path)["sha256"]
+    hash_cache.save()
+    
+    target_dir = os.path.join(cache_dir, digest)
+    paths = [os.path.join(target_dir, name) for name in FDL_IDS]
+    if all(os.path.exists(path) for path in paths):
+        return paths[0], paths[1], True
+        
+    os.makedirs(target_dir, exist_ok=True)
+    with PacArchive(pac_path) as pac:
+        for name, path in zip(FDL_IDS, paths):
+            entry = next((e for e in map(pac.find, FDL_IDS[name]) if e), None)
+            if entry is None:
+                raise ValueError(f"{name} not found in {os.path.basename(pac_path)}")
+            tmp_path = path + ".tmp"
+            pac.write_member(entry, tmp_path)
+            os.replace(tmp_path, path)
+    return paths[0], paths[1], False
+
+def scan_firmware_tree(directory):
+    """Walk a firmware tree once with os.scandir.
+
+    Returns ({relative dir: mtime_ns}, {kind: [relative paths]}) where kind
+    is rawprogram, scatter, pac or img.
+    """
+    dirs = {}
+    found = {"rawprogram": [], "scatter": [], "pac": [], "img": []}
+    stack = [""]
+    while stack:
+        relative = stack.pop()
+        path = os.path.join(directory, relative) if relative else directory
+        try:
+            dirs[relative] = os.stat(path).st_mtime_ns
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.name.startswith("."):
+                        continue
+                    rel_name = os.path.join(relative, entry.name) if relative else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(rel_name)
+                        continue
+                    name = entry.name.lower()
+                    if RAWPROGRAM_PATTERN.match(name):
+                        found["rawprogram"].append(rel_name)
+                    elif SCATTER_PATTERN.match(name):
+                        found["scatter"].append(rel_name)
+                    elif name.endswith(".pac"):
+                        found["pac"].append(rel_name)
+                    elif name.endswith(".img"):
+                        found["img"].append(rel_name)
+        except OSError:
+            continue
+    for paths in found.values():
+        paths.sort()
+    return dirs, found
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+def firmware_index_paths(directory):
+    """The index lives next to the package, or under ~/.devtical/index when that is read-only"""
+    name = hashlib.sha1(os.path.abspath(directory).encode("utf-8")).hexdigest() + ".json"
+    return [os.path.join(directory, FIRMWARE_INDEX_NAME), os.path.join(FIRMWARE_INDEX_DIR, name)]
+
+def load_firmware_index(directory):
+    """Return the cached index if nothing it was built from has changed"""
+    for path in firmware_index_paths(directory):
+        try:
+            with open(path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if index.get("version") != FIRMWARE_INDEX_VERSION:
+            continue
+        fresh = all((file_signature(os.path.join(directory, rel)) or [None])[0] == mtime
+                    for rel, mtime in index["dirs"].items())
+        fresh = fresh and all(file_signature(os.path.join(directory, rel)) == signature
+                              for rel, signature in index["files"].items())
+        if fresh:
+            return index
+    return None
+
+def build_firmware_index(directory):
+    dirs, found = scan_firmware_tree(directory)
+    partitions = []
+    sources = []
+    seen = set()
+    
+    def add(entry, source):
+        key = (entry.get("lun"), entry["partition"], entry.get("start_sector"))
+        if key in seen:
+            return
+        seen.add(key)
+        entry["source"] = source
+        partitions.append(entry)
+        
+    # Layout files name partitions relative to their own directory
+    for rel in found["rawprogram"]:
+        try:
+            entries = parse_rawprogram(os.path.join(directory, rel))
+        except (OSError, ET.ParseError):
+            continue
+        sources.append(rel)
+        for entry in entries:
+            entry["file"] = os.path.normpath(os.path.join(os.path.dirname(rel), entry["file"]))
+            add(entry, rel)
+    for rel in found["scatter"]:
+        try:
+            entries = parse_scatter(os.path.join(directory, rel))
+        except OSError:
+            continue
+        sources.append(rel)
+        for entry in entries:
+            entry["file"] = os.path.normpath(os.path.join(os.path.dirname(rel), entry["file"]))
+            add(entry, rel)
+    for rel in found["pac"]:
+        try:
+            entries = read_pac_entries(os.path.join(directory, rel))
+        except (OSError, ValueError):
+            continue
+        sources.append(rel)
+        for entry in entries:
+            if entry["id"].upper() in FDL_IDS["FDL1.bin"] + FDL_IDS["FDL2.bin"]:
+                continue
+            add({"partition": entry["id"], "file": rel, "member": entry["name"] or entry["id"],
+                 "offset": entry["offset"], "size": entry["size"], "image_size": entry["size"]}, rel)
+            
+    layout = "rawprogram" if found["rawprogram"] else "scatter" if found["scatter"] else "pac" if sources else "images"
+    if not sources:
+        # No layout file: fall back to guessing partitions from image names
+        for rel in found["img"]:
+            add({"partition": os.path.basename(rel).replace('.img', ''), "file": rel, "size": None}, rel)
+            
+    # Every candidate layout file is tracked, so fixing a broken one triggers a rebuild
+    files = {rel: file_signature(os.path.join(directory, rel))
+             for kind in ("rawprogram", "scatter", "pac") for rel in found[kind]}
+    for entry in partitions:
+        signature = file_signature(os.path.join(directory, entry["file"]))
+        entry["missing"] = signature is None
+        if signature is not None:
+            files[entry["file"]] = signature
+            
+    return {
+        "version": FIRMWARE_INDEX_VERSION,
+        "layout": layout,
+        "partitions": partitions,
+        "dirs": dirs,
+        "files": files
+    }
+
+def index_firmware(directory, use_cache=True):
+    """Map a firmware package to its partitions.
+
+    Uses rawprogram XML, MTK scatter files or PAC headers when present and
+    falls back to *.img names otherwise. The result is cached next to the
+    package and reused until a directory or layout file changes. Entry
+    "file" paths are relative to directory; firmware_entry_path() turns
+    them into flashable paths. directory may also be an archive.
+    """
+    if os.path.isfile(directory):
+        return index_archive(directory)
+    if use_cache:
+        index = load_firmware_index(directory)
+        if index:
+            index["cached"] = True
+            return index
+            
+    index_path = None
+    for path in firmware_index_paths(directory):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Create the index before walking so its own creation does not
+            # change the directory mtime recorded below
+            open(path, 'a').close()
+            index_path = path
+            break
+        except OSError:
+            continue
+            
+    index = build_firmware_index(directory)
+    if index_path:
+        try:
+            # Rewritten in place: replacing the file would change the directory mtime again
+            with open(index_path, 'w') as f:
+                json.dump(index, f)
+        except OSError:
+            pass
+    index["cached"] = False
+    return index
+
+ARCHIVE_SUFFIXES = {
+    ".zip": "zip", ".tar": "tar", ".tgz": "tar", ".tar.gz": "tar", ".txz": "tar", ".tar.xz": "tar",
+    ".tbz2": "tar", ".tar.bz2": "tar", ".7z": "7z", ".pac": "pac"
+}
+MEMBER_SEPARATOR = "::"
+ZIP_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+ARCHIVE_COPY_SIZE = 1024 * 1024
+SEVEN_ZIP_COMMANDS = ("7z", "7zz", "7za")
+
+def archive_kind(path):
+    name = path.lower()
+    for suffix, kind in sorted(ARCHIVE_SUFFIXES.items(), key=lambda item: -len(item[0])):
+        if name.endswith(suffix):
+            return kind
+    return None
+
+def member_path(archive_path, member):
+    """Path string naming one member of an archive, as stored in flash file lists"""
+    return f"{archive_path}{MEMBER_SEPARATOR}{member}"
+
+def split_member_path(path):
+    """Return (archive_path, member), or (path, None) for plain files"""
+    archive_path, sep, member = path.partition(MEMBER_SEPARATOR)
+    if sep and archive_kind(archive_path):
+        return archive_path, member
+    return path, None
+
+def write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+def copy_range(path, offset, size, out_fd):
+    """Copy a byte range of a file to out_fd inside the kernel with sendfile where possible; returns size"""
+    with open(path, 'rb') as f:
+        sent = 0
+        if hasattr(os, "sendfile"):
+            try:
+                while sent < size:
+                    count = os.sendfile(out_fd, f.fileno(), offset + sent, min(size - sent, 1 << 30))
+                    if not count:
+                        raise IOError(f"Unexpected end of archive: {path}")
+                    sent += count
+                return sent
+            except OSError as e:
+                # macOS only sends to sockets; fall back to writing from an mmap
+                if sent or e.errno not in (errno.EINVAL, errno.ENOSYS, errno.ENOTSOCK, errno.EOPNOTSUPP):
+                    raise
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for start in range(offset, offset + size, ARCHIVE_COPY_SIZE):
+                    block = view[start:min(start + ARCHIVE_COPY_SIZE, offset + size)]
+                    write_all(out_fd, block)
+                    block.release()
+            finally:
+                view.release()
+    return size
+
+def copy_stream(source, out_fd):
+    copied = 0
+    while True:
+        data = source.read(ARCHIVE_COPY_SIZE)
+        if not data:
+            return copied
+        write_all(out_fd, data)
+        copied += len(data)
+
+class FirmwareArchive:
+    """Member table of a zip, tar, 7z or PAC firmware archive.
+
+    Only the zip central directory (or the tar headers, 7z listing or PAC
+    file table) is read. Members stored without compression keep their
+    data offset so they can be copied straight out of the archive file.
+    7z needs the 7z command line tool.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.kind = archive_kind(path)
+        self.members = {}
+        self.zip = None
+        self.tar = None
+        self.seven_zip = None
+        if self.kind == "zip":
+            self.read_zip()
+        elif self.kind == "tar":
+            self.read_tar()
+        elif self.kind == "7z":
+            self.read_7z()
+        elif self.kind == "pac":
+            for entry in read_pac_entries(path):
+                name = entry["name"] or entry["id"]
+                self.members[name] = {"size": entry["size"], "offset": entry["offset"], "id": entry["id"]}
+        else:
+            raise ValueError(f"Unsupported archive: {os.path.basename(path)}")
+
+    def read_zip(self):
+        self.zip = zipfile.ZipFile(self.path)
+        with open(self.path, 'rb') as f:
+            for info in self.zip.infolist():
+                if info.is_dir():
+                    continue
+                offset = None
+                if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1:
+                    # Data starts after the local header, whose extra field can differ from the central one
+                    f.seek(info.header_offset)
+                    header = ZIP_LOCAL_HEADER.unpack(f.read(ZIP_LOCAL_HEADER.size))
+                    offset = info.header_offset + ZIP_LOCAL_HEADER.size + header[9] + header[10]
+                self.members[info.filename] = {"size": info.file_size, "offset": offset}
+
+    def read_tar(self):
+        try:
+            self.tar = tarfile.open(self.path, "r:")
+            compressed = False
+        except tarfile.ReadError:
+            # Compressed tars have no index: listing them means one full decompression pass
+            self.tar = tarfile.open(self.path, "r:*")
+            compressed = True
+        for info in self.tar.getmembers():
+            if info.isfile():
+                self.members[info.name] = {"size": info.size, "offset": None if compressed else info.offset_data}
+
+    def read_7z(self):
+        self.seven_zip = next((cmd for cmd in SEVEN_ZIP_COMMANDS if shutil.which(cmd)), None)
+        if not self.seven_zip:
+            raise ValueError("7z archives need the 7z command line tool (p7zip)")
+        result = subprocess.run([self.seven_zip, "l", "-slt", self.path], capture_output=True, text=True,
+                                errors="replace")
+        if result.returncode != 0:
+            raise ValueError(f"7z could not list {os.path.basename(self.path)}")
+        listing = result.stdout.split("----------", 1)[-1]
+        for block in listing.split("\n\n"):
+            fields = dict(line.split(" = ", 1) for line in block.splitlines() if " = " in line)
+            if "Path" in fields and "D" not in fields.get("Attributes", "") and fields.get("Folder") != "+":
+                self.members[fields["Path"]] = {"size": parse_int(fields.get("Size"), 0), "offset": None}
+
+    def read_member(self, name):
+        """Whole member in memory, for small layout files"""
+        member = self.members[name]
+        if member["offset"] is not None:
+            with open(self.path, 'rb') as f:
+                f.seek(member["offset"])
+                return f.read(member["size"])
+        if self.zip:
+            return self.zip.read(name)
+        if self.tar:
+            return self.tar.extractfile(name).read()
+        return subprocess.run([self.seven_zip, "e", "-so", self.path, name], capture_output=True,
+                              check=True).stdout
+
+    def copy_member(self, name, out_fd):
+        """Write one member to out_fd, by offset when stored, else decompressing on the fly.
+
+        Returns the number of bytes written.
+        """
+        member = self.members[name]
+        if member["offset"] is not None:
+            return copy_range(self.path, member["offset"], member["size"], out_fd)
+        if self.zip:
+            # zipfile checks the CRC-32 once the member has been read
+            with self.zip.open(name) as source:
+                return copy_stream(source, out_fd)
+        if self.tar:
+            return copy_stream(self.tar.extractfile(name), out_fd)
+        process = subprocess.Popen([self.seven_zip, "e", "-so", self.path, name],
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            return copy_stream(process.stdout, out_fd)
+        finally:
+            process.stdout.close()
+            if process.wait() != 0:
+                raise IOError(f"7z failed to extract {name}")
+
+    def close(self):
+        if self.zip:
+            self.zip.close()
+        if self.tar:
+            self.tar.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ArchiveImage:
+    """Makes one archive member readable by a flash tool under a plain path.
+
+    By default the member is extracted to a temporary file under work_dir
+    (the system temp dir if None), as most flash tools stat or seek their
+    image; extraction fails up front when it would not fit. With
+    stream=True on POSIX it is fed
+    into a temporary FIFO by a background thread while the tool reads it,
+    so nothing is extracted to disk; only use that for tools that read
+    front to back. Check error after close().
+    """
+    def __init__(self, image_path, stream=False, work_dir=None):
+        archive_path, self.member = split_member_path(image_path)
+        self.archive = FirmwareArchive(archive_path)
+        self.thread = None
+        self.reader = None
+        self.written = 0
+        self.done = False
+        self.error = None
+        if self.member not in self.archive.members:
+            self.archive.close()
+            raise ValueError(f"{self.member} not found in {os.path.basename(archive_path)}")
+        self.size = self.archive.members[self.member]["size"]
+        self.temp_dir = tempfile.mkdtemp(prefix="devtical-", dir=work_dir)
+        self.path = os.path.join(self.temp_dir, os.path.basename(self.member))
+        try:
+            if stream and hasattr(os, "mkfifo"):
+                os.mkfifo(self.path)
+                # Our own read end keeps the pipe alive after the tool exits, so close()
+                # can see what it left unread, and the feeder's open() never blocks
+                self.reader = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+                self.thread = threading.Thread(target=self.feed, daemon=True)
+                self.thread.start()
+            else:
+                free = shutil.disk_usage(self.temp_dir).free
+                if self.size >= free:
+                    raise IOError(f"Extracting {self.member} needs {format_size(self.size)} but only "
+                                  f"{format_size(free)} is free in {os.path.dirname(self.temp_dir)}")
+                fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0))
+                try:
+                    self.archive.copy_member(self.member, fd)
+                finally:
+                    os.close(fd)
+        except Exception:
+            self.close()
+            raise
+
+    def feed(self):
+        try:
+            fd = os.open(self.path, os.O_WRONLY)
+        except OSError as e:
+            self.error = e
+            self.done = True
+            return
+        try:
+            self.written = self.archive.copy_member(self.member, fd)
+        except Exception as e:
+            self.error = e
+        finally:
+            os.close(fd)
+            self.done = True
+
+    def drain(self):
+        """Discard what is waiting in the FIFO; returns the bytes the tool never read"""
+        drained = 0
+        while True:
+            try:
+                data = os.read(self.reader, ARCHIVE_COPY_SIZE)
+            except BlockingIOError:
+                return drained
+            if not data:
+                return drained
+            drained += len(data)
+
+    def close(self):
+        """Call once the tool has exited"""
+        if self.reader is not None:
+            unread = self.drain()
+            # A feeder still flushing its last write finishes; one with more to write shows up as unread data
+            while self.thread.is_alive() and not unread:
+                self.thread.join(0.1)
+                unread += self.drain()
+            # With no reader left, a feeder still writing fails with EPIPE instead of blocking
+            os.close(self.reader)
+            self.reader = None
+            self.thread.join()
+            incomplete = unread or not self.done or self.written != self.size
+            # A broken pipe just means the tool went away first
+            if incomplete and (self.error is None or isinstance(self.error, BrokenPipeError)):
+                self.error = IOError("Flash tool did not read the whole image")
+        self.archive.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+def index_archive(archive_path):
+    """Partition map of a firmware archive, from layout files inside it when present"""
+    with FirmwareArchive(archive_path) as archive:
+        names = sorted(archive.members)
+        partitions = []
+        layout = "images"
+        for name in names:
+            base = posixpath.basename(name).lower()
+            try:
+                if RAWPROGRAM_PATTERN.match(base):
+                    entries = parse_rawprogram(io.BytesIO(archive.read_member(name)))
+                elif SCATTER_PATTERN.match(base):
+                    entries = parse_scatter_lines(archive.read_member(name).decode("utf-8", "replace").splitlines())
+                else:
+                    continue
+            except (OSError, ValueError, ET.ParseError, subprocess.CalledProcessError):
+                continue
+            layout = "rawprogram" if RAWPROGRAM_PATTERN.match(base) else "scatter"
+            for entry in entries:
+                entry["file"] = posixpath.normpath(posixpath.join(posixpath.dirname(name), entry["file"]))
+                entry["source"] = name
+                partitions.append(entry)
+                
+        if not partitions:
+            if archive.kind == "pac":
+                layout = "pac"
+                partitions = [{"partition": member["id"], "file": name, "size": member["size"], "source": name}
+                              for name, member in archive.members.items()
+                              if member["id"].upper() not in FDL_IDS["FDL1.bin"] + FDL_IDS["FDL2.bin"]]
+            else:
+                partitions = [{"partition": posixpath.basename(name).replace('.img', ''), "file": name,
+                               "size": None, "source": name}
+                              for name in names if name.lower().endswith(".img")]
+                              
+        for entry in partitions:
+            member = archive.members.get(entry["file"])
+            entry["missing"] = member is None
+            entry["image_size"] = member["size"] if member else None
+            
+    return {"version": FIRMWARE_INDEX_VERSION, "layout": layout, "partitions": partitions, "cached": False}
+
+def firmware_entry_path(root, entry):
+    """Path to hand to FlashOperation for an index entry of root (a directory or an archive)"""
+    if os.path.isfile(root):
+        return member_path(root, entry["file"])
+    path = os.path.join(root, entry["file"])
+    if "member" in entry:
+        return member_path(path, entry["member"])
+    return path
+
+class ToolValidator:
+    @staticmethod
+    def validate_tool(tool_path, tool_name):
+        if not tool_path:
+            return False, f"❌ {tool_name} path is empty"
+            
+        # Extract the actual command (in case it has arguments)
+        actual_tool = tool_path.split()[0] if ' ' in tool_path else tool_path
+        
+        # Check if it's a file that exists
+        if os.path.exists(actual_tool):
+            return True, f"✅ {tool_name} found: {tool_path}"
+        
+        # Check if it's in system PATH
+        import shutil
+        if shutil.which(actual_tool):
+            return True, f"✅ {tool_name} found in system PATH: {tool_path}"
+            
+        return False, f"❌ {tool_name} not found: {tool_path}"
+
+TOOL_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".devtical", "tools.json")
+# Settings key -> display name and default, in the order the GUI reports them
+TOOL_SETTINGS = {
+    "mtk_path": ("MediaTek MTK Tool", "mtk.py"),
+    "edl_path": ("Qualcomm EDL Tool", "edl.py"),
+    "avb_path": ("AVB Tool", "avbtool"),
+    "spd_path": ("SPD Client", "spd.py"),
+    "xyn_path": ("XYN Client", "xyn_cli.py"),
+}
+DEVICE_TOOL_KEYS = {"qualcomm": "edl_path", "mtk": "mtk_path", "spreadtrum": "spd_path", "xynos": "xyn_path"}
+TOOL_PROBE_TIMEOUT = 5
+TOOL_VERSION_RE = re.compile(r"\b[vV]?(\d+\.\d+(?:\.\d+)*)\b")
+TOOL_SUBCOMMAND_RE = re.compile(r"(?<![\w-])(--[a-z][\w-]*|[a-z][a-z_]{2,}part)\b")
+
+class ToolRegistry:
+    """Resolved tools keyed by configured path, cached on disk against the file's mtime.
+
+    resolve() only stats and searches PATH; version and supported
+    subcommands come from running the tool with --version / --help, which
+    refresh() does once per tool file in a background thread. Flash code
+    reads the results with get() / valid(), which are plain dict lookups.
+    """
+    def __init__(self, cache_path=TOOL_CACHE_PATH):
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+        self.tools = {}
+        self.refresh_thread = None
+        self.refreshed = Event()
+        try:
+            with open(cache_path, 'r') as f:
+                self.probes = json.load(f)
+        except (OSError, ValueError):
+            self.probes = {}
+
+    @staticmethod
+    def interpreter(resolved):
+        if resolved.lower().endswith(".py"):
+            return "python"
+        try:
+            with open(resolved, 'rb') as f:
+                first_line = f.readline(256)
+        except OSError:
+            return None
+        if first_line.startswith(b"#!"):
+            return first_line[2:].decode("utf-8", "replace").strip() or None
+        return None
+
+    def resolve(self, tool_path, probe=False):
+        """Stat and PATH-search one tool; with probe, also fill in version and subcommands"""
+        actual_tool = tool_path.split()[0] if tool_path and tool_path.strip() else ""
+        info = {"path": tool_path, "resolved": None, "found_in_path": False, "mtime_ns": None,
+                "interpreter": None, "version": None, "subcommands": []}
+        if actual_tool:
+            if os.path.exists(actual_tool):
+                info["resolved"] = os.path.abspath(actual_tool)
+            elif shutil.which(actual_tool):
+                info["resolved"] = shutil.which(actual_tool)
+                info["found_in_path"] = True
+        if info["resolved"]:
+            try:
+                info["mtime_ns"] = os.stat(info["resolved"]).st_mtime_ns
+            except OSError:
+                pass
+            info["interpreter"] = self.interpreter(info["resolved"])
+            cached = self.probes.get(info["resolved"])
+            if cached and cached.get("mtime_ns") == info["mtime_ns"]:
+                info["version"] = cached.get("version")
+                info["subcommands"] = cached.get("subcommands", [])
+            elif probe:
+                self.probe(info)
+        with self.lock:
+            self.tools[tool_path] = info
+        return info
+
+    def probe(self, info):
+        """Ask the tool for its version and help text; a tool that hangs or fails just stays unprobed"""
+        cmd = [info["interpreter"], info["resolved"]] if info["interpreter"] == "python" else [info["resolved"]]
+        outputs = {}
+        for flag in ("--version", "--help"):
+            try:
+                result = subprocess.run(cmd + [flag], capture_output=True, text=True, errors="replace",
+                                        timeout=TOOL_PROBE_TIMEOUT, stdin=subprocess.DEVNULL)
+                outputs[flag] = result.stdout + result.stderr
+            except (OSError, subprocess.SubprocessError):
+                outputs[flag] = ""
+        match = TOOL_VERSION_RE.search(outputs["--version"])
+        info["version"] = match.group(1) if match else None
+        info["subcommands"] = sorted(set(TOOL_SUBCOMMAND_RE.findall(outputs["--help"])) - {"--help", "--version"})
+        with self.lock:
+            self.probes[info["resolved"]] = {"mtime_ns": info["mtime_ns"], "version": info["version"],
+                                             "subcommands": info["subcommands"]}
+
+    def get(self, tool_path):
+        """Cached resolution of a tool, resolving it (without probing) on first use"""
+        with self.lock:
+            info = self.tools.get(tool_path)
+        return info if info is not None else self.resolve(tool_path)
+
+    def exists(self, tool_path):
+        return self.get(tool_path)["resolved"] is not None
+
+    def validate(self, tool_path, tool_name):
+        """Same (valid, message) result as ToolValidator.validate_tool, from the cache"""
+        if not tool_path:
+            return False, f"❌ {tool_name} path is empty"
+        info = self.get(tool_path)
+        if not info["resolved"]:
+            return False, f"❌ {tool_name} not found: {tool_path}"
+        version = f" (v{info['version']})" if info["version"] else ""
+        if info["found_in_path"]:
+            return True, f"✅ {tool_name} found in system PATH: {tool_path}{version}"
+        return True, f"✅ {tool_name} found: {tool_path}{version}"
+
+    def refresh(self, settings):
+        """Re-resolve and probe every configured tool in the background; emits refreshed(settings) when done"""
+        paths = [settings.get(key, default) for key, (_, default) in TOOL_SETTINGS.items()]
+        def run():
+            for tool_path in paths:
+                self.resolve(tool_path, probe=True)
+            self.save()
+            self.refreshed.emit(settings)
+        self.refresh_thread = threading.Thread(target=run, daemon=True)
+        self.refresh_thread.start()
+        return self.refresh_thread
+
+    def save(self):
+        with self.lock:
+            probes = dict(self.probes)
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(probes, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass
+
+_tool_registry = None
+
+def tool_registry():
+    """Shared ToolRegistry for the GUI, flash threads and the CLI"""
+    global _tool_registry
+    if _tool_registry is None:
+        _tool_registry = ToolRegistry()
+    return _tool_registry
+
+SESSION_COMMAND_KEYS = {
+    "qualcomm": "edl_session_cmd",
+    "mtk": "mtk_session_cmd",
+    "spreadtrum": "spd_session_cmd",
+    "xynos": "xyn_session_cmd"
+}
+
+# Tools print binary units with decimal labels, like format_size() does
+SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3,
+              "KIB": 1024, "MIB": 1024 ** 2, "GIB": 1024 ** 3}
+
+class ProgressParser:
+    """Extract transfer progress from one line of tool output.
+
+    parse() returns a dict with any of "percent", "done", "total" (bytes)
+    and "rate" (bytes/s) found on the line, or None if the line carries no
+    progress. Subclasses add patterns for their tool's output format.
+    """
+    percent_re = re.compile(r"(\d{1,3}(?:\.\d+)?)\s?%")
+    rate_re = re.compile(r"(\d+(?:\.\d+)?)\s?([KMG]i?B)/s", re.IGNORECASE)
+    bytes_re = re.compile(r"(\d+(?:\.\d+)?)\s?([KMG]i?B|B|bytes)?\s?(?:/|of)\s?(\d+(?:\.\d+)?)\s?([KMG]i?B|B|bytes)",
+                          re.IGNORECASE)
+
+    @staticmethod
+    def to_bytes(value, unit):
+        unit = (unit or "B").upper()
+        return int(float(value) * SIZE_UNITS.get("B" if unit == "BYTES" else unit, 1))
+
+    def parse(self, line):
+        result = {}
+        match = self.bytes_re.search(line)
+        if match:
+            total = self.to_bytes(match.group(3), match.group(4))
+            result["done"] = self.to_bytes(match.group(1), match.group(2) or match.group(4))
+            result["total"] = total
+            if total:
+                result["percent"] = min(100.0, result["done"] * 100.0 / total)
+        match = self.percent_re.search(line)
+        if match:
+            result["percent"] = min(100.0, float(match.group(1)))
+        match = self.rate_re.search(line)
+        if match:
+            result["rate"] = self.to_bytes(match.group(1), match.group(2))
+        return result if "percent" in result else None
+
+class SectorProgressParser(ProgressParser):
+    """bkerler edl/mtkclient style: "Progress: |███| 42.0% Write (Sector 0x10 of 0x40) 12.3 MB/s" """
+    sector_re = re.compile(r"0x([0-9a-fA-F]+)\s?(?:/|of)\s?0x([0-9a-fA-F]+)")
+
+    def parse(self, line):
+        if "progress" not in line.lower() and "%" not in line:
+            return None
+        result = super().parse(line)
+        match = self.sector_re.search(line)
+        if match and int(match.group(2), 16):
+            percent = int(match.group(1), 16) * 100.0 / int(match.group(2), 16)
+            result = result or {}
+            result.setdefault("percent", min(100.0, percent))
+        return result
+
+class EdlProgressParser(SectorProgressParser):
+    pass
+
+class MtkProgressParser(SectorProgressParser):
+    pass
+
+class SpdProgressParser(ProgressParser):
+    pass
+
+class XynProgressParser(ProgressParser):
+    pass
+
+PROGRESS_PARSERS = {
+    "qualcomm": EdlProgressParser,
+    "mtk": MtkProgressParser,
+    "spreadtrum": SpdProgressParser,
+    "xynos": XynProgressParser
+}
+
+def register_progress_parser(device_type, parser_class):
+    """Use parser_class for the output of the tool driving device_type"""
+    PROGRESS_PARSERS[device_type] = parser_class
+
+class TransferTracker:
+    """Turns parsed progress lines into per-partition throughput and ETA"""
+    def __init__(self, partition, total_bytes, index, count):
+        self.partition = partition
+        self.total_bytes = total_bytes
+        self.index = index
+        self.count = count
+        self.started = time.monotonic()
+        self.last_time = None
+        self.last_done = 0
+        self.rate = None
+
+    def update(self, progress):
+        now = time.monotonic()
+        total = progress.get("total") or self.total_bytes
+        percent = progress["percent"]
+        done = progress.get("done", int(total * percent / 100.0))
+        
+        if progress.get("rate"):
+            self.rate = progress["rate"]
+        elif self.last_time is not None and now > self.last_time and done > self.last_done:
+            # Exponential moving average smooths bursty tool output
+            sample = (done - self.last_done) / (now - self.last_time)
+            self.rate = sample if self.rate is None else 0.7 * self.rate + 0.3 * sample
+        self.last_time, self.last_done = now, done
+        
+        eta = (total - done) / self.rate if self.rate and total else None
+        overall = (self.index + percent / 100.0) * 100.0 / self.count
+        return {
+            "event": "progress",
+            "partition": self.partition,
+            "percent": percent,
+            "bytes": done,
+            "total": total,
+            "rate": self.rate,
+            "eta": eta,
+            "elapsed": now - self.started,
+            "overall": int(overall)
+        }
+
+HASH_COMMAND_KEYS = {
+    "qualcomm": "edl_hash_cmd",
+    "mtk": "mtk_hash_cmd",
+    "spreadtrum": "spd_hash_cmd",
+    "xynos": "xyn_hash_cmd"
+}
+
+DIGEST_PATTERN = re.compile(r"\b[0-9a-fA-F]{64}\b")
+
+class ProcessRunner:
+    """Runs a tool and drains its stdout and stderr concurrently.
+
+    Both pipes are read in large chunks as soon as data arrives, so a tool
+    writing a lot to one stream can never stall on a full pipe buffer.
+    Output is split into lines on newlines or carriage returns (progress
+    bars) and returned as (stream, timestamp, line) tuples. Waits never block for longer than
+    the poll timeout, so stop requests take effect right away.
+
+    POSIX uses a selector on the pipes. Windows pipes cannot be selected,
+    so there one reader thread per stream feeds a queue instead.
+    """
+    CHUNK_SIZE = 64 * 1024
+    MAX_LINE = 64 * 1024
+    POLL_INTERVAL = 0.1
+    KILL_GRACE = 3
+    LINE_BREAK = re.compile(r"\r\n|\r|\n")
+    
+    def __init__(self, cmd, stdin=False):
+        self.cmd = cmd
+        self.use_stdin = stdin
+        self.process = None
+        self.open_streams = {}
+        self.decoders = {}
+        self.partial = {}
+        self.selector = None
+        self.chunks = None
+        self.stop_requested = False
+        self.stop_time = None
+
+    def start(self):
+        self.process = subprocess.Popen(self.cmd, stdin=subprocess.PIPE if self.use_stdin else subprocess.DEVNULL,
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+        self.open_streams = {"stdout": self.process.stdout, "stderr": self.process.stderr}
+        for name in self.open_streams:
+            self.decoders[name] = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            self.partial[name] = []
+            
+        if os.name == 'nt':
+            self.chunks = queue.Queue()
+            for name, pipe in self.open_streams.items():
+                threading.Thread(target=self._read_pipe, args=(name, pipe), daemon=True).start()
+        else:
+            self.selector = selectors.DefaultSelector()
+            for name, pipe in self.open_streams.items():
+                os.set_blocking(pipe.fileno(), False)
+                self.selector.register(pipe, selectors.EVENT_READ, name)
+
+    def _read_pipe(self, name, pipe):
+        while True:
+            try:
+                data = os.read(pipe.fileno(), self.CHUNK_SIZE)
+            except OSError:
+                data = b""
+            self.chunks.put((name, data))
+            if not data:
+                return
+
+    def _feed(self, name, data, timestamp, lines):
+        text = self.decoders[name].decode(data, final=not data)
+        parts = self.LINE_BREAK.split(text)
+        pending = self.partial[name]
+        if len(parts) > 1:
+            # Only the new text is scanned; an unterminated tail waits for more data
+            parts[0] = "".join(pending) + parts[0]
+            pending.clear()
+            tail = parts.pop()
+            if tail:
+                pending.append(tail)
+            lines.extend((name, timestamp, part) for part in parts if part)
+        elif text:
+            pending.append(text)
+            
+        # Bound runaway lines from tools that never print a line break
+        if not data or sum(map(len, pending)) >= self.MAX_LINE:
+            if pending:
+                lines.append((name, timestamp, "".join(pending)))
+                pending.clear()
+        if not data:
+            self.open_streams.pop(name, None)
+
+    def poll_lines(self, timeout=None):
+        """Return the lines that arrived within timeout, or None once both streams are closed"""
+        if not self.open_streams:
+            return None
+        self._enforce_stop()
+        
+        timeout = self.POLL_INTERVAL if timeout is None else timeout
+        lines = []
+        received = False
+        if self.selector:
+            for key, _ in self.selector.select(timeout):
+                received = True
+                try:
+                    data = os.read(key.fileobj.fileno(), self.CHUNK_SIZE)
+                except BlockingIOError:
+                    continue
+                if not data:
+                    self.selector.unregister(key.fileobj)
+                self._feed(key.data, data, time.time(), lines)
+        else:
+            try:
+                name, data = self.chunks.get(timeout=timeout)
+                received = True
+                while True:
+                    self._feed(name, data, time.time(), lines)
+                    name, data = self.chunks.get_nowait()
+            except queue.Empty:
+                pass
+        
+        if not received:
+            # A quiet tool may be waiting after a prompt or a \r progress update
+            for name, pending in self.partial.items():
+                if pending:
+                    lines.append((name, time.time(), "".join(pending)))
+                    pending.clear()
+        return lines
+
+    def iter_lines(self, is_running=None):
+        """Yield (stream, timestamp, line) until the tool exits; terminates it once is_running() is False"""
+        while True:
+            if is_running is not None and not is_running():
+                self.request_stop()
+            lines = self.poll_lines()
+            if lines is None:
+                break
+            yield from lines
+        self.wait()
+
+    def write_line(self, text):
+        self.process.stdin.write((text + "\n").encode())
+        self.process.stdin.flush()
+
+    def request_stop(self):
+        """Ask the tool to exit without blocking; it is killed if still alive after KILL_GRACE seconds"""
+        if self.process and self.process.poll() is None and not self.stop_requested:
+            self.stop_requested = True
+            self.stop_time = time.monotonic()
+            try:
+                self.process.terminate()
+            except OSError:
+                pass
+
+    def _enforce_stop(self):
+        if self.stop_requested and self.process.poll() is None:
+            if time.monotonic() - self.stop_time > self.KILL_GRACE:
+                self.process.kill()
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def wait(self, timeout=None):
+        returncode = self.process.wait(timeout)
+        if self.selector:
+            self.selector.close()
+            self.selector = None
+        for pipe in (self.process.stdout, self.process.stderr):
+            pipe.close()
+        return returncode
+
+    @property
+    def returncode(self):
+        return self.process.returncode if self.process else None
+
+class ToolSession:
+    """One long-running tool process that receives partition commands on stdin.
+
+    The tool is started once (single interpreter start, import and device
+    handshake) and every command is written to it as one line. A command is
+    finished when the tool prints a line matching the ok or error pattern.
+    """
+    def __init__(self, cmd, ok_pattern, error_pattern, log_callback):
+        self.cmd = cmd
+        self.ok_re = re.compile(ok_pattern)
+        self.error_re = re.compile(error_pattern)
+        self.log = log_callback
+        self.runner = None
+
+    def start(self):
+        self.runner = ProcessRunner(self.cmd, stdin=True)
+        try:
+            self.runner.start()
+        except Exception as e:
+            self.log(f"❌ Session start failed: {str(e)}")
+            self.runner = None
+            return False
+        return self.runner.is_alive()
+
+    def is_alive(self):
+        return self.runner is not None and self.runner.is_alive()
+
+    def run(self, command_line, description, is_running, capture=None):
+        """Send one command; returns True/False for its result, or None if the session died"""
+        if not self.is_alive():
+            return None
+            
+        self.log(f"🚀 {description}")
+        self.log(f"🔗 Session: {command_line}")
+        
+        try:
+            self.runner.write_line(command_line)
+        except (BrokenPipeError, OSError):
+            return None
+            
+        while True:
+            if not is_running():
+                self.close(force=True)
+                return False
+            lines = self.runner.poll_lines()
+            if lines is None:
+                return None
+                
+            for _, _, line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                self.log(line)
+                if capture is not None:
+                    capture.append(line)
+                
+                if self.ok_re.search(line):
+                    return True
+                if self.error_re.search(line):
+                    return False
+
+    def close(self, force=False):
+        if not self.runner:
+            return
+        runner, self.runner = self.runner, None
+        try:
+            if force:
+                runner.request_stop()
+            else:
+                runner.process.stdin.close()
+            # Drain remaining output so the tool can finish writing and exit
+            deadline = time.monotonic() + 5
+            while runner.poll_lines() is not None:
+                if time.monotonic() > deadline:
+                    runner.request_stop()
+                    deadline = time.monotonic() + runner.KILL_GRACE + 1
+            runner.wait(timeout=5)
+        except Exception:
+            runner.process.kill()
+
+USB_IDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "usb_ids.json")
+USB_IDS_USER_PATH = os.path.join(os.path.expanduser("~"), ".devtical", "usb_ids.json")
+NOT_FLASHABLE_MODES = ("normal", "ramdump", "mass storage")
+
+class UsbIdIndex:
+    """Chipset and boot mode by USB VID/PID, from usb_ids.json.
+
+    Entries in ~/.devtical/usb_ids.json are merged over the bundled file,
+    so new IDs can be added without touching the package. Device keys are
+    "vid:pid" or "vid:pid:interface" in lower-case hex.
+    """
+    def __init__(self, paths=(USB_IDS_PATH, USB_IDS_USER_PATH)):
+        self.chipsets = {}
+        self.devices = {}
+        self.vendors = {}
+        for path in paths:
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            self.chipsets.update(data.get("chipsets", {}))
+            self.devices.update({key.lower(): value for key, value in data.get("devices", {}).items()})
+            self.vendors.update({key.lower(): value for key, value in data.get("vendors", {}).items()})
+
+    def lookup(self, vid, pid, interface=None):
+        """Most specific entry for a port: interface, then VID/PID, then vendor (mode unknown)"""
+        if vid is None or pid is None:
+            return None
+        key = f"{vid:04x}:{pid:04x}"
+        if interface:
+            entry = self.devices.get(f"{key}:{interface.lower()}")
+            if entry:
+                return entry
+        entry = self.devices.get(key)
+        if entry:
+            return entry
+        chipset = self.vendors.get(f"{vid:04x}")
+        return {"chipset": chipset, "mode": None} if chipset else None
+
+_usb_id_index = None
+
+def usb_id_index():
+    """Shared UsbIdIndex, loaded on first use"""
+    global _usb_id_index
+    if _usb_id_index is None:
+        _usb_id_index = UsbIdIndex()
+    return _usb_id_index
+
+def classify_device(device, port=None):
+    """Device type of a "PORT - description" string.
+
+    port, the dict from enumerate_ports(), allows an exact VID/PID lookup;
+    the description heuristics are only used for unknown IDs. Returns the
+    device type and a user-facing description.
+    """
+    if port:
+        entry = usb_id_index().lookup(port.get("vid"), port.get("pid"), port.get("interface"))
+        if entry:
+            chipset, mode = entry["chipset"], entry.get("mode")
+            name = usb_id_index().chipsets.get(chipset, chipset)
+            info = f"📱 {name} Device ({mode} Mode)" if mode else f"📱 {name} Device"
+            if mode in NOT_FLASHABLE_MODES:
+                info += "\nReboot into download mode to flash"
+            elif chipset == "spreadtrum":
+                info += "\nFDL files required for flashing"
+            else:
+                info += "\nReady for flashing"
+            return chipset, f"{info}\nUSB {port['vid']:04x}:{port['pid']:04x}"
+            
+    device_lower = device.lower()
+    if "qualcomm" in device_lower or "9008" in device_lower:
+        return "qualcomm", "📱 Qualcomm Device (EDL Mode)\nReady for flashing"
+    elif "mediatek" in device_lower or "mtk" in device_lower:
+        return "mtk", "📱 MediaTek Device\nReady for flashing"
+    elif "spreadtrum" in device_lower or "unisoc" in device_lower or "sprd" in device_lower:
+        return "spreadtrum", "📱 Spreadtrum/Unisoc Device\nFDL files required for flashing"
+    elif "xynos" in device_lower or "exynos" in device_lower or "samsung" in device_lower:
+        return "xynos", "📱 Exynos Device\nReady for flashing"
+    return "unknown", "⚠️ Unknown Device Type\nProceed with caution"
+
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_SUBSYSTEMS = (b"SUBSYSTEM=tty", b"SUBSYSTEM=usb")
+UEVENT_SETTLE = 0.05
+MONITOR_POLL_INTERVAL = 2.0
+MONITOR_UEVENT_RESCAN = 30.0
+
+def enumerate_ports():
+    """Serial ports currently present, as dicts keyed like pyserial's ListPortInfo"""
+    ports = []
+    try:
+        import serial.tools.list_ports
+    except ImportError:
+        # Without pyserial only Windows COM ports can be probed
+        if os.name == 'nt':
+            for i in range(1, 20):
+                port_name = f"COM{i}"
+                if os.path.exists(f"\\\\.\\{port_name}"):
+                    ports.append({"device": port_name, "description": "Unknown Device", "hwid": "",
+                                  "vid": None, "pid": None, "serial_number": None})
+        return ports
+        
+    for port in serial.tools.list_ports.comports():
+        ports.append({
+            "device": port.device,
+            "description": port.description,
+            "hwid": port.hwid,
+            "vid": port.vid,
+            "pid": port.pid,
+            "serial_number": port.serial_number,
+            "interface": getattr(port, "interface", None)
+        })
+    return ports
+
+def port_label(port):
+    """The "PORT - description" string the UI lists and classify_device() reads"""
+    return f"{port['device']} - {port['description']}"
+
+class DeviceTable:
+    """Thread-safe table of present serial ports that callers can block on"""
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.ports = {}
+        self.generation = 0
+
+    def update(self, ports):
+        """Replace the table; returns (added, removed) port dicts"""
+        new_ports = {port["device"]: port for port in ports}
+        with self.condition:
+            added = [port for device, port in new_ports.items() if self.ports.get(device) != port]
+            removed = [port for device, port in self.ports.items() if device not in new_ports]
+            self.ports = new_ports
+            if added or removed:
+                self.generation += 1
+                self.condition.notify_all()
+        return added, removed
+
+    def snapshot(self):
+        with self.condition:
+            return list(self.ports.values())
+
+    def get(self, device):
+        with self.condition:
+            return self.ports.get(device)
+
+    def wait_for(self, predicate, timeout=None, is_running=lambda: True):
+        """Wait until predicate(ports) returns something truthy and return it, or None on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while is_running():
+                result = predicate(list(self.ports.values()))
+                if result:
+                    return result
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                # Wake up periodically so is_running() is honoured
+                self.condition.wait(0.5 if remaining is None else min(remaining, 0.5))
+        return None
+
+    def wait_for_port(self, device, timeout=None, is_running=lambda: True):
+        return self.wait_for(lambda ports: next((p for p in ports if p["device"] == device), None),
+                             timeout, is_running)
+
+class PortMonitor:
+    """Keeps a DeviceTable current and reports ports coming and going.
+
+    On Linux it listens to kernel uevents on a netlink socket and re-lists
+    ports within milliseconds of a tty or USB change, with a slow rescan as
+    a safety net. Elsewhere, or when the socket is unavailable, it diffs a
+    low-frequency poll. port_added and port_removed carry port dicts;
+    scanned carries the full list after every scan.
+    """
+    def __init__(self, table=None, poll_interval=MONITOR_POLL_INTERVAL):
+        self.table = table or DeviceTable()
+        self.poll_interval = poll_interval
+        self.port_added = Event()
+        self.port_removed = Event()
+        self.scanned = Event()
+        self.log_signal = Event()
+        self._is_running = True
+        self.rescan_requested = threading.Event()
+        self.thread = None
+        self.sock = None
+
+    def open_uevent_socket(self):
+        if not hasattr(socket, "AF_NETLINK"):
+            return None
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+            sock.bind((0, 1))
+            return sock
+        except OSError:
+            return None
+
+    def scan(self):
+        added, removed = self.table.update(enumerate_ports())
+        for port in removed:
+            self.port_removed.emit(port)
+        for port in added:
+            self.port_added.emit(port)
+        self.scanned.emit(self.table.snapshot())
+        return added, removed
+
+    def rescan(self):
+        """Ask the monitor thread for an immediate scan"""
+        self.rescan_requested.set()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._is_running = False
+        self.rescan_requested.set()
+        if self.thread:
+            self.thread.join(2)
+
+    def run(self):
+        self.sock = self.open_uevent_socket()
+        if self.sock is None:
+            self.log_signal.emit("🔁 Watching for devices by polling")
+        try:
+            self.scan()
+            while self._is_running:
+                if self.wait_for_change():
+                    self.scan()
+        except Exception as e:
+            self.log_signal.emit(f"❌ Device monitor stopped: {str(e)}")
+        finally:
+            if self.sock:
+                self.sock.close()
+
+    def wait_for_change(self):
+        """Block until a scan is due; True when one is"""
+        if self.rescan_requested.is_set():
+            self.rescan_requested.clear()
+            return True
+        if self.sock is None:
+            self.rescan_requested.wait(self.poll_interval)
+            self.rescan_requested.clear()
+            return True
+            
+        # Short timeouts keep rescan() and stop() responsive
+        deadline = time.monotonic() + MONITOR_UEVENT_RESCAN
+        self.sock.settimeout(0.25)
+        while self._is_running and not self.rescan_requested.is_set():
+            try:
+                message = self.sock.recv(16384)
+            except socket.timeout:
+                if time.monotonic() >= deadline:
+                    return True
+                continue
+            if any(key in message for key in UEVENT_SUBSYSTEMS):
+                # One plug event is a burst of uevents: let it settle, then drain it
+                time.sleep(UEVENT_SETTLE)
+                self.sock.settimeout(0)
+                try:
+                    while self.sock.recv(16384):
+                        pass
+                except (BlockingIOError, socket.timeout):
+                    pass
+                return True
+        self.rescan_requested.clear()
+        return True
+
+JOB_JOURNAL_PATH = os.path.join(os.path.expanduser("~"), ".devtical", "jobs.sqlite")
+JOB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL, updated REAL,
+    device_type TEXT, com_port TEXT, operation TEXT,
+    fdl1 TEXT, fdl2 TEXT, pac TEXT,
+    status TEXT, message TEXT
+);
+CREATE TABLE IF NOT EXISTS steps (
+    job_id INTEGER, idx INTEGER,
+    file TEXT, partition TEXT,
+    status TEXT, size INTEGER, mtime_ns INTEGER, sha256 TEXT,
+    bytes_total INTEGER, bytes_done INTEGER,
+    started REAL, finished REAL,
+    PRIMARY KEY (job_id, idx)
+);
+"""
+# Steps in these states are not redone on resume
+STEP_COMPLETE = ("done", "skipped")
+# A running job touches its row this often; one silent for JOB_STALE_AFTER was interrupted
+JOB_HEARTBEAT = 30
+JOB_STALE_AFTER = 3 * JOB_HEARTBEAT
+
+class JobJournal:
+    """Flash jobs and their per-partition steps in SQLite, so a dropped job can resume.
+
+    Every step is committed as soon as its partition finishes, so the
+    journal survives a crash or cable drop. Jobs are "running" until
+    finish_job() records "completed", "failed" or "stopped". While a job
+    runs, a heartbeat thread refreshes its "updated" time, so a "running"
+    row that has gone quiet belongs to a process that died.
+    """
+    def __init__(self, db_path=JOB_JOURNAL_PATH):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.active = set()
+        self.heartbeat_thread = None
+        self.closed = threading.Event()
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self.db.row_factory = sqlite3.Row
+        with self.lock, self.db:
+            if db_path != ":memory:":
+                self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(JOB_SCHEMA)
+
+    @staticmethod
+    def file_signature(file_path):
+        """(size, mtime_ns) of an image, or of the archive holding a member"""
+        try:
+            st = os.stat(split_member_path(file_path)[0])
+        except OSError:
+            return None, None
+        return st.st_size, st.st_mtime_ns
+
+    def create_job(self, device_type, com_port, operation, files, fdl1=None, fdl2=None, pac=None,
+                   hash_cache=None):
+        now = time.time()
+        with self.lock, self.db:
+            job_id = self.db.execute(
+                "INSERT INTO jobs (created, updated, device_type, com_port, operation, fdl1, fdl2, pac, status, message) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'running', '')",
+                (now, now, device_type, com_port, operation, fdl1, fdl2, pac)).lastrowid
+            for idx, (file_path, partition_name) in enumerate(files):
+                size, mtime_ns = self.file_signature(file_path)
+                # Only digests that are already cached; hashing here would delay the flash
+                sha256 = hash_cache.lookup(file_path) if hash_cache and size is not None and \
+                    split_member_path(file_path)[1] is None else None
+                self.db.execute(
+                    "INSERT INTO steps (job_id, idx, file, partition, status, size, mtime_ns, sha256, bytes_total, bytes_done) "
+                    "VALUES (?, ?, ?, ?, 'pending', ?, ?, ?, ?, 0)",
+                    (job_id, idx, file_path, partition_name, size, mtime_ns, sha256, size))
+            self.active.add(job_id)
+        self.start_heartbeat()
+        return job_id
+
+    def claim_job(self, job_id):
+        """Mark an interrupted job running in this process. False if it is still live elsewhere."""
+        now = time.time()
+        with self.lock, self.db:
+            claimed = self.db.execute(
+                "UPDATE jobs SET status = 'running', updated = ? WHERE id = ? AND status != 'completed' "
+                "AND NOT (status = 'running' AND updated > ?)",
+                (now, job_id, now - JOB_STALE_AFTER)).rowcount
+            if claimed:
+                self.active.add(job_id)
+        if claimed:
+            self.start_heartbeat()
+        return bool(claimed)
+
+    def start_heartbeat(self):
+        with self.lock:
+            if self.heartbeat_thread is None:
+                self.heartbeat_thread = threading.Thread(target=self.heartbeat, daemon=True)
+                self.heartbeat_thread.start()
+
+    def heartbeat(self):
+        while not self.closed.wait(JOB_HEARTBEAT):
+            try:
+                with self.lock, self.db:
+                    if self.active:
+                        self.db.executemany("UPDATE jobs SET updated = ? WHERE id = ?",
+                                            [(time.time(), job_id) for job_id in self.active])
+            except sqlite3.Error:
+                pass
+
+    def is_live(self, job):
+        """Whether a jobs row is still being flashed, here or by another process"""
+        return job["status"] == "running" and \
+            (job["id"] in self.active or time.time() - job["updated"] < JOB_STALE_AFTER)
+
+    def start_step(self, job_id, idx, bytes_total):
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute("UPDATE steps SET status = 'running', bytes_total = ?, bytes_done = 0, started = ? "
+                            "WHERE job_id = ? AND idx = ?", (bytes_total, now, job_id, idx))
+            self.db.execute("UPDATE jobs SET updated = ?, status = 'running' WHERE id = ?", (now, job_id))
+
+    def finish_step(self, job_id, idx, status, bytes_done=0):
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute("UPDATE steps SET status = ?, bytes_done = ?, finished = ? WHERE job_id = ? AND idx = ?",
+                            (status, bytes_done, now, job_id, idx))
+            self.db.execute("UPDATE jobs SET updated = ? WHERE id = ?", (now, job_id))
+
+    def finish_job(self, job_id, status, message=""):
+        with self.lock, self.db:
+            self.db.execute("UPDATE jobs SET status = ?, message = ?, updated = ? WHERE id = ?",
+                            (status, message, time.time(), job_id))
+            self.active.discard(job_id)
+
+    def get_job(self, job_id):
+        """Job row as a dict with its "steps" list, or None"""
+        with self.lock:
+            job = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            steps = self.db.execute("SELECT * FROM steps WHERE job_id = ? ORDER BY idx", (job_id,)).fetchall()
+        job = dict(job)
+        job["steps"] = [dict(step) for step in steps]
+        job["files"] = [(step["file"], step["partition"]) for step in job["steps"]]
+        return job
+
+    def incomplete_jobs(self, limit=20):
+        """Most recent jobs that did not complete and are not still running, newest first,
+        with done/total step counts"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT jobs.*, COUNT(steps.idx) AS total, "
+                "SUM(steps.status IN ('done', 'skipped')) AS done "
+                "FROM jobs LEFT JOIN steps ON steps.job_id = jobs.id "
+                "WHERE jobs.status != 'completed' AND NOT (jobs.status = 'running' AND jobs.updated > ?) "
+                "GROUP BY jobs.id ORDER BY jobs.updated DESC LIMIT ?",
+                (time.time() - JOB_STALE_AFTER, limit)).fetchall()
+        return [dict(row) for row in rows if row["id"] not in self.active]
+
+    def completed_steps(self, job_id):
+        """Indexes of steps that can be skipped on resume.
+
+        A finished step is redone if its image changed since the job was
+        created, since the partition no longer holds what is on disk.
+        """
+        job = self.get_job(job_id)
+        if job is None:
+            return set()
+        completed = set()
+        for step in job["steps"]:
+            if step["status"] in STEP_COMPLETE and \
+                    self.file_signature(step["file"]) == (step["size"], step["mtime_ns"]):
+                completed.add(step["idx"])
+        return completed
+
+    def close(self):
+        self.closed.set()
+        with self.lock:
+            self.db.close()
+
+_job_journal = None
+
+def job_journal():
+    """Shared JobJournal, opened on first use"""
+    global _job_journal
+    if _job_journal is None:
+        _job_journal = JobJournal()
+    return _job_journal
+
+def describe_job(job):
+    """One-line summary of an incomplete_jobs() row for pickers and the CLI"""
+    started = time.strftime("%Y-%m-%d %H:%M", time.localtime(job["created"]))
+    return (f"#{job['id']} {started} {job['device_type']} on {job['com_port']}: "
+            f"{job['done'] or 0}/{job['total']} partitions, {job['status']}")
+
+class FlashOperation:
+    """Qt-free flash/FRP operation against one device.
+
+    Runs synchronously in the calling thread. Progress is reported through
+    Event attributes with the same names and arguments as the FlashThread
+    signals that wrap them in the GUI.
+    """
+    EVENT_NAMES = ("log_signal", "progress_signal", "transfer_signal",
+                   "finished_signal", "operation_started")
+    
+    def __init__(self, device_type, files, com_port, operation, settings):
+        for name in self.EVENT_NAMES:
+            setattr(self, name, Event())
+        self.device_type = device_type
+        self.files = files
+        self.com_port = com_port
+        self.operation = operation
+        self.settings = settings
+        self._is_running = True
+        self.fdl1_path = None
+        self.fdl2_path = None
+        self.pac_file_path = None
+        self.session = None
+        self.hash_cache = None
+        self.backup_store = None
+        self.backup_pool = None
+        self.backup_session_dir = None
+        self.backup_jobs = []
+        self.backup_stats = []
+        self.backup_failed = []
+        self.progress_parser = PROGRESS_PARSERS.get(device_type, ProgressParser)()
+        self.transfer = None
+        self.current_runner = None
+        self.device_table = None
+        self.tools = tool_registry()
+        self.journal = None
+        self.job_id = None
+        self.resume_job = None
+
+    def handle_tool_output(self, line):
+        """Route one line of tool output to the transfer tracker or the log"""
+        if not line:
+            return
+        if self.transfer:
+            progress = self.progress_parser.parse(line)
+            if progress:
+                event = self.transfer.update(progress)
+                self.progress_signal.emit(event["overall"])
+                self.transfer_signal.emit(event)
+                return
+        self.log_signal.emit(line)
+
+    def set_fdl_files(self, fdl1_path, fdl2_path):
+        self.fdl1_path = fdl1_path
+        self.fdl2_path = fdl2_path
+
+    def set_pac_file(self, pac_file_path):
+        self.pac_file_path = pac_file_path
+
+    def stop(self):
+        self._is_running = False
+        runner = self.current_runner
+        if runner:
+            runner.request_stop()
+
+    def run(self):
+        try:
+            # Validate tools before starting
+            if not self.validate_tools():
+                self.finished_signal.emit(False, "Required tools not found")
+                return
+                
+            if not self.wait_for_device():
+                self.finished_signal.emit(False, f"Device {self.com_port} did not appear")
+                return
+                
+            # For SPD devices, check if we have FDL files or PAC file
+            if self.device_type == "spreadtrum":
+                if not self.setup_spd_environment():
+                    self.finished_signal.emit(False, "SPD operation setup failed")
+                    return
+                
+            if self.operation == "flash":
+                self.perform_flash()
+            elif self.operation == "frp":
+                self.perform_frp_erase()
+            elif self.operation == "advance_frp":
+                self.perform_advanced_frp()
+            else:
+                self.log_signal.emit(f"❌ Unknown operation: {self.operation}")
+                self.finished_signal.emit(False, "Unknown operation")
+                
+        except Exception as e:
+            self.log_signal.emit(f"❌ Operation failed: {str(e)}")
+            self.finished_signal.emit(False, str(e))
+
+    def set_device_table(self, device_table):
+        self.device_table = device_table
+
+    def wait_for_device(self):
+        """Wait for the port to (re)appear, e.g. while the device reboots into download mode"""
+        if self.device_table is None or self.device_table.get(self.com_port):
+            return True
+        timeout = int(self.settings.get("port_wait_timeout", 30))
+        self.log_signal.emit(f"⏳ Waiting up to {timeout}s for {self.com_port}...")
+        port = self.device_table.wait_for_port(self.com_port, timeout, lambda: self._is_running)
+        if port:
+            self.log_signal.emit(f"🔌 {port_label(port)} connected")
+        return port is not None
+
+    def setup_spd_environment(self):
+        """Setup FDL files for SPD operations"""
+        # If we have a PAC file, extract FDL files first
+        if self.pac_file_path and os.path.exists(self.pac_file_path):
+            if self.hash_cache is None:
+                self.hash_cache = HashCache()
+            try:
+                self.fdl1_path, self.fdl2_path, cached = extract_fdls(self.pac_file_path, self.hash_cache)
+                self.log_signal.emit("📦 Using cached FDL files for this PAC" if cached
+                                     else "📦 Extracted FDL files from PAC file")
+            except (OSError, ValueError) as e:
+                self.log_signal.emit(f"⚠️ Built-in PAC reader failed ({str(e)}), falling back to extractpac")
+                if not self.extract_fdls_with_tool():
+                    return False
+        
+        # Check if we have valid FDL files
+        if not self.fdl1_path or not os.path.exists(self.fdl1_path):
+            self.log_signal.emit("❌ FDL1.bin file not found or not provided")
+            return False
+            
+        if not self.fdl2_path or not os.path.exists(self.fdl2_path):
+            self.log_signal.emit("❌ FDL2.bin file not found or not provided")
+            return False
+            
+        self.log_signal.emit(f"✅ Using FDL1: {os.path.basename(self.fdl1_path)}")
+        self.log_signal.emit(f"✅ Using FDL2: {os.path.basename(self.fdl2_path)}")
+        return True
+
+    def extract_fdls_with_tool(self):
+        """Unpack the PAC with the SPD client's extractpac command"""
+        self.log_signal.emit("📦 Extracting FDL files from PAC file...")
+        spd_tool = self.settings.get("spd_path", "spd.py")
+        extract_cmd = self.settings.get("spd_extract_cmd", "extractpac {pac_file}").format(
+            pac_file=self.pac_file_path)
+        
+        cmd = ["python", spd_tool] + extract_cmd.split()
+        
+        if not self.execute_command(cmd, "Extracting FDL from PAC"):
+            self.log_signal.emit("❌ Failed to extract FDL files from PAC")
+            return False
+        
+        # After extraction, FDL files should be in the same directory as PAC
+        pac_dir = os.path.dirname(self.pac_file_path)
+        self.fdl1_path = os.path.join(pac_dir, "FDL1.bin")
+        self.fdl2_path = os.path.join(pac_dir, "FDL2.bin")
+        return True
+
+    def set_journal(self, journal, resume_job=None):
+        """Record flash progress in journal; resume_job continues that job instead of starting a new one"""
+        self.journal = journal
+        self.resume_job = resume_job
+
+    def set_tool_registry(self, tools):
+        self.tools = tools
+
+    def tool_path(self, key):
+        return self.settings.get(key, TOOL_SETTINGS[key][1])
+
+    def validate_tools(self):
+        key = DEVICE_TOOL_KEYS.get(self.device_type)
+        if not key:
+            self.log_signal.emit("❌ Unknown device type")
+            return False
+            
+        valid, message = self.tools.validate(self.tool_path(key), TOOL_SETTINGS[key][0])
+        self.log_signal.emit(message)
+        
+        if not valid:
+            return False
+            
+        # For advanced FRP, also validate AVB tool for Qualcomm/MTK
+        if self.operation == "advance_frp" and self.device_type in ["qualcomm", "mtk"]:
+            avb_tool = self.settings.get("avb_path", "avbtool")
+            valid_avb, message_avb = self.tools.validate(avb_tool, TOOL_SETTINGS["avb_path"][0])
+            self.log_signal.emit(message_avb)
+            if not valid_avb:
+                return False
+                
+        return True
+
+    def get_frp_partitions(self, frp_type="basic"):
+        """Get FRP partitions from settings"""
+        if frp_type == "advanced":
+            partitions_str = self.settings.get("advanced_frp_partitions", "frp,metadata,userdata,persist")
+        else:
+            partitions_str = self.settings.get("basic_frp_partitions", "frp,metadata,userdata")
+        
+        partitions = [p.strip() for p in partitions_str.split(',') if p.strip()]
+        return partitions
+
+    def execute_command(self, cmd, description, capture=None):
+        if not self._is_running:
+            return False
+            
+        self.log_signal.emit(f"🚀 {description}")
+        self.log_signal.emit(f"💻 Executing: {' '.join(cmd)}")
+        
+        try:
+            # For simulation/demo purposes - remove this in production
+            tool_exists = False
+            if any(x in ' '.join(cmd).lower() for x in ['mtk.py', 'edl.py', 'avbtool', 'spd.py', 'xyn_cli.py']):
+                if 'spd.py' in ' '.join(cmd).lower():
+                    tool_exists = self.tools.exists(self.tool_path("spd_path"))
+                elif 'xyn_cli.py' in ' '.join(cmd).lower():
+                    tool_exists = self.tools.exists(self.tool_path("xyn_path"))
+                else:
+                    tool_exists = any(self.tools.exists(self.tool_path(key))
+                                      for key in ("mtk_path", "edl_path", "avb_path"))
+                
+                if not tool_exists:
+                    self.log_signal.emit("⚠️ Simulation mode: Tools not found, simulating operation")
+                    # Simulate operation delay
+                    import time
+                    steps = 5
+                    for i in range(steps):
+                        if not self._is_running:
+                            return False
+                        time.sleep(0.5)
+                        self.progress_signal.emit(int((i + 1) * 100 / steps))
+                    return True
+            
+            self.current_runner = ProcessRunner(cmd)
+            self.current_runner.start()
+            try:
+                for _, _, line in self.current_runner.iter_lines(lambda: self._is_running):
+                    line = line.strip()
+                    self.handle_tool_output(line)
+                    if capture is not None and line:
+                        capture.append(line)
+            finally:
+                runner, self.current_runner = self.current_runner, None
+                    
+            return runner.returncode == 0 and self._is_running
+            
+        except Exception as e:
+            self.log_signal.emit(f"❌ Command failed: {str(e)}")
+            return False
+
+    def get_tool_command(self):
+        """Base command line (interpreter, tool and port) for the device tool"""
+        if self.device_type == "qualcomm":
+            return ["python", self.settings.get("edl_path", "edl.py"), "--port", self.com_port]
+        elif self.device_type == "mtk":
+            return ["python", self.settings.get("mtk_path", "mtk.py"), "--port", self.com_port]
+        elif self.device_type == "spreadtrum":
+            return ["python", self.settings.get("spd_path", "spd.py"), self.com_port]
+        elif self.device_type == "xynos":
+            return ["python", self.settings.get("xyn_path", "xyn_cli.py")]
+        return None
+
+    def get_flash_args(self, file_path, partition_name):
+        """Formatted flash command for one partition, without the tool prefix"""
+        if self.device_type == "spreadtrum":
+            return self.settings.get("spd_flash_cmd", "writepart {partition} {file} --fdl1 {fdl1} --fdl2 {fdl2}").format(
+                partition=partition_name, file=file_path, fdl1=self.fdl1_path, fdl2=self.fdl2_path)
+        elif self.device_type == "xynos":
+            return self.settings.get("xyn_flash_cmd", "write {partition} {file}").format(
+                partition=partition_name, file=file_path)
+        return self.settings.get("flash_cmd", "--flash {partition} {file}").format(
+            partition=partition_name, file=file_path)
+
+    def open_session(self):
+        """Start a persistent tool session, or return None to use one process per command"""
+        if not self.settings.get("session_enable", True):
+            return None
+            
+        session_key = SESSION_COMMAND_KEYS.get(self.device_type)
+        session_args = self.settings.get(session_key, "") if session_key else ""
+        if not session_args.strip():
+            return None
+            
+        base_cmd = self.get_tool_command()
+        # Tools that are not installed run in simulation mode through execute_command
+        if not base_cmd or not self.tools.exists(base_cmd[1]):
+            return None
+            
+        session_args = session_args.format(fdl1=self.fdl1_path, fdl2=self.fdl2_path)
+        session = ToolSession(base_cmd + session_args.split(),
+                              self.settings.get("session_ok_pattern", r"^(OK|DONE)\b"),
+                              self.settings.get("session_error_pattern", r"^(ERR|ERROR|FAIL)"),
+                              self.handle_tool_output)
+        
+        self.log_signal.emit(f"🔗 Opening tool session: {' '.join(session.cmd)}")
+        if not session.start():
+            self.log_signal.emit("⚠️ Tool session could not be started, using one process per partition")
+            return None
+        return session
+
+    def prepare_image(self, file_path):
+        """Return the path to transfer: a sparse copy for mostly-empty raw images, else file_path"""
+        if not self.settings.get("sparse_convert", False):
+            return file_path
+            
+        try:
+            size = os.path.getsize(file_path)
+            if size < SPARSE_MIN_SIZE or size % SPARSE_BLOCK_SIZE or read_sparse_info(file_path):
+                return file_path
+            if estimate_zero_ratio(file_path, SPARSE_BLOCK_SIZE) < SPARSE_MIN_ZERO_RATIO:
+                return file_path
+                
+            self.log_signal.emit(f"🗜️ Converting {os.path.basename(file_path)} to sparse...")
+            fd, sparse_path = tempfile.mkstemp(suffix=".sparse.img")
+            os.close(fd)
+            try:
+                sparse_size = write_sparse_image(file_path, sparse_path, SPARSE_BLOCK_SIZE)
+            except Exception:
+                os.remove(sparse_path)
+                raise
+            self.log_signal.emit(f"🗜️ Sparse image: {format_size(size)} → {format_size(sparse_size)}")
+            return sparse_path
+        except Exception as e:
+            self.log_signal.emit(f"⚠️ Sparse conversion failed, sending raw image: {str(e)}")
+            return file_path
+
+    def run_tool(self, tool_args, description, capture=None):
+        """Run one tool command through the open session, or as its own process"""
+        if self.session:
+            success = self.session.run(tool_args, description, lambda: self._is_running, capture)
+            if success is not None:
+                return success
+            self.log_signal.emit("⚠️ Tool session lost, continuing with one process per partition")
+            self.session.close()
+            self.session = None
+        return self.execute_command(self.get_tool_command() + tool_args.split(), description, capture)
+
+    def get_read_args(self, partition_name, file_path):
+        """Formatted read command for one partition, without the tool prefix"""
+        if self.device_type == "spreadtrum":
+            return self.settings.get("spd_read_cmd", "readpart {partition} {file} --fdl1 {fdl1} --fdl2 {fdl2}").format(
+                partition=partition_name, file=file_path, fdl1=self.fdl1_path, fdl2=self.fdl2_path)
+        elif self.device_type == "xynos":
+            return self.settings.get("xyn_read_cmd", "read {partition} {file}").format(
+                partition=partition_name, file=file_path)
+        return self.settings.get("read_cmd", "--read {partition} {file}").format(
+            partition=partition_name, file=file_path)
+
+    def work_dir(self, name):
+        """Scratch directory beside the backup store, as the temp dir is often a small tmpfs"""
+        path = os.path.join(self.settings.get("backup_dir") or BACKUP_ROOT, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def dump_dir(self):
+        """Where partitions are read to"""
+        return self.work_dir("dumps")
+
+    def dump_fits(self, partition_name, size):
+        """Whether a dump of `size` bytes fits in dump_dir(); logs why not"""
+        free = shutil.disk_usage(self.dump_dir()).free
+        if size is None or size < free:
+            return True
+        self.log_signal.emit(f"⚠️ {partition_name} needs {format_size(size)} but only {format_size(free)} "
+                             f"is free in {self.dump_dir()}")
+        return False
+
+    def archive_stream_types(self):
+        return [name.strip() for name in self.settings.get("archive_stream_types", "").split(",") if name.strip()]
+
+    def image_size(self, file_path):
+        """Bytes a partition holding this image has at least, or None when it is expensive to tell"""
+        archive_path, member = split_member_path(file_path)
+        try:
+            if member is None:
+                sparse_info = read_sparse_info(file_path)
+                return sparse_info["expanded_size"] if sparse_info else os.path.getsize(file_path)
+            # zip and PAC tables are cheap; listing a compressed tar or 7z means decompressing it
+            if archive_kind(archive_path) in ("zip", "pac"):
+                with FirmwareArchive(archive_path) as archive:
+                    return archive.members[member]["size"]
+        except (OSError, KeyError, ValueError):
+            pass
+        return None
+
+    def read_partition(self, partition_name, description):
+        """Read a partition into a file under dump_dir().
+
+        Returns (success, dump_path); dump_path is None when the tool
+        reported success but produced no data (e.g. simulation mode).
+        """
+        fd, dump_path = tempfile.mkstemp(suffix=".img", dir=self.dump_dir())
+        os.close(fd)
+        success = self.run_tool(self.get_read_args(partition_name, dump_path), description)
+        if success and os.path.getsize(dump_path):
+            return True, dump_path
+        os.remove(dump_path)
+        return success, None
+
+    def partition_unchanged(self, file_path, partition_name, dump_path=None):
+        """True if the device partition (or an existing dump of it) already holds the image content"""
+        if self.hash_cache is None:
+            self.hash_cache = HashCache()
+        sparse_info = read_sparse_info(file_path)
+        
+        # A device-side hash avoids reading the partition back over USB
+        hash_key = HASH_COMMAND_KEYS.get(self.device_type)
+        hash_args = self.settings.get(hash_key, "") if hash_key else ""
+        if dump_path is None and hash_args.strip() and not sparse_info:
+            capture = []
+            hash_args = hash_args.format(partition=partition_name, size=os.path.getsize(file_path),
+                                         fdl1=self.fdl1_path, fdl2=self.fdl2_path)
+            if self.run_tool(hash_args, f"Hashing {partition_name} on device", capture):
+                digests = DIGEST_PATTERN.findall("\n".join(capture))
+                if digests:
+                    return digests[-1].lower() == self.hash_cache.get_digests(file_path)["sha256"]
+        
+        owns_dump = dump_path is None
+        if owns_dump:
+            if not self.dump_fits(partition_name, self.image_size(file_path)):
+                return False
+            _, dump_path = self.read_partition(partition_name, f"Reading {partition_name} for comparison")
+            if dump_path is None:
+                return False
+        try:
+            if sparse_info:
+                return os.path.getsize(dump_path) >= sparse_info["expanded_size"] and sparse_matches_raw(file_path, dump_path)
+            
+            size = os.path.getsize(file_path)
+            if os.path.getsize(dump_path) < size:
+                return False
+            return hash_file(dump_path, length=size)["sha256"] == self.hash_cache.get_digests(file_path)["sha256"]
+        except Exception as e:
+            self.log_signal.emit(f"⚠️ Could not compare {partition_name}: {str(e)}")
+            return False
+        finally:
+            if owns_dump:
+                os.remove(dump_path)
+
+    def backup_partition(self, partition_name, expected_size=None):
+        """Read a partition and queue it for compression into the backup store.
+
+        Returns (success, dump_path). The dump stays valid until the next
+        call, so it can also be used for the differential flash check.
+        A partition larger than the free space for its dump is not backed up.
+        """
+        # Bound the dumps waiting on disk when compression is slower than the device
+        while len(self.backup_jobs) >= 2:
+            self.finish_backup_job(self.backup_jobs.pop(0))
+        
+        if not self.dump_fits(partition_name, expected_size):
+            self.log_signal.emit(f"⚠️ {partition_name} is not backed up")
+            return True, None
+            
+        success, dump_path = self.read_partition(partition_name, f"Backing up {partition_name}")
+        if not success:
+            return False, None
+        if dump_path is None:
+            self.log_signal.emit(f"⚠️ No data read from {partition_name}, it is not backed up")
+            return True, None
+            
+        if self.backup_session_dir is None:
+            self.backup_session_dir = self.backup_store.new_session(
+                self.com_port, {"device_type": self.device_type, "port": self.com_port})
+            self.log_signal.emit(f"💾 Backing up to {self.backup_session_dir}")
+        
+        future = self.backup_pool.submit(self.backup_store.ingest, self.backup_session_dir, partition_name, dump_path)
+        self.backup_jobs.append((partition_name, dump_path, future))
+        return True, dump_path
+
+    def finish_backup_job(self, job):
+        partition_name, dump_path, future = job
+        try:
+            result = future.result()
+            self.backup_stats.append(result)
+        except Exception as e:
+            self.backup_failed.append(partition_name)
+            self.log_signal.emit(f"❌ Backup of {partition_name} failed: {str(e)}")
+        finally:
+            os.remove(dump_path)
+
+    def finish_backups(self):
+        while self.backup_jobs:
+            self.finish_backup_job(self.backup_jobs.pop(0))
+        if self.backup_stats:
+            total = sum(stat["size"] for stat in self.backup_stats)
+            new = sum(stat["new_bytes"] for stat in self.backup_stats)
+            self.log_signal.emit(f"💾 Backed up {len(self.backup_stats)} partitions "
+                                 f"({format_size(total)}, {format_size(new)} new compressed data)")
+
+    def perform_flash(self):
+        self.operation_started.emit("flash")
+        total_files = len(self.files)
+        
+        if self.get_tool_command() is None:
+            self.finished_signal.emit(False, f"Flashing not supported for device type: {self.device_type}")
+            return
+        
+        diff_flash = self.settings.get("diff_flash", False)
+        backup_enable = self.settings.get("backup_enable", True)
+        skipped = 0
+        completed_steps = set()
+        job_status = "failed"
+        if self.journal:
+            if self.resume_job:
+                if not self.journal.claim_job(self.resume_job):
+                    self.finished_signal.emit(False, f"Job #{self.resume_job} is still running or already completed")
+                    return
+                self.job_id = self.resume_job
+                completed_steps = self.journal.completed_steps(self.job_id)
+                self.log_signal.emit(f"⏩ Resuming job #{self.job_id}: {len(completed_steps)} of {total_files} "
+                                     f"partitions already flashed")
+            else:
+                self.job_id = self.journal.create_job(self.device_type, self.com_port, self.operation, self.files,
+                                                      self.fdl1_path, self.fdl2_path, self.pac_file_path,
+                                                      self.hash_cache)
+                self.log_signal.emit(f"📒 Recording progress as job #{self.job_id}")
+        self.session = self.open_session()
+        if backup_enable:
+            # Compression runs in the background while the next partition is read or written
+            self.backup_store = BackupStore(self.settings.get("backup_dir") or None)
+            self.backup_pool = ThreadPoolExecutor(max_workers=1)
+        try:
+            for i, (file_path, partition_name) in enumerate(self.files):
+                if not self._is_running:
+                    break
+                if i in completed_steps:
+                    continue
+                    
+                progress = int((i / total_files) * 100)
+                self.progress_signal.emit(progress)
+                
+                dump_path = None
+                if backup_enable:
+                    success, dump_path = self.backup_partition(partition_name, self.image_size(file_path))
+                    if not success:
+                        self.finished_signal.emit(False, f"Failed to back up {partition_name}, nothing was written to it")
+                        return
+                
+                archived = split_member_path(file_path)[1] is not None
+                if diff_flash and not archived and self.partition_unchanged(file_path, partition_name, dump_path):
+                    self.log_signal.emit(f"⏭️ {partition_name} already matches {os.path.basename(file_path)}, skipping")
+                    skipped += 1
+                    if self.job_id:
+                        self.journal.finish_step(self.job_id, i, "skipped")
+                    continue
+                
+                self.log_signal.emit(f"📤 Flashing {os.path.basename(file_path)} to {partition_name}...")
+                
+                archive_image = None
+                if archived:
+                    archive_image = ArchiveImage(file_path, self.device_type in self.archive_stream_types(),
+                                                 self.work_dir("extract"))
+                    flash_path, image_size = archive_image.path, archive_image.size
+                else:
+                    flash_path = self.prepare_image(file_path)
+                    image_size = os.path.getsize(flash_path)
+                self.transfer = TransferTracker(partition_name, image_size, i, total_files)
+                if self.job_id:
+                    self.journal.start_step(self.job_id, i, image_size)
+                try:
+                    success = self.run_tool(self.get_flash_args(flash_path, partition_name), f"Flashing {partition_name}")
+                finally:
+                    bytes_done = self.transfer.last_done
+                    self.transfer = None
+                    if archive_image:
+                        archive_image.close()
+                    elif flash_path != file_path:
+                        os.remove(flash_path)
+                
+                if archive_image and archive_image.error:
+                    self.log_signal.emit(f"❌ Streaming {os.path.basename(file_path)} failed: {archive_image.error}")
+                    success = False
+                if self.job_id:
+                    self.journal.finish_step(self.job_id, i, "done" if success else "failed",
+                                             image_size if success else bytes_done)
+                if not success:
+                    self.finished_signal.emit(False, f"Failed to flash {partition_name}")
+                    return
+            job_status = "completed" if self._is_running else "stopped"
+        finally:
+            if self.job_id:
+                if job_status == "failed" and not self._is_running:
+                    job_status = "stopped"
+                self.journal.finish_job(self.job_id, job_status)
+            if self.session:
+                self.session.close()
+                self.session = None
+            if self.hash_cache:
+                self.hash_cache.save()
+            if self.backup_pool:
+                self.finish_backups()
+                self.backup_pool.shutdown()
+                self.backup_pool = None
+        
+        self.progress_signal.emit(100)
+        if self.backup_failed:
+            self.finished_signal.emit(True, f"Flash completed, but backup failed for: {', '.join(self.backup_failed)}")
+        elif skipped:
+            self.finished_signal.emit(True, f"Flash completed successfully ({skipped} unchanged partitions skipped)")
+        else:
+            self.finished_signal.emit(True, "Flash completed successfully")
+
+    def perform_frp_erase(self):
+        """Basic FRP erase for all device types"""
+        self.operation_started.emit("frp")
+        partitions = self.get_frp_partitions("basic")
+        
+        if not partitions:
+            self.log_signal.emit("❌ No FRP partitions configured")
+            self.finished_signal.emit(False, "No FRP partitions configured")
+            return
+            
+        self.log_signal.emit(f"🧹 Erasing partitions: {', '.join(partitions)}")
+        
+        for i, partition in enumerate(partitions):
+            if not self._is_running:
+                break
+                
+            progress = int((i / len(partitions)) * 100)
+            self.progress_signal.emit(progress)
+            
+            self.log_signal.emit(f"🧹 Erasing {partition}...")
+            
+            if self.device_type == "qualcomm":
+                tool = self.settings.get("edl_path", "edl.py")
+                erase_cmd = self.settings.get("erase_cmd", "--erase {partition}").format(partition=partition)
+                cmd = ["python", tool, "--port", self.com_port] + erase_cmd.split()
+                
+            elif self.device_type == "mtk":
+                tool = self.settings.get("mtk_path", "mtk.py")
+                erase_cmd = self.settings.get("erase_cmd", "--erase {partition}").format(partition=partition)
+                cmd = ["python", tool, "--port", self.com_port] + erase_cmd.split()
+                
+            elif self.device_type == "spreadtrum":
+                tool = self.settings.get("spd_path", "spd.py")
+                erase_cmd = self.settings.get("spd_erase_cmd", "erasepart {partition} --fdl1 {fdl1} --fdl2 {fdl2}").format(
+                    partition=partition, fdl1=self.fdl1_path, fdl2=self.fdl2_path)
+                cmd = ["python", tool, self.com_port] + erase_cmd.split()
+                
+            elif self.device_type == "xynos":
+                tool = self.settings.get("xyn_path", "xyn_cli.py")
+                erase_cmd = self.settings.get("xyn_erase_cmd", "erase {partition} --force").format(partition=partition)
+                cmd = ["python", tool] + erase_cmd.split()
+            
+            if not self.execute_command(cmd, f"Erasing {partition}"):
+                self.log_signal.emit(f"⚠️ Failed to erase {partition}, continuing...")
+        
+        self.progress_signal.emit(100)
+        self.finished_signal.emit(True, "Basic FRP erase completed")
+
+    def perform_advanced_frp(self):
+        """Advanced FRP for ALL device types with appropriate methods"""
+        self.operation_started.emit("advance_frp")
+        
+        if self.device_type in ["qualcomm", "mtk"]:
+            self.perform_standard_advanced_frp()
+        elif self.device_type == "spreadtrum":
+            self.perform_spd_advanced_frp()
+        elif self.device_type == "xynos":
+            self.perform_xyn_advanced_frp()
+        else:
+            self.finished_signal.emit(False, "Advanced FRP not supported for this device type")
+
+    def perform_standard_advanced_frp(self):
+        """Advanced FRP for Qualcomm/MTK with vbmeta patching"""
+        self.log_signal.emit("🔧 Starting Advanced FRP (Qualcomm/MTK)...")
+        
+        # Read vbmeta
+        self.log_signal.emit("📖 Reading vbmeta partition...")
+        vbmeta_original = "vbmeta_original.img"
+        
+        if self.device_type == "qualcomm":
+            tool = self.settings.get("edl_path", "edl.py")
+            read_cmd = self.settings.get("read_cmd", "--read {partition} {file}").format(
+                partition="vbmeta", file=vbmeta_original)
+        else:
+            tool = self.settings.get("mtk_path", "mtk.py")
+            read_cmd = self.settings.get("read_cmd", "--read {partition} {file}").format(
+                partition="vbmeta", file=vbmeta_original)
+        
+        cmd = ["python", tool, "--port", self.com_port] + read_cmd.split()
+        
+        if not self.execute_command(cmd, "Reading vbmeta"):
+            self.finished_signal.emit(False, "Failed to read vbmeta")
+            return
+
+        # Erase advanced FRP partitions
+        partitions = self.get_frp_partitions("advanced")
+        self.log_signal.emit(f"🧹 Erasing advanced partitions: {', '.join(partitions)}")
+        
+        for partition in partitions:
+            if not self._is_running:
+                break
+                
+            self.log_signal.emit(f"🧹 Erasing {partition}...")
+            
+            if self.device_type == "qualcomm":
+                erase_cmd = self.settings.get("erase_cmd", "--erase {partition}").format(partition=partition)
+            else:
+                erase_cmd = self.settings.get("erase_cmd", "--erase {partition}").format(partition=partition)
+            
+            cmd = ["python", tool, "--port", self.com_port] + erase_cmd.split()
+            
+            if not self.execute_command(cmd, f"Erasing {partition}"):
+                self.log_signal.emit(f"⚠️ Failed to erase {partition}, continuing...")
+
+        if not self._is_running:
+            return
+
+        # Patch vbmeta
+        self.log_signal.emit("🔧 Patching vbmeta...")
+        vbmeta_patched = "vbmeta_patched.img"
+        avb_tool = self.settings.get("avb_path", "avbtool")
+        patch_cmd = self.settings.get("patch_cmd", "patch_vbmeta --input {input} --output {output}").format(
+            input=vbmeta_original, output=vbmeta_patched)
+        
+        cmd = [avb_tool] + patch_cmd.split()
+        
+        if not self.execute_command(cmd, "Patching vbmeta"):
+            self.finished_signal.emit(False, "Failed to patch vbmeta")
+            return
+
+        # Flash patched vbmeta
+        self.log_signal.emit("📤 Flashing patched vbmeta...")
+        if self.device_type == "qualcomm":
+            flash_cmd = self.settings.get("flash_cmd", "--flash {partition} {file}").format(
+                partition="vbmeta", file=vbmeta_patched)
+        else:
+            flash_cmd = self.settings.get("flash_cmd", "--flash {partition} {file}").format(
+                partition="vbmeta", file=vbmeta_patched)
+        
+        cmd = ["python", tool, "--port", self.com_port] + flash_cmd.split()
+        
+        if not self.execute_command(cmd, "Flashing patched vbmeta"):
+            self.finished_signal.emit(False, "Failed to flash patched vbmeta")
+            return
+
+        self.progress_signal.emit(100)
+        self.finished_signal.emit(True, "Advanced FRP completed")
+
+    def perform_spd_advanced_frp(self):
+        """Advanced FRP for Spreadtrum/Unisoc devices"""
+        self.log_signal.emit("🔧 Starting Advanced FRP (Spreadtrum/Unisoc)...")
+        
+        partitions = self.get_frp_partitions("advanced")
+        self.log_signal.emit(f"🧹 Erasing advanced partitions: {', '.join(partitions)}")
+        
+        tool = self.settings.get("spd_path", "spd.py")
+        
+        for i, partition in enumerate(partitions):
+            if not self._is_running:
+                break
+                
+            progress = int((i / len(partitions)) * 100)
+            self.progress_signal.emit(progress)
+            
+            self.log_signal.emit(f"🧹 Advanced erase {partition}...")
+            
+            # Use advanced FRP command for SPD
+            adv_frp_cmd = self.settings.get("spd_adv_frp_cmd", "writepart {partition} zero.bin --fdl1 {fdl1} --fdl2 {fdl2}").format(
+                partition=partition, fdl1=self.fdl1_path, fdl2=self.fdl2_path)
+            
+            cmd = ["python", tool, self.com_port] + adv_frp_cmd.split()
+            
+            if not self.execute_command(cmd, f"Advanced FRP on {partition}"):
+                self.log_signal.emit(f"⚠️ Failed advanced FRP on {partition}, continuing...")
+        
+        self.progress_signal.emit(100)
+        self.finished_signal.emit(True, "Advanced FRP completed for Spreadtrum")
+
+    def perform_xyn_advanced_frp(self):
+        """Advanced FRP for Exynos devices"""
+        self.log_signal.emit("🔧 Starting Advanced FRP (Exynos)...")
+        
+        partitions = self.get_frp_partitions("advanced")
+        self.log_signal.emit(f"🧹 Erasing advanced partitions: {', '.join(partitions)}")
+        
+        tool = self.settings.get("xyn_path", "xyn_cli.py")
+        
+        for i, partition in enumerate(partitions):
+            if not self._is_running:
+                break
+                
+            progress = int((i / len(partitions)) * 100)
+            self.progress_signal.emit(progress)
+            
+            self.log_signal.emit(f"🧹 Advanced erase {partition}...")
+            
+            # Use advanced FRP command for XYN
+            adv_frp_cmd = self.settings.get("xyn_adv_frp_cmd", "erase {partition} --force").format(partition=partition)
+            
+            cmd = ["python", tool] + adv_frp_cmd.split()
+            
+            if not self.execute_command(cmd, f"Advanced FRP on {partition}"):
+                self.log_signal.emit(f"⚠️ Failed advanced FRP on {partition}, continuing...")
+        
+        self.progress_signal.emit(100)
+        self.finished_signal.emit(True, "Advanced FRP completed for Exynos")
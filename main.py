@@ -1,23 +1,43 @@
 import sys
 import os
 import glob
-import subprocess
 import threading
 import json
+import re
+import time
+STARTUP_STARTED = time.perf_counter()
+import codecs
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from PySide6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, 
                                QWidget, QPushButton, QListWidget, QListWidgetItem, 
-                               QCheckBox, QTextEdit, QLabel, QFileDialog, 
+                               QCheckBox, QLabel, QFileDialog, 
                                QMessageBox, QComboBox, QDialog, QDialogButtonBox,
                                QProgressBar, QTabWidget, QLineEdit, QGroupBox,
                                QSplitter, QFrame, QToolBar, QStatusBar, QToolButton,
-                               QMenu, QSystemTrayIcon, QStyle, QInputDialog, QFormLayout)
-from PySide6.QtCore import Qt, QThread, Signal, QSettings, QTimer, QSize, QProcess
-from PySide6.QtGui import QFont, QIcon, QPalette, QColor, QAction, QPixmap, QPainter
+                               QMenu, QSystemTrayIcon, QStyle, QInputDialog, QFormLayout,
+                               QSpinBox, QScrollArea, QGridLayout, QPlainTextEdit,
+                               QTableWidget, QTableWidgetItem, QHeaderView)
+from PySide6.QtCore import Qt, QObject, QThread, Signal, Slot, QSettings, QTimer, QSize, QProcess
+from PySide6.QtGui import (QFont, QIcon, QPalette, QColor, QAction, QPixmap, QPainter,
+                           QTextCursor, QTextCharFormat)
+from devtical_core import (DEFAULT_SETTINGS, BACKUP_ROOT, format_duration, format_size,
+                           read_sparse_info, load_manifest, HashCache, check_image,
+                           TOOL_SETTINGS, tool_registry, classify_device, index_firmware,
+                           firmware_entry_path, PortMonitor, port_label, FlashOperation,
+                           job_journal, describe_job, split_member_path)
+from rom_catalog import rom_catalog, ROM_LINK_STATUSES
 
 class ModernProgressBar(QProgressBar):
+    STALL_SECONDS = 15
+    
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.transfer = None
+        self.last_update = 0
+        self.stall_timer = QTimer(self)
+        self.stall_timer.timeout.connect(self.update_transfer_text)
         self.setStyleSheet("""
             QProgressBar {
                 border: 2px solid #2b2b2b;
@@ -34,6 +54,114 @@ class ModernProgressBar(QProgressBar):
             }
         """)
 
+    def set_transfer(self, transfer):
+        """Show per-partition progress, throughput and ETA from a transfer event"""
+        self.transfer = transfer
+        self.last_update = time.monotonic()
+        self.setValue(transfer["overall"])
+        self.update_transfer_text()
+        if not self.stall_timer.isActive():
+            self.stall_timer.start(1000)
+
+    def clear_transfer(self):
+        self.transfer = None
+        self.stall_timer.stop()
+        self.setFormat("%p%")
+
+    def update_transfer_text(self):
+        if not self.transfer:
+            return
+        transfer = self.transfer
+        parts = ["%p%", f"{transfer['partition']} {transfer['percent']:.0f}%"]
+        if transfer.get("rate"):
+            parts.append(f"{format_size(transfer['rate'])}/s")
+        if transfer.get("eta") is not None:
+            parts.append(f"ETA {format_duration(transfer['eta'])}")
+        idle = time.monotonic() - self.last_update
+        if idle >= self.STALL_SECONDS:
+            parts.append(f"⏸ no progress for {int(idle)}s")
+        self.setFormat(" · ".join(parts))
+
+LOG_DIR = os.path.join(os.path.expanduser("~"), ".devtical", "logs")
+
+class LogView(QPlainTextEdit):
+    """Bounded scrollback log that can be fed from any thread.
+
+    append() only queues the line, so worker threads can call it through a
+    direct signal connection without posting one Qt event per line. A timer
+    moves queued lines into the view as one block. The view keeps at most
+    max_lines lines; the full history is written to a log file on disk.
+    """
+    FLUSH_INTERVAL = 100
+    
+    def __init__(self, max_lines=5000, spill_name="devtical", parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_lines)
+        self.lock = threading.Lock()
+        self.pending = deque(maxlen=max_lines)
+        self.spill_name = spill_name
+        self.spill_path = None
+        self.spill_file = None
+        self.spill_dirty = False
+        
+        self.flush_timer = QTimer(self)
+        self.flush_timer.timeout.connect(self.flush)
+        self.flush_timer.start(self.FLUSH_INTERVAL)
+
+    def append(self, text):
+        line = str(text)
+        with self.lock:
+            # Lines beyond the scrollback cap fall out of the queue but are still spilled
+            self.pending.append(line)
+            self.write_spill(line)
+
+    def write_spill(self, line):
+        # After a write error the view keeps working from memory only
+        if self.spill_file is False:
+            return
+        try:
+            if self.spill_file is None:
+                os.makedirs(LOG_DIR, exist_ok=True)
+                file_name = f"{self.spill_name}-{time.strftime('%Y%m%d-%H%M%S')}.log"
+                self.spill_path = os.path.join(LOG_DIR, re.sub(r'[^A-Za-z0-9_.-]', '_', file_name))
+                self.spill_file = open(self.spill_path, 'a', encoding='utf-8')
+            self.spill_file.write(f"[{time.strftime('%H:%M:%S')}] {line}\n")
+            self.spill_dirty = True
+        except OSError:
+            self.disable_spill()
+
+    def disable_spill(self):
+        if self.spill_file:
+            try:
+                self.spill_file.close()
+            except OSError:
+                pass
+        self.spill_file = False
+
+    def flush(self):
+        with self.lock:
+            lines = list(self.pending)
+            self.pending.clear()
+            if self.spill_dirty and self.spill_file:
+                try:
+                    self.spill_file.flush()
+                except OSError:
+                    self.disable_spill()
+                self.spill_dirty = False
+        if lines:
+            self.appendPlainText("\n".join(lines))
+
+    def set_max_lines(self, max_lines):
+        with self.lock:
+            self.pending = deque(self.pending, maxlen=max_lines)
+        self.setMaximumBlockCount(max_lines)
+
+    def clear(self):
+        with self.lock:
+            self.pending.clear()
+        super().clear()
+
 class SettingsDialog(QDialog):
     def __init__(self, settings, parent=None):
         super().__init__(parent)
@@ -78,9 +206,18 @@ class SettingsDialog(QDialog):
         avb_layout.addWidget(self.avb_path)
         avb_layout.addWidget(self.avb_browse)
         
+        self.backup_dir = QLineEdit()
+        self.backup_dir.setPlaceholderText(BACKUP_ROOT)
+        self.backup_browse = QPushButton("Browse")
+        self.backup_browse.clicked.connect(lambda: self.browse_directory(self.backup_dir))
+        backup_layout = QHBoxLayout()
+        backup_layout.addWidget(self.backup_dir)
+        backup_layout.addWidget(self.backup_browse)
+        
         paths_layout.addRow("MTK Tool:", mtk_layout)
         paths_layout.addRow("EDL Tool:", edl_layout)
         paths_layout.addRow("AVB Tool:", avb_layout)
+        paths_layout.addRow("Backup Directory:", backup_layout)
         paths_group.setLayout(paths_layout)
         basic_layout.addWidget(paths_group)
 
@@ -124,10 +261,34 @@ class SettingsDialog(QDialog):
         self.dark_mode = QCheckBox("Enable Dark Mode")
         self.backup_enable = QCheckBox("Create backup before flashing")
         self.auto_detect = QCheckBox("Auto-detect devices on start")
+        self.sparse_convert = QCheckBox("Send mostly-empty raw images as sparse images (tool must support sparse)")
+        self.diff_flash = QCheckBox("Flash only changed partitions (compare device content first)")
+        self.journal_enable = QCheckBox("Record flash jobs so an interrupted flash can be resumed")
         
         options_layout.addWidget(self.dark_mode)
         options_layout.addWidget(self.backup_enable)
         options_layout.addWidget(self.auto_detect)
+        options_layout.addWidget(self.sparse_convert)
+        options_layout.addWidget(self.diff_flash)
+        options_layout.addWidget(self.journal_enable)
+        
+        stream_layout = QHBoxLayout()
+        stream_layout.addWidget(QLabel("Stream archive images through a pipe for:"))
+        self.archive_stream_types = QLineEdit()
+        self.archive_stream_types.setPlaceholderText("device types whose tool reads sequentially, e.g. xynos")
+        self.archive_stream_types.setToolTip("Other tools get archive members extracted to a temporary file, "
+                                             "since they need to seek in the image")
+        stream_layout.addWidget(self.archive_stream_types)
+        options_layout.addLayout(stream_layout)
+        
+        log_lines_layout = QHBoxLayout()
+        log_lines_layout.addWidget(QLabel("Log scrollback lines:"))
+        self.log_max_lines = QSpinBox()
+        self.log_max_lines.setRange(500, 1000000)
+        self.log_max_lines.setSingleStep(1000)
+        log_lines_layout.addWidget(self.log_max_lines)
+        log_lines_layout.addStretch()
+        options_layout.addLayout(log_lines_layout)
         options_group.setLayout(options_layout)
         basic_layout.addWidget(options_group)
         
@@ -222,6 +383,67 @@ class SettingsDialog(QDialog):
         xyn_layout.addStretch()
         tab_widget.addTab(xyn_tab, "XYN Client")
 
+        # Tool Session Tab
+        session_tab = QWidget()
+        session_layout = QVBoxLayout(session_tab)
+        
+        session_group = QGroupBox("Persistent Tool Session")
+        session_form = QFormLayout()
+        
+        self.session_enable = QCheckBox("Keep one tool process for the whole operation")
+        self.edl_session_cmd = QLineEdit()
+        self.mtk_session_cmd = QLineEdit()
+        self.spd_session_cmd = QLineEdit()
+        self.xyn_session_cmd = QLineEdit()
+        self.session_ok_pattern = QLineEdit()
+        self.session_error_pattern = QLineEdit()
+        
+        session_form.addRow("", self.session_enable)
+        session_form.addRow("EDL Session Command:", self.edl_session_cmd)
+        session_form.addRow("MTK Session Command:", self.mtk_session_cmd)
+        session_form.addRow("SPD Session Command:", self.spd_session_cmd)
+        session_form.addRow("XYN Session Command:", self.xyn_session_cmd)
+        session_form.addRow("Command OK Pattern:", self.session_ok_pattern)
+        session_form.addRow("Command Error Pattern:", self.session_error_pattern)
+        
+        session_group.setLayout(session_form)
+        session_layout.addWidget(session_group)
+        
+        session_info = QLabel(
+            "The session command starts the tool in a mode that reads one\n"
+            "command per line from stdin (the same text as the Flash Command).\n"
+            "Each command must end with a line matching the OK or Error pattern.\n"
+            "Leave a session command empty to start one process per partition.\n"
+            "Use {fdl1}, {fdl2} placeholders for SPD"
+        )
+        session_info.setWordWrap(True)
+        session_info.setStyleSheet("background-color: #2a2a2a; padding: 10px; border-radius: 5px;")
+        session_layout.addWidget(session_info)
+        
+        hash_group = QGroupBox("Device Hash Commands (Differential Flashing)")
+        hash_form = QFormLayout()
+        
+        self.edl_hash_cmd = QLineEdit()
+        self.mtk_hash_cmd = QLineEdit()
+        self.spd_hash_cmd = QLineEdit()
+        self.xyn_hash_cmd = QLineEdit()
+        
+        hash_form.addRow("EDL Hash Command:", self.edl_hash_cmd)
+        hash_form.addRow("MTK Hash Command:", self.mtk_hash_cmd)
+        hash_form.addRow("SPD Hash Command:", self.spd_hash_cmd)
+        hash_form.addRow("XYN Hash Command:", self.xyn_hash_cmd)
+        
+        hash_info = QLabel("Must print the SHA-256 of the first {size} bytes of {partition}. "
+                           "Leave empty to compare by reading the partition back with the Read Command.")
+        hash_info.setWordWrap(True)
+        hash_info.setStyleSheet("color: #888; font-size: 10px;")
+        hash_form.addRow("", hash_info)
+        
+        hash_group.setLayout(hash_form)
+        session_layout.addWidget(hash_group)
+        session_layout.addStretch()
+        tab_widget.addTab(session_tab, "Sessions")
+
         layout.addWidget(tab_widget)
 
         # Buttons
@@ -246,11 +468,17 @@ class SettingsDialog(QDialog):
         if file_path:
             line_edit.setText(file_path)
 
+    def browse_directory(self, line_edit):
+        directory = QFileDialog.getExistingDirectory(self, "Select Directory")
+        if directory:
+            line_edit.setText(directory)
+
     def load_settings(self):
         # Basic tools
         self.mtk_path.setText(self.settings.get("mtk_path", "mtk.py"))
         self.edl_path.setText(self.settings.get("edl_path", "edl.py"))
         self.avb_path.setText(self.settings.get("avb_path", "avbtool"))
+        self.backup_dir.setText(self.settings.get("backup_dir", ""))
         
         self.flash_cmd.setText(self.settings.get("flash_cmd", "--flash {partition} {file}"))
         self.erase_cmd.setText(self.settings.get("erase_cmd", "--erase {partition}"))
@@ -264,6 +492,11 @@ class SettingsDialog(QDialog):
         self.dark_mode.setChecked(self.settings.get("dark_mode", False))
         self.backup_enable.setChecked(self.settings.get("backup_enable", True))
         self.auto_detect.setChecked(self.settings.get("auto_detect", True))
+        self.sparse_convert.setChecked(self.settings.get("sparse_convert", False))
+        self.diff_flash.setChecked(self.settings.get("diff_flash", False))
+        self.archive_stream_types.setText(self.settings.get("archive_stream_types", ""))
+        self.journal_enable.setChecked(self.settings.get("journal_enable", True))
+        self.log_max_lines.setValue(int(self.settings.get("log_max_lines", 5000)))
         
         # SPD Client
         self.spd_path.setText(self.settings.get("spd_path", "spd.py"))
@@ -281,12 +514,26 @@ class SettingsDialog(QDialog):
         self.xyn_detect_cmd.setText(self.settings.get("xyn_detect_cmd", "detect"))
         self.xyn_partitions_cmd.setText(self.settings.get("xyn_partitions_cmd", "partitions"))
         self.xyn_adv_frp_cmd.setText(self.settings.get("xyn_adv_frp_cmd", "erase {partition} --force"))
+        
+        # Tool sessions
+        self.session_enable.setChecked(self.settings.get("session_enable", True))
+        self.edl_session_cmd.setText(self.settings.get("edl_session_cmd", ""))
+        self.mtk_session_cmd.setText(self.settings.get("mtk_session_cmd", ""))
+        self.spd_session_cmd.setText(self.settings.get("spd_session_cmd", ""))
+        self.xyn_session_cmd.setText(self.settings.get("xyn_session_cmd", ""))
+        self.session_ok_pattern.setText(self.settings.get("session_ok_pattern", r"^(OK|DONE)\b"))
+        self.session_error_pattern.setText(self.settings.get("session_error_pattern", r"^(ERR|ERROR|FAIL)"))
+        self.edl_hash_cmd.setText(self.settings.get("edl_hash_cmd", ""))
+        self.mtk_hash_cmd.setText(self.settings.get("mtk_hash_cmd", ""))
+        self.spd_hash_cmd.setText(self.settings.get("spd_hash_cmd", ""))
+        self.xyn_hash_cmd.setText(self.settings.get("xyn_hash_cmd", ""))
 
     def save_settings(self):
         # Basic tools
         self.settings["mtk_path"] = self.mtk_path.text()
         self.settings["edl_path"] = self.edl_path.text()
         self.settings["avb_path"] = self.avb_path.text()
+        self.settings["backup_dir"] = self.backup_dir.text()
         
         self.settings["flash_cmd"] = self.flash_cmd.text()
         self.settings["erase_cmd"] = self.erase_cmd.text()
@@ -300,6 +547,11 @@ class SettingsDialog(QDialog):
         self.settings["dark_mode"] = self.dark_mode.isChecked()
         self.settings["backup_enable"] = self.backup_enable.isChecked()
         self.settings["auto_detect"] = self.auto_detect.isChecked()
+        self.settings["sparse_convert"] = self.sparse_convert.isChecked()
+        self.settings["diff_flash"] = self.diff_flash.isChecked()
+        self.settings["archive_stream_types"] = self.archive_stream_types.text().strip()
+        self.settings["journal_enable"] = self.journal_enable.isChecked()
+        self.settings["log_max_lines"] = self.log_max_lines.value()
         
         # SPD Client
         self.settings["spd_path"] = self.spd_path.text()
@@ -318,54 +570,34 @@ class SettingsDialog(QDialog):
         self.settings["xyn_partitions_cmd"] = self.xyn_partitions_cmd.text()
         self.settings["xyn_adv_frp_cmd"] = self.xyn_adv_frp_cmd.text()
         
+        # Tool sessions
+        self.settings["session_enable"] = self.session_enable.isChecked()
+        self.settings["edl_session_cmd"] = self.edl_session_cmd.text()
+        self.settings["mtk_session_cmd"] = self.mtk_session_cmd.text()
+        self.settings["spd_session_cmd"] = self.spd_session_cmd.text()
+        self.settings["xyn_session_cmd"] = self.xyn_session_cmd.text()
+        self.settings["session_ok_pattern"] = self.session_ok_pattern.text()
+        self.settings["session_error_pattern"] = self.session_error_pattern.text()
+        self.settings["edl_hash_cmd"] = self.edl_hash_cmd.text()
+        self.settings["mtk_hash_cmd"] = self.mtk_hash_cmd.text()
+        self.settings["spd_hash_cmd"] = self.spd_hash_cmd.text()
+        self.settings["xyn_hash_cmd"] = self.xyn_hash_cmd.text()
+        
         self.accept()
 
     def reset_defaults(self):
-        default_settings = {
-            # Basic tools
-            "mtk_path": "mtk.py",
-            "edl_path": "edl.py", 
-            "avb_path": "avbtool",
-            "flash_cmd": "--flash {partition} {file}",
-            "erase_cmd": "--erase {partition}",
-            "read_cmd": "--read {partition} {file}",
-            "patch_cmd": "patch_vbmeta --input {input} --output {output}",
-            
-            # FRP Configuration
-            "basic_frp_partitions": "frp,metadata,userdata",
-            "advanced_frp_partitions": "frp,metadata,userdata,persist",
-            
-            "dark_mode": False,
-            "backup_enable": True,
-            "auto_detect": True,
-            
-            # SPD Client
-            "spd_path": "spd.py",
-            "spd_flash_cmd": "writepart {partition} {file} --fdl1 {fdl1} --fdl2 {fdl2}",
-            "spd_erase_cmd": "erasepart {partition} --fdl1 {fdl1} --fdl2 {fdl2}",
-            "spd_read_cmd": "readpart {partition} {file} --fdl1 {fdl1} --fdl2 {fdl2}",
-            "spd_extract_cmd": "extractpac {pac_file}",
-            "spd_adv_frp_cmd": "writepart {partition} zero.bin --fdl1 {fdl1} --fdl2 {fdl2}",
-            
-            # XYN Client
-            "xyn_path": "xyn_cli.py",
-            "xyn_flash_cmd": "write {partition} {file}",
-            "xyn_erase_cmd": "erase {partition} --force",
-            "xyn_read_cmd": "read {partition} {file}",
-            "xyn_detect_cmd": "detect",
-            "xyn_partitions_cmd": "partitions",
-            "xyn_adv_frp_cmd": "erase {partition} --force"
-        }
-        
-        for key, value in default_settings.items():
+        for key, value in DEFAULT_SETTINGS.items():
             self.settings[key] = value
         
         self.load_settings()
 
 class FileListItemWidget(QWidget):
-    def __init__(self, file_path, partition_name, parent=None):
+    def __init__(self, file_path, partition_name, image_size=None, parent=None):
         super().__init__(parent)
         self.file_path = file_path
+        # Known up front for archive members, which cannot be stat'ed
+        self.image_size = image_size
+        self.hash_status = "pending"
         self.setup_ui(partition_name)
 
     def setup_ui(self, partition_name):
@@ -406,90 +638,139 @@ class FileListItemWidget(QWidget):
         self.size_label.setStyleSheet("padding: 5px; color: #888;")
         layout.addWidget(self.size_label)
         
+        self.hash_label = QLabel("⏳")
+        self.hash_label.setToolTip("Integrity check pending")
+        layout.addWidget(self.hash_label)
+        
         layout.addStretch()
         self.setLayout(layout)
 
     def get_file_size(self):
+        if self.image_size is not None:
+            return f"📦 {format_size(self.image_size)}"
         try:
-            size = os.path.getsize(self.file_path)
-            for unit in ['B', 'KB', 'MB', 'GB']:
-                if size < 1024.0:
-                    return f"{size:.1f} {unit}"
-                size /= 1024.0
-            return f"{size:.1f} TB"
+            sparse_info = read_sparse_info(self.file_path)
+            if sparse_info:
+                text = (f"{format_size(sparse_info['data_size'])} data / "
+                        f"{format_size(sparse_info['expanded_size'])} sparse")
+                if sparse_info["truncated"]:
+                    text += " ⚠️ truncated"
+                return text
+            return format_size(os.path.getsize(self.file_path))
         except:
             return "N/A"
 
+    def set_hash_status(self, status, digest):
+        self.hash_status = status
+        icons = {"verified": "✅", "hashed": "🔒", "mismatch": "❌", "truncated": "❌", "pending": "⏳",
+                 "archived": "📦"}
+        tips = {
+            "verified": "Matches manifest",
+            "hashed": "No manifest entry",
+            "mismatch": "Does not match manifest",
+            "truncated": "Sparse image is truncated",
+            "archived": "Inside an archive, checked by its CRC while streaming",
+            "pending": "Integrity check pending"
+        }
+        self.hash_label.setText(icons.get(status, "⚠️"))
+        self.hash_label.setToolTip(f"{tips.get(status, status)}\nSHA-256: {digest}" if digest else tips.get(status, status))
+
     def is_checked(self):
         return self.checkbox.isChecked()
 
     def get_partition_name(self):
         return self.partition_edit.text().strip()
 
-class DeviceDetectionThread(QThread):
-    com_ports_signal = Signal(list)
+class HashWorker(QThread):
+    """Hash loaded flash files in a worker pool and check them against the manifest"""
+    file_hashed = Signal(str, str, str)
     log_signal = Signal(str)
     
-    def __init__(self, settings):
-        super().__init__()
-        self.settings = settings
+    def __init__(self, file_paths, manifest, hash_cache, parent=None):
+        super().__init__(parent)
+        self.file_paths = file_paths
+        self.manifest = manifest
+        self.hash_cache = hash_cache
+        self._is_running = True
 
-    def run(self):
-        self.log_signal.emit("🔍 Scanning for connected devices...")
-        actual_ports = []
-        
-        try:
-            import serial.tools.list_ports
-            ports = list(serial.tools.list_ports.comports())
-            
-            if not ports:
-                self.log_signal.emit("❌ No COM ports found")
-                self.com_ports_signal.emit([])
-                return
-            
-            for port in ports:
-                port_info = f"{port.device} - {port.description}"
-                actual_ports.append(port_info)
-                self.log_signal.emit(f"📡 Found: {port_info}")
-            
-            self.com_ports_signal.emit(actual_ports)
-            
-        except ImportError:
-            self.log_signal.emit("⚠️ pyserial not installed, using fallback detection")
-            # Fallback detection for Windows
-            if os.name == 'nt':
-                for i in range(1, 20):
-                    port_name = f"COM{i}"
-                    if os.path.exists(f"\\\\.\\{port_name}"):
-                        actual_ports.append(f"{port_name} - Unknown Device")
-            self.com_ports_signal.emit(actual_ports)
-
-class ToolValidator:
-    @staticmethod
-    def validate_tool(tool_path, tool_name):
-        if not tool_path:
-            return False, f"❌ {tool_name} path is empty"
-            
-        # Extract the actual command (in case it has arguments)
-        actual_tool = tool_path.split()[0] if ' ' in tool_path else tool_path
-        
-        # Check if it's a file that exists
-        if os.path.exists(actual_tool):
-            return True, f"✅ {tool_name} found: {tool_path}"
-        
-        # Check if it's in system PATH
-        import shutil
-        if shutil.which(actual_tool):
-            return True, f"✅ {tool_name} found in system PATH: {tool_path}"
+    def stop(self):
+        self._is_running = False
+
+    def check_file(self, file_path):
+        if not self._is_running:
+            return file_path, "pending", ""
             
-        return False, f"❌ {tool_name} not found: {tool_path}"
+        status, digest = check_image(file_path, self.manifest, self.hash_cache)
+        return file_path, status, digest
+
+    def run(self):
+        workers = min(4, os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self.check_file, path) for path in self.file_paths]
+            for future in as_completed(futures):
+                try:
+                    file_path, status, digest = future.result()
+                except Exception as e:
+                    self.log_signal.emit(f"⚠️ Hashing failed: {str(e)}")
+                    continue
+                self.file_hashed.emit(file_path, status, digest)
+        self.hash_cache.save()
+
+class DeviceMonitor(QObject):
+    """Qt side of PortMonitor: re-emits its events as signals on the GUI thread"""
+    port_added = Signal(dict)
+    port_removed = Signal(dict)
+    ports_scanned = Signal(list)
+    log_signal = Signal(str)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.monitor = PortMonitor()
+        self.table = self.monitor.table
+        self.monitor.port_added.connect(self.port_added.emit)
+        self.monitor.port_removed.connect(self.port_removed.emit)
+        self.monitor.scanned.connect(self.ports_scanned.emit)
+        self.monitor.log_signal.connect(self.log_signal.emit)
+
+    def start(self):
+        self.monitor.start()
+
+    def rescan(self):
+        self.monitor.rescan()
+
+    def stop(self):
+        self.monitor.stop()
 
 class TerminalWidget(QWidget):
+    MAX_LINES = 10000
+    MAX_PENDING_CHARS = 1024 * 1024
+    RENDER_INTERVAL = 50
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.process = None
+        # Output waiting to be rendered: (text, is_error) segments
+        self.pending = deque()
+        self.pending_chars = 0
+        self.dropped_chars = 0
+        self.stdout_decoder = None
+        self.stderr_decoder = None
+        
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.timeout.connect(self.render_pending)
+        
+        self.error_format = QTextCharFormat()
+        self.error_format.setForeground(QColor("#ff6b6b"))
+        self.normal_format = QTextCharFormat()
+        
         self.setup_ui()
-        self.start_shell()
+
+    def showEvent(self, event):
+        # The shell is only started the first time the tab is opened
+        super().showEvent(event)
+        if self.process is None:
+            self.start_shell()
 
     def setup_ui(self):
         layout = QVBoxLayout()
@@ -520,11 +801,12 @@ class TerminalWidget(QWidget):
         layout.addLayout(header_layout)
         
         # Terminal output
-        self.terminal_output = QTextEdit()
+        self.terminal_output = QPlainTextEdit()
         self.terminal_output.setFont(QFont("Consolas", 10))
         self.terminal_output.setReadOnly(True)
+        self.terminal_output.setMaximumBlockCount(self.MAX_LINES)
         self.terminal_output.setStyleSheet("""
-            QTextEdit {
+            QPlainTextEdit {
                 background-color: #1a1a1a;
                 color: #00ff00;
                 border: 1px solid #444;
@@ -567,7 +849,11 @@ class TerminalWidget(QWidget):
 
     def start_shell(self):
         """Start the appropriate shell for the current OS"""
-        self.terminal_output.append("🚀 Starting terminal session...\n")
+        self.write("🚀 Starting terminal session...\n")
+        
+        # Multibyte characters may be split across reads
+        self.stdout_decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.stderr_decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
         
         self.process = QProcess()
         self.process.readyReadStandardOutput.connect(self.read_output)
@@ -582,21 +868,21 @@ class TerminalWidget(QWidget):
         if os.name == 'nt':  # Windows
             shell = "cmd.exe"
             self.shell_label.setText("Windows Command Prompt")
-            self.terminal_output.append("💻 Windows Command Prompt (cmd.exe)\n")
+            self.write("💻 Windows Command Prompt (cmd.exe)\n")
         else:  # Linux/Mac
             shell = "/bin/bash"
             self.shell_label.setText("Bash Terminal")
-            self.terminal_output.append("🐧 Bash Terminal (/bin/bash)\n")
+            self.write("🐧 Bash Terminal (/bin/bash)\n")
         
-        self.terminal_output.append(f"📁 Working directory: {current_dir}\n")
-        self.terminal_output.append("─" * 50 + "\n")
+        self.write(f"📁 Working directory: {current_dir}\n")
+        self.write("─" * 50 + "\n")
         
         try:
             self.process.start(shell)
             if not self.process.waitForStarted(3000):
-                self.terminal_output.append("❌ Failed to start shell process\n")
+                self.write("❌ Failed to start shell process\n")
         except Exception as e:
-            self.terminal_output.append(f"❌ Error starting shell: {str(e)}\n")
+            self.write(f"❌ Error starting shell: {str(e)}\n")
 
     def execute_command(self):
         command = self.terminal_input.text().strip()
@@ -604,44 +890,74 @@ class TerminalWidget(QWidget):
             return
             
         # Show the command in terminal
-        self.terminal_output.append(f"$ {command}\n")
+        self.write(f"$ {command}\n")
         self.terminal_input.clear()
         
         if self.process and self.process.state() == QProcess.Running:
             # Add newline to execute the command
             self.process.write((command + "\n").encode())
         else:
-            self.terminal_output.append("❌ Shell process not running. Restart the terminal.\n")
+            self.write("❌ Shell process not running. Restart the terminal.\n")
+
+    def write(self, text, error=False):
+        """Queue text for the next batched render, keeping at most MAX_PENDING_CHARS"""
+        if not text:
+            return
+        self.pending.append((text, error))
+        self.pending_chars += len(text)
+        while self.pending_chars > self.MAX_PENDING_CHARS and len(self.pending) > 1:
+            dropped, _ = self.pending.popleft()
+            self.pending_chars -= len(dropped)
+            self.dropped_chars += len(dropped)
+        if not self.render_timer.isActive():
+            self.render_timer.start(self.RENDER_INTERVAL)
+
+    def render_pending(self):
+        if not self.pending:
+            return
+        scrollbar = self.terminal_output.verticalScrollBar()
+        # Only follow new output when the user is already at the bottom
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 2
+        
+        cursor = QTextCursor(self.terminal_output.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.beginEditBlock()
+        if self.dropped_chars:
+            cursor.insertText(f"\n… {self.dropped_chars} characters of output skipped …\n", self.error_format)
+            self.dropped_chars = 0
+        while self.pending:
+            text, error = self.pending.popleft()
+            cursor.insertText(text, self.error_format if error else self.normal_format)
+        cursor.endEditBlock()
+        self.pending_chars = 0
+        
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
 
     def read_output(self):
         if self.process:
-            data = self.process.readAllStandardOutput().data().decode()
-            self.terminal_output.append(data)
-            # Auto-scroll to bottom
-            self.terminal_output.verticalScrollBar().setValue(
-                self.terminal_output.verticalScrollBar().maximum()
-            )
+            data = self.process.readAllStandardOutput().data()
+            self.write(self.stdout_decoder.decode(data))
 
     def read_error(self):
         if self.process:
-            data = self.process.readAllStandardError().data().decode()
-            self.terminal_output.append(f"<span style='color: #ff6b6b;'>{data}</span>")
-            # Auto-scroll to bottom
-            self.terminal_output.verticalScrollBar().setValue(
-                self.terminal_output.verticalScrollBar().maximum()
-            )
+            data = self.process.readAllStandardError().data()
+            self.write(self.stderr_decoder.decode(data), error=True)
 
     def process_finished(self, exit_code, exit_status):
-        self.terminal_output.append(f"\n💥 Shell process finished with exit code: {exit_code}\n")
+        self.write(f"\n💥 Shell process finished with exit code: {exit_code}\n")
 
     def restart_shell(self):
-        self.terminal_output.append("\n🔄 Restarting shell...\n")
+        self.write("\n🔄 Restarting shell...\n")
         if self.process:
             self.process.kill()
             self.process.waitForFinished(1000)
         self.start_shell()
 
     def clear_terminal(self):
+        self.pending.clear()
+        self.pending_chars = 0
+        self.dropped_chars = 0
         self.terminal_output.clear()
 
     def closeEvent(self, event):
@@ -650,436 +966,606 @@ class TerminalWidget(QWidget):
             self.process.waitForFinished(1000)
         event.accept()
 class FlashThread(QThread):
+    """Runs a FlashOperation in a worker thread and re-emits its events as Qt signals"""
     log_signal = Signal(str)
     progress_signal = Signal(int)
+    transfer_signal = Signal(dict)
     finished_signal = Signal(bool, str)
     operation_started = Signal(str)
     
     def __init__(self, device_type, files, com_port, operation, settings):
         super().__init__()
-        self.device_type = device_type
-        self.files = files
-        self.com_port = com_port
-        self.operation = operation
-        self.settings = settings
-        self._is_running = True
-        self.fdl1_path = None
-        self.fdl2_path = None
-        self.pac_file_path = None
+        self.flash_operation = FlashOperation(device_type, files, com_port, operation, settings)
+        for name in FlashOperation.EVENT_NAMES:
+            getattr(self.flash_operation, name).connect(getattr(self, name).emit)
 
     def set_fdl_files(self, fdl1_path, fdl2_path):
-        self.fdl1_path = fdl1_path
-        self.fdl2_path = fdl2_path
+        self.flash_operation.set_fdl_files(fdl1_path, fdl2_path)
 
     def set_pac_file(self, pac_file_path):
-        self.pac_file_path = pac_file_path
+        self.flash_operation.set_pac_file(pac_file_path)
+
+    def set_device_table(self, device_table):
+        self.flash_operation.set_device_table(device_table)
+
+    def set_journal(self, journal, resume_job=None):
+        self.flash_operation.set_journal(journal, resume_job)
+
+    @property
+    def job_id(self):
+        return self.flash_operation.job_id
+
+    @property
+    def com_port(self):
+        return self.flash_operation.com_port
 
     def stop(self):
-        self._is_running = False
+        self.flash_operation.stop()
 
     def run(self):
-        try:
-            # Validate tools before starting
-            if not self.validate_tools():
-                self.finished_signal.emit(False, "Required tools not found")
-                return
-                
-            # For SPD devices, check if we have FDL files or PAC file
-            if self.device_type == "spreadtrum":
-                if not self.setup_spd_environment():
-                    self.finished_signal.emit(False, "SPD operation setup failed")
-                    return
-                
-            if self.operation == "flash":
-                self.perform_flash()
-            elif self.operation == "frp":
-                self.perform_frp_erase()
-            elif self.operation == "advance_frp":
-                self.perform_advanced_frp()
-            else:
-                self.log_signal.emit(f"❌ Unknown operation: {self.operation}")
-                self.finished_signal.emit(False, "Unknown operation")
-                
-        except Exception as e:
-            self.log_signal.emit(f"❌ Operation failed: {str(e)}")
-            self.finished_signal.emit(False, str(e))
+        self.flash_operation.run()
 
-    def setup_spd_environment(self):
-        """Setup FDL files for SPD operations"""
-        # If we have a PAC file, extract FDL files first
-        if self.pac_file_path and os.path.exists(self.pac_file_path):
-            self.log_signal.emit("📦 Extracting FDL files from PAC file...")
-            spd_tool = self.settings.get("spd_path", "spd.py")
-            extract_cmd = self.settings.get("spd_extract_cmd", "extractpac {pac_file}").format(
-                pac_file=self.pac_file_path)
-            
-            cmd = ["python", spd_tool] + extract_cmd.split()
-            
-            if not self.execute_command(cmd, "Extracting FDL from PAC"):
-                self.log_signal.emit("❌ Failed to extract FDL files from PAC")
-                return False
-            
-            # After extraction, FDL files should be in the same directory as PAC
-            pac_dir = os.path.dirname(self.pac_file_path)
-            self.fdl1_path = os.path.join(pac_dir, "FDL1.bin")
-            self.fdl2_path = os.path.join(pac_dir, "FDL2.bin")
-        
-        # Check if we have valid FDL files
-        if not self.fdl1_path or not os.path.exists(self.fdl1_path):
-            self.log_signal.emit("❌ FDL1.bin file not found or not provided")
-            return False
-            
-        if not self.fdl2_path or not os.path.exists(self.fdl2_path):
-            self.log_signal.emit("❌ FDL2.bin file not found or not provided")
-            return False
-            
-        self.log_signal.emit(f"✅ Using FDL1: {os.path.basename(self.fdl1_path)}")
-        self.log_signal.emit(f"✅ Using FDL2: {os.path.basename(self.fdl2_path)}")
-        return True
+class StationScheduler(QObject):
+    """Runs one FlashThread pipeline per port with a bounded number in flight"""
+    port_started = Signal(str)
+    port_finished = Signal(str, bool, str)
+    all_finished = Signal(list)
+    
+    def __init__(self, settings, parent=None):
+        super().__init__(parent)
+        self.settings = settings
+        self.max_parallel = 1
+        self.pending = []
+        self.threads = {}
+        self.retired = []
+        self.results = []
+        self._stopping = False
+        self.device_table = None
+
+    def start(self, jobs, max_parallel):
+        """jobs is a list of (com_port, device_type, files, fdl1, fdl2, pac_file)"""
+        self.pending = list(jobs)
+        self.results = []
+        self.max_parallel = max(1, max_parallel)
+        self._stopping = False
+        self.launch_next()
+
+    def create_thread(self, job):
+        com_port, device_type, files, fdl1, fdl2, pac_file = job
+        thread = FlashThread(device_type, files, com_port, "flash", self.settings)
+        if self.device_table:
+            thread.set_device_table(self.device_table)
+        if self.settings.get("journal_enable", True):
+            thread.set_journal(job_journal())
+        if device_type == "spreadtrum":
+            thread.set_fdl_files(fdl1, fdl2)
+            if pac_file:
+                thread.set_pac_file(pac_file)
+        return thread
+
+    def launch_next(self):
+        while self.pending and len(self.threads) < self.max_parallel and not self._stopping:
+            job = self.pending.pop(0)
+            com_port = job[0]
+            thread = self.create_thread(job)
+            # Bound slots of this object, so both are queued to the GUI thread
+            thread.finished_signal.connect(self.on_thread_finished)
+            thread.finished.connect(self.on_thread_retired)
+            self.threads[com_port] = thread
+            self.port_started.emit(com_port)
+            thread.start()
+        
+        if not self.threads:
+            if self._stopping:
+                for job in self.pending:
+                    self.results.append((job[0], False, "Not started (stopped)"))
+                self.pending = []
+            self.all_finished.emit(self.results)
+
+    @Slot(bool, str)
+    def on_thread_finished(self, success, message):
+        self.on_port_finished(self.sender().com_port, success, message)
+
+    @Slot()
+    def on_thread_retired(self):
+        if self.sender() in self.retired:
+            self.retired.remove(self.sender())
+
+    def on_port_finished(self, com_port, success, message):
+        thread = self.threads.pop(com_port, None)
+        # A port reports only once, even if its thread emits finished_signal again
+        if thread is None:
+            return
+        # Keep the QThread alive until run() has actually returned
+        self.retired.append(thread)
+        self.results.append((com_port, success, message))
+        self.port_finished.emit(com_port, success, message)
+        self.launch_next()
 
-    def validate_tools(self):
-        if self.device_type == "qualcomm":
-            tool_path = self.settings.get("edl_path", "edl.py")
-            tool_name = "Qualcomm EDL Tool"
-        elif self.device_type == "mtk":
-            tool_path = self.settings.get("mtk_path", "mtk.py")
-            tool_name = "MediaTek MTK Tool"
-        elif self.device_type == "spreadtrum":
-            tool_path = self.settings.get("spd_path", "spd.py")
-            tool_name = "SPD Client"
-        elif self.device_type == "xynos":
-            tool_path = self.settings.get("xyn_path", "xyn_cli.py")
-            tool_name = "XYN Client"
-        else:
-            self.log_signal.emit("❌ Unknown device type")
-            return False
-            
-        valid, message = ToolValidator.validate_tool(tool_path, tool_name)
-        self.log_signal.emit(message)
-        
-        if not valid:
-            return False
-            
-        # For advanced FRP, also validate AVB tool for Qualcomm/MTK
-        if self.operation == "advance_frp" and self.device_type in ["qualcomm", "mtk"]:
-            avb_tool = self.settings.get("avb_path", "avbtool")
-            valid_avb, message_avb = ToolValidator.validate_tool(avb_tool, "AVB Tool")
-            self.log_signal.emit(message_avb)
-            if not valid_avb:
-                return False
-                
-        return True
+    def thread_for(self, com_port):
+        return self.threads.get(com_port)
 
-    def get_frp_partitions(self, frp_type="basic"):
-        """Get FRP partitions from settings"""
-        if frp_type == "advanced":
-            partitions_str = self.settings.get("advanced_frp_partitions", "frp,metadata,userdata,persist")
-        else:
-            partitions_str = self.settings.get("basic_frp_partitions", "frp,metadata,userdata")
-        
-        partitions = [p.strip() for p in partitions_str.split(',') if p.strip()]
-        return partitions
+    def is_running(self):
+        return bool(self.threads)
 
-    def execute_command(self, cmd, description):
-        if not self._is_running:
-            return False
-            
-        self.log_signal.emit(f"🚀 {description}")
-        self.log_signal.emit(f"💻 Executing: {' '.join(cmd)}")
+    def stop(self):
+        self._stopping = True
+        for thread in self.threads.values():
+            thread.stop()
+
+class StationPortWidget(QGroupBox):
+    def __init__(self, device, device_type, max_lines=5000, parent=None):
+        super().__init__(device, parent)
+        self.com_port = device.split(' - ')[0]
+        self.device_type = device_type
         
-        try:
-            # For simulation/demo purposes - remove this in production
-            tool_exists = False
-            if any(x in ' '.join(cmd).lower() for x in ['mtk.py', 'edl.py', 'avbtool', 'spd.py', 'xyn_cli.py']):
-                if 'spd.py' in ' '.join(cmd).lower():
-                    tool_exists = os.path.exists(self.settings.get("spd_path", "spd.py").split()[0])
-                elif 'xyn_cli.py' in ' '.join(cmd).lower():
-                    tool_exists = os.path.exists(self.settings.get("xyn_path", "xyn_cli.py").split()[0])
-                else:
-                    tool_exists = any(os.path.exists(tool.split()[0]) for tool in [
-                        self.settings.get("mtk_path"), 
-                        self.settings.get("edl_path"), 
-                        self.settings.get("avb_path")
-                    ])
-                
-                if not tool_exists:
-                    self.log_signal.emit("⚠️ Simulation mode: Tools not found, simulating operation")
-                    # Simulate operation delay
-                    import time
-                    steps = 5
-                    for i in range(steps):
-                        if not self._is_running:
-                            return False
-                        time.sleep(0.5)
-                        self.progress_signal.emit(int((i + 1) * 100 / steps))
-                    return True
-            
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, 
-                                     text=True, bufsize=1, universal_newlines=True)
-            
-            # Read output in real-time
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    self.log_signal.emit(output.strip())
-                    
-                if not self._is_running:
-                    process.terminate()
-                    break
-                    
-            return process.returncode == 0
-            
-        except Exception as e:
-            self.log_signal.emit(f"❌ Command failed: {str(e)}")
-            return False
-
-    def perform_flash(self):
-        self.operation_started.emit("flash")
-        total_files = len(self.files)
+        layout = QVBoxLayout(self)
+        self.status_label = QLabel(f"⏳ Waiting ({device_type.capitalize()})")
+        layout.addWidget(self.status_label)
         
-        for i, (file_path, partition_name) in enumerate(self.files):
-            if not self._is_running:
-                break
-                
-            progress = int((i / total_files) * 100)
-            self.progress_signal.emit(progress)
-            
-            self.log_signal.emit(f"📤 Flashing {os.path.basename(file_path)} to {partition_name}...")
-            
-            if self.device_type == "qualcomm":
-                tool = self.settings.get("edl_path", "edl.py")
-                flash_cmd = self.settings.get("flash_cmd", "--flash {partition} {file}").format(
-                    partition=partition_name, file=file_path)
-                cmd = ["python", tool, "--port", self.com_port] + flash_cmd.split()
-                
-            elif self.device_type == "mtk":
-                tool = self.settings.get("mtk_path", "mtk.py")
-                flash_cmd = self.settings.get("flash_cmd", "--flash {partition} {file}").format(
-                    partition=partition_name, file=file_path)
-                cmd = ["python", tool, "--port", self.com_port] + flash_cmd.split()
-                
-            elif self.device_type == "spreadtrum":
-                tool = self.settings.get("spd_path", "spd.py")
-                flash_cmd = self.settings.get("spd_flash_cmd", "writepart {partition} {file} --fdl1 {fdl1} --fdl2 {fdl2}").format(
-                    partition=partition_name, file=file_path, fdl1=self.fdl1_path, fdl2=self.fdl2_path)
-                cmd = ["python", tool, self.com_port] + flash_cmd.split()
-                
-            elif self.device_type == "xynos":
-                tool = self.settings.get("xyn_path", "xyn_cli.py")
-                flash_cmd = self.settings.get("xyn_flash_cmd", "write {partition} {file}").format(
-                    partition=partition_name, file=file_path)
-                cmd = ["python", tool] + flash_cmd.split()
-            
-            if not self.execute_command(cmd, f"Flashing {partition_name}"):
-                self.finished_signal.emit(False, f"Failed to flash {partition_name}")
-                return
+        self.progress_bar = ModernProgressBar()
+        self.progress_bar.setValue(0)
+        layout.addWidget(self.progress_bar)
         
-        self.progress_signal.emit(100)
-        self.finished_signal.emit(True, "Flash completed successfully")
+        self.log_text = LogView(max_lines, f"station-{self.com_port}")
+        self.log_text.setFont(QFont("Consolas", 8))
+        self.log_text.setMinimumHeight(120)
+        layout.addWidget(self.log_text)
 
-    def perform_frp_erase(self):
-        """Basic FRP erase for all device types"""
-        self.operation_started.emit("frp")
-        partitions = self.get_frp_partitions("basic")
-        
-        if not partitions:
-            self.log_signal.emit("❌ No FRP partitions configured")
-            self.finished_signal.emit(False, "No FRP partitions configured")
-            return
-            
-        self.log_signal.emit(f"🧹 Erasing partitions: {', '.join(partitions)}")
-        
-        for i, partition in enumerate(partitions):
-            if not self._is_running:
-                break
-                
-            progress = int((i / len(partitions)) * 100)
-            self.progress_signal.emit(progress)
-            
-            self.log_signal.emit(f"🧹 Erasing {partition}...")
-            
-            if self.device_type == "qualcomm":
-                tool = self.settings.get("edl_path", "edl.py")
-                erase_cmd = self.settings.get("erase_cmd", "--erase {partition}").format(partition=partition)
-                cmd = ["python", tool, "--port", self.com_port] + erase_cmd.split()
-                
-            elif self.device_type == "mtk":
-                tool = self.settings.get("mtk_path", "mtk.py")
-                erase_cmd = self.settings.get("erase_cmd", "--erase {partition}").format(partition=partition)
-                cmd = ["python", tool, "--port", self.com_port] + erase_cmd.split()
-                
-            elif self.device_type == "spreadtrum":
-                tool = self.settings.get("spd_path", "spd.py")
-                erase_cmd = self.settings.get("spd_erase_cmd", "erasepart {partition} --fdl1 {fdl1} --fdl2 {fdl2}").format(
-                    partition=partition, fdl1=self.fdl1_path, fdl2=self.fdl2_path)
-                cmd = ["python", tool, self.com_port] + erase_cmd.split()
-                
-            elif self.device_type == "xynos":
-                tool = self.settings.get("xyn_path", "xyn_cli.py")
-                erase_cmd = self.settings.get("xyn_erase_cmd", "erase {partition} --force").format(partition=partition)
-                cmd = ["python", tool] + erase_cmd.split()
-            
-            if not self.execute_command(cmd, f"Erasing {partition}"):
-                self.log_signal.emit(f"⚠️ Failed to erase {partition}, continuing...")
-        
-        self.progress_signal.emit(100)
-        self.finished_signal.emit(True, "Basic FRP erase completed")
-
-    def perform_advanced_frp(self):
-        """Advanced FRP for ALL device types with appropriate methods"""
-        self.operation_started.emit("advance_frp")
-        
-        if self.device_type in ["qualcomm", "mtk"]:
-            self.perform_standard_advanced_frp()
-        elif self.device_type == "spreadtrum":
-            self.perform_spd_advanced_frp()
-        elif self.device_type == "xynos":
-            self.perform_xyn_advanced_frp()
-        else:
-            self.finished_signal.emit(False, "Advanced FRP not supported for this device type")
+    def attach(self, thread):
+        thread.log_signal.connect(self.log_text.append, Qt.DirectConnection)
+        thread.progress_signal.connect(self.progress_bar.setValue)
+        thread.transfer_signal.connect(self.progress_bar.set_transfer)
+        self.status_label.setText("🚀 Flashing...")
 
-    def perform_standard_advanced_frp(self):
-        """Advanced FRP for Qualcomm/MTK with vbmeta patching"""
-        self.log_signal.emit("🔧 Starting Advanced FRP (Qualcomm/MTK)...")
-        
-        # Read vbmeta
-        self.log_signal.emit("📖 Reading vbmeta partition...")
-        vbmeta_original = "vbmeta_original.img"
-        
-        if self.device_type == "qualcomm":
-            tool = self.settings.get("edl_path", "edl.py")
-            read_cmd = self.settings.get("read_cmd", "--read {partition} {file}").format(
-                partition="vbmeta", file=vbmeta_original)
+    def set_result(self, success, message):
+        self.progress_bar.clear_transfer()
+        if success:
+            self.progress_bar.setValue(100)
+            self.status_label.setText(f"✅ {message}")
         else:
-            tool = self.settings.get("mtk_path", "mtk.py")
-            read_cmd = self.settings.get("read_cmd", "--read {partition} {file}").format(
-                partition="vbmeta", file=vbmeta_original)
+            self.status_label.setText(f"❌ {message}")
+        self.log_text.append(f"{'✅' if success else '❌'} {message}")
+
+class StationDialog(QDialog):
+    """Flash the same file set to every detected port in parallel"""
+    def __init__(self, devices, files, settings, fdl1_path=None, fdl2_path=None, pac_file_path=None,
+                 device_table=None, parent=None):
+        super().__init__(parent)
+        self.devices = devices
+        self.files = files
+        self.settings = settings
+        self.fdl1_path = fdl1_path
+        self.fdl2_path = fdl2_path
+        self.pac_file_path = pac_file_path
+        self.port_widgets = {}
         
-        cmd = ["python", tool, "--port", self.com_port] + read_cmd.split()
+        self.scheduler = StationScheduler(settings, self)
+        self.scheduler.device_table = device_table
+        self.scheduler.port_started.connect(self.on_port_started)
+        self.scheduler.port_finished.connect(self.on_port_finished)
+        self.scheduler.all_finished.connect(self.on_all_finished)
         
-        if not self.execute_command(cmd, "Reading vbmeta"):
-            self.finished_signal.emit(False, "Failed to read vbmeta")
-            return
+        self.setWindowTitle("🏭 Station Mode")
+        self.setMinimumSize(1000, 700)
+        self.setup_ui()
 
-        # Erase advanced FRP partitions
-        partitions = self.get_frp_partitions("advanced")
-        self.log_signal.emit(f"🧹 Erasing advanced partitions: {', '.join(partitions)}")
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel(f"{len(self.files)} files → {len(self.devices)} ports"))
+        controls.addStretch()
+        controls.addWidget(QLabel("Max parallel:"))
+        self.parallel_spin = QSpinBox()
+        self.parallel_spin.setRange(1, 64)
+        self.parallel_spin.setValue(int(self.settings.get("station_max_parallel", 4)))
+        controls.addWidget(self.parallel_spin)
+        
+        self.start_btn = QPushButton("🚀 Start All")
+        self.start_btn.clicked.connect(self.start_all)
+        controls.addWidget(self.start_btn)
+        
+        self.stop_btn = QPushButton("⏹️ Stop All")
+        self.stop_btn.clicked.connect(self.stop_all)
+        self.stop_btn.setEnabled(False)
+        controls.addWidget(self.stop_btn)
+        layout.addLayout(controls)
+        
+        # One pane per port
+        grid_widget = QWidget()
+        grid = QGridLayout(grid_widget)
+        columns = 2 if len(self.devices) > 1 else 1
+        for index, device in enumerate(self.devices):
+            port = self.scheduler.device_table.get(device.split(' - ')[0]) if self.scheduler.device_table else None
+            device_type, _ = classify_device(device, port)
+            port_widget = StationPortWidget(device, device_type, int(self.settings.get("log_max_lines", 5000)))
+            self.port_widgets[port_widget.com_port] = port_widget
+            grid.addWidget(port_widget, index // columns, index % columns)
+        
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(grid_widget)
+        layout.addWidget(scroll)
+        
+        self.summary_label = QLabel("Ready")
+        self.summary_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.summary_label)
+
+    def start_all(self):
+        jobs = []
+        for com_port, port_widget in self.port_widgets.items():
+            if port_widget.device_type == "unknown":
+                port_widget.set_result(False, "Unknown device type, skipped")
+                continue
+            jobs.append((com_port, port_widget.device_type, self.files,
+                         self.fdl1_path, self.fdl2_path, self.pac_file_path))
+        
+        if not jobs:
+            QMessageBox.warning(self, "No Devices", "None of the detected ports has a known device type.")
+            return
         
-        for partition in partitions:
-            if not self._is_running:
-                break
-                
-            self.log_signal.emit(f"🧹 Erasing {partition}...")
-            
-            if self.device_type == "qualcomm":
-                erase_cmd = self.settings.get("erase_cmd", "--erase {partition}").format(partition=partition)
-            else:
-                erase_cmd = self.settings.get("erase_cmd", "--erase {partition}").format(partition=partition)
-            
-            cmd = ["python", tool, "--port", self.com_port] + erase_cmd.split()
-            
-            if not self.execute_command(cmd, f"Erasing {partition}"):
-                self.log_signal.emit(f"⚠️ Failed to erase {partition}, continuing...")
+        self.settings["station_max_parallel"] = self.parallel_spin.value()
+        self.start_btn.setEnabled(False)
+        self.parallel_spin.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+        self.summary_label.setText(f"Running {len(jobs)} pipelines, {self.parallel_spin.value()} at a time...")
+        self.scheduler.start(jobs, self.parallel_spin.value())
 
-        if not self._is_running:
-            return
+    def stop_all(self):
+        self.scheduler.stop()
+        self.stop_btn.setEnabled(False)
+        self.summary_label.setText("Stopping...")
 
-        # Patch vbmeta
-        self.log_signal.emit("🔧 Patching vbmeta...")
-        vbmeta_patched = "vbmeta_patched.img"
-        avb_tool = self.settings.get("avb_path", "avbtool")
-        patch_cmd = self.settings.get("patch_cmd", "patch_vbmeta --input {input} --output {output}").format(
-            input=vbmeta_original, output=vbmeta_patched)
-        
-        cmd = [avb_tool] + patch_cmd.split()
-        
-        if not self.execute_command(cmd, "Patching vbmeta"):
-            self.finished_signal.emit(False, "Failed to patch vbmeta")
-            return
+    def on_port_started(self, com_port):
+        self.port_widgets[com_port].attach(self.scheduler.thread_for(com_port))
 
-        # Flash patched vbmeta
-        self.log_signal.emit("📤 Flashing patched vbmeta...")
-        if self.device_type == "qualcomm":
-            flash_cmd = self.settings.get("flash_cmd", "--flash {partition} {file}").format(
-                partition="vbmeta", file=vbmeta_patched)
-        else:
-            flash_cmd = self.settings.get("flash_cmd", "--flash {partition} {file}").format(
-                partition="vbmeta", file=vbmeta_patched)
+    def on_port_finished(self, com_port, success, message):
+        self.port_widgets[com_port].set_result(success, message)
+
+    def on_all_finished(self, results):
+        self.start_btn.setEnabled(True)
+        self.parallel_spin.setEnabled(True)
+        self.stop_btn.setEnabled(False)
         
-        cmd = ["python", tool, "--port", self.com_port] + flash_cmd.split()
+        passed = sum(1 for _, success, _ in results if success)
+        self.summary_label.setText(f"Finished: {passed}/{len(results)} ports successful")
         
-        if not self.execute_command(cmd, "Flashing patched vbmeta"):
-            self.finished_signal.emit(False, "Failed to flash patched vbmeta")
-            return
+        lines = [f"{'✅' if success else '❌'} {com_port}: {message}" for com_port, success, message in results]
+        QMessageBox.information(self, "Station Results", "\n".join(lines) or "No ports were flashed")
 
-        self.progress_signal.emit(100)
-        self.finished_signal.emit(True, "Advanced FRP completed")
+    def closeEvent(self, event):
+        if self.scheduler.is_running():
+            reply = QMessageBox.question(self, "Operation in Progress",
+                                       "Ports are still flashing. Stop them and close?",
+                                       QMessageBox.Yes | QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                event.ignore()
+                return
+            self.scheduler.stop()
+            for thread in list(self.scheduler.threads.values()):
+                thread.wait(2000)
+        event.accept()
 
-    def perform_spd_advanced_frp(self):
-        """Advanced FRP for Spreadtrum/Unisoc devices"""
-        self.log_signal.emit("🔧 Starting Advanced FRP (Spreadtrum/Unisoc)...")
-        
-        partitions = self.get_frp_partitions("advanced")
-        self.log_signal.emit(f"🧹 Erasing advanced partitions: {', '.join(partitions)}")
-        
-        tool = self.settings.get("spd_path", "spd.py")
-        
-        for i, partition in enumerate(partitions):
-            if not self._is_running:
-                break
-                
-            progress = int((i / len(partitions)) * 100)
-            self.progress_signal.emit(progress)
-            
-            self.log_signal.emit(f"🧹 Advanced erase {partition}...")
-            
-            # Use advanced FRP command for SPD
-            adv_frp_cmd = self.settings.get("spd_adv_frp_cmd", "writepart {partition} zero.bin --fdl1 {fdl1} --fdl2 {fdl2}").format(
-                partition=partition, fdl1=self.fdl1_path, fdl2=self.fdl2_path)
-            
-            cmd = ["python", tool, self.com_port] + adv_frp_cmd.split()
-            
-            if not self.execute_command(cmd, f"Advanced FRP on {partition}"):
-                self.log_signal.emit(f"⚠️ Failed advanced FRP on {partition}, continuing...")
-        
-        self.progress_signal.emit(100)
-        self.finished_signal.emit(True, "Advanced FRP completed for Spreadtrum")
+class RomCatalogDialog(QDialog):
+    """Browse what the ROM scraper has catalogued: devices, links and download status"""
+    COLUMNS = ("Brand", "Device", "File", "Type", "Status", "Size", "Link")
 
-    def perform_xyn_advanced_frp(self):
-        """Advanced FRP for Exynos devices"""
-        self.log_signal.emit("🔧 Starting Advanced FRP (Exynos)...")
-        
-        partitions = self.get_frp_partitions("advanced")
-        self.log_signal.emit(f"🧹 Erasing advanced partitions: {', '.join(partitions)}")
-        
-        tool = self.settings.get("xyn_path", "xyn_cli.py")
-        
-        for i, partition in enumerate(partitions):
-            if not self._is_running:
-                break
-                
-            progress = int((i / len(partitions)) * 100)
-            self.progress_signal.emit(progress)
-            
-            self.log_signal.emit(f"🧹 Advanced erase {partition}...")
-            
-            # Use advanced FRP command for XYN
-            adv_frp_cmd = self.settings.get("xyn_adv_frp_cmd", "erase {partition} --force").format(partition=partition)
-            
-            cmd = ["python", tool] + adv_frp_cmd.split()
-            
-            if not self.execute_command(cmd, f"Advanced FRP on {partition}"):
-                self.log_signal.emit(f"⚠️ Failed advanced FRP on {partition}, continuing...")
-        
-        self.progress_signal.emit(100)
-        self.finished_signal.emit(True, "Advanced FRP completed for Exynos")
+    def __init__(self, catalog, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self.setWindowTitle("🗂️ ROM Catalog")
+        self.setMinimumSize(1000, 600)
+        self.setup_ui()
+        self.refresh()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        
+        filters = QHBoxLayout()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search device or file name...")
+        self.search_edit.returnPressed.connect(self.refresh)
+        filters.addWidget(self.search_edit)
+        self.brand_combo = QComboBox()
+        self.brand_combo.addItem("All brands", None)
+        for brand in self.catalog.brands():
+            self.brand_combo.addItem(brand["name"], brand["name"])
+        self.brand_combo.currentIndexChanged.connect(self.refresh)
+        filters.addWidget(self.brand_combo)
+        self.status_combo = QComboBox()
+        self.status_combo.addItem("Any status", None)
+        for status in ROM_LINK_STATUSES:
+            self.status_combo.addItem(status, status)
+        self.status_combo.currentIndexChanged.connect(self.refresh)
+        filters.addWidget(self.status_combo)
+        search_btn = QPushButton("🔍 Search")
+        search_btn.clicked.connect(self.refresh)
+        filters.addWidget(search_btn)
+        layout.addLayout(filters)
+        
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+        
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+    def refresh(self):
+        rows = self.catalog.search(self.search_edit.text().strip(), self.status_combo.currentData(),
+                                   self.brand_combo.currentData())
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(rows))
+        for index, row in enumerate(rows):
+            values = (row["brand"], row["device"], row["file_name"], row["type"], row["status"],
+                      format_size(row["size"]) if row["size"] else "", row["view_url"])
+            for column, value in enumerate(values):
+                self.table.setItem(index, column, QTableWidgetItem(value or ""))
+        self.table.setSortingEnabled(True)
+        self.table.resizeColumnsToContents()
+        
+        counts = self.catalog.summary()
+        links = ", ".join(f"{counts.get(status, 0)} {status}" for status in ROM_LINK_STATUSES)
+        self.summary_label.setText(f"{counts['brands']} brands, {counts['devices']} devices, links: {links} "
+                                   f"— showing {len(rows)}")
+
+class StartupProfile:
+    """Wall-clock time spent in each start-up phase, printed with --startup-profile"""
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.last = STARTUP_STARTED
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        if not self.enabled:
+            return
+        total = sum(seconds for _, seconds in self.phases)
+        print("⏱️ Start-up profile:", file=sys.stderr)
+        for phase, seconds in self.phases:
+            print(f"  {phase:<24} {seconds * 1000:8.1f} ms", file=sys.stderr)
+        print(f"  {'total':<24} {total * 1000:8.1f} ms", file=sys.stderr, flush=True)
+
+# Theme stylesheets are module constants so they are built once, not on every toggle
+DARK_STYLESHEET = """
+    QMainWindow {
+        background-color: #1e1e1e;
+    }
+    QWidget {
+        background-color: #1e1e1e;
+        color: #ffffff;
+    }
+    QGroupBox {
+        font-weight: bold;
+        border: 2px solid #444;
+        border-radius: 8px;
+        margin-top: 1ex;
+        padding-top: 12px;
+        background-color: #2d2d2d;
+    }
+    QGroupBox::title {
+        subcontrol-origin: margin;
+        left: 12px;
+        padding: 0 8px 0 8px;
+        color: #ffffff;
+        background-color: #2d2d2d;
+    }
+    QPushButton {
+        background-color: #404040;
+        border: 2px solid #555;
+        border-radius: 6px;
+        color: white;
+        padding: 8px 12px;
+        font-weight: bold;
+        min-width: 80px;
+    }
+    QPushButton:hover {
+        background-color: #4a4a4a;
+        border: 2px solid #666;
+    }
+    QPushButton:pressed {
+        background-color: #303030;
+    }
+    QPushButton:disabled {
+        background-color: #2a2a2a;
+        color: #666;
+        border: 2px solid #333;
+    }
+    QListWidget {
+        background-color: #252525;
+        color: white;
+        border: 1px solid #444;
+        border-radius: 4px;
+        outline: none;
+    }
+    QListWidget::item {
+        padding: 2px;
+        border-bottom: 1px solid #333;
+    }
+    QListWidget::item:selected {
+        background-color: #3a3a3a;
+    }
+    QListWidget::item:alternate {
+        background-color: #2a2a2a;
+    }
+    QTextEdit, QPlainTextEdit {
+        background-color: #1a1a1a;
+        color: #00ff00;
+        border: 1px solid #444;
+        border-radius: 4px;
+        font-family: Consolas, monospace;
+    }
+    QLineEdit {
+        background-color: #2b2b2b;
+        color: white;
+        border: 1px solid #555;
+        border-radius: 4px;
+        padding: 6px;
+        selection-background-color: #0078D7;
+    }
+    QLineEdit:focus {
+        border: 1px solid #0078D7;
+        background-color: #333333;
+    }
+    QLabel {
+        color: #ffffff;
+    }
+    QProgressBar {
+        border: 2px solid #444;
+        border-radius: 8px;
+        text-align: center;
+        background-color: #252525;
+        color: white;
+        font-weight: bold;
+    }
+    QProgressBar::chunk {
+        background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
+            stop:0 #0078D7, stop:0.5 #0091FF, stop:1 #00B7FF);
+        border-radius: 6px;
+    }
+    QToolBar {
+        background-color: #2d2d2d;
+        border: none;
+        spacing: 5px;
+    }
+    QToolButton {
+        background-color: transparent;
+        border: 1px solid transparent;
+        border-radius: 4px;
+        padding: 5px;
+    }
+    QToolButton:hover {
+        background-color: #404040;
+        border: 1px solid #555;
+    }
+    QSplitter::handle {
+        background-color: #444;
+    }
+    QSplitter::handle:hover {
+        background-color: #555;
+    }
+    QStatusBar {
+        background-color: #2d2d2d;
+        color: #cccccc;
+    }
+    QTabWidget::pane {
+        border: 1px solid #444;
+        background-color: #2d2d2d;
+    }
+    QTabBar::tab {
+        background-color: #404040;
+        color: white;
+        padding: 8px 16px;
+        border: 1px solid #555;
+        border-bottom: none;
+        border-top-left-radius: 4px;
+        border-top-right-radius: 4px;
+    }
+    QTabBar::tab:selected {
+        background-color: #0078D7;
+        color: white;
+    }
+    QTabBar::tab:hover {
+        background-color: #4a4a4a;
+    }
+"""
+
+LIGHT_STYLESHEET = """
+    QGroupBox {
+        font-weight: bold;
+        border: 2px solid #ccc;
+        border-radius: 8px;
+        margin-top: 1ex;
+        padding-top: 12px;
+        background-color: #f9f9f9;
+    }
+    QGroupBox::title {
+        subcontrol-origin: margin;
+        left: 12px;
+        padding: 0 8px 0 8px;
+        background-color: #f9f9f9;
+    }
+    QPushButton {
+        background-color: #f0f0f0;
+        border: 2px solid #ccc;
+        border-radius: 6px;
+        padding: 8px 12px;
+        font-weight: bold;
+        min-width: 80px;
+    }
+    QPushButton:hover {
+        background-color: #e0e0e0;
+        border: 2px solid #bbb;
+    }
+    QPushButton:pressed {
+        background-color: #d0d0d0;
+    }
+    QPushButton:disabled {
+        background-color: #f8f8f8;
+        color: #aaa;
+        border: 2px solid #e0e0e0;
+    }
+    QListWidget, QTextEdit, QPlainTextEdit, QLineEdit {
+        border: 1px solid #ccc;
+        border-radius: 4px;
+        padding: 5px;
+    }
+    QListWidget {
+        background-color: white;
+    }
+    QListWidget::item:alternate {
+        background-color: #f6f6f6;
+    }
+    QProgressBar {
+        border: 2px solid #ccc;
+        border-radius: 8px;
+        background-color: #f0f0f0;
+    }
+    QProgressBar::chunk {
+        background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
+            stop:0 #0078D7, stop:0.5 #0091FF, stop:1 #00B7FF);
+        border-radius: 6px;
+    }
+    QTabWidget::pane {
+        border: 1px solid #ccc;
+        background-color: #f9f9f9;
+    }
+    QTabBar::tab {
+        background-color: #e0e0e0;
+        color: #333;
+        padding: 8px 16px;
+        border: 1px solid #ccc;
+        border-bottom: none;
+        border-top-left-radius: 4px;
+        border-top-right-radius: 4px;
+    }
+    QTabBar::tab:selected {
+        background-color: #0078D7;
+        color: white;
+    }
+    QTabBar::tab:hover {
+        background-color: #d0d0d0;
+    }
+"""
 
 class ModernFlashTool(QMainWindow):
-    def __init__(self):
+    tools_refreshed = Signal(dict)
+    
+    def __init__(self, profile=None):
         super().__init__()
+        self.profile = profile or StartupProfile()
         self.settings = self.load_settings()
+        self.tool_registry = tool_registry()
+        self.tool_registry.refreshed.connect(self.tools_refreshed.emit)
+        self.tools_refreshed.connect(self.on_tools_refreshed)
         self.selected_directory = ""
         self.selected_device = ""
         self.device_type = ""
@@ -1088,52 +1574,46 @@ class ModernFlashTool(QMainWindow):
         self.fdl1_path = None
         self.fdl2_path = None
         self.pac_file_path = None
-        
-        # Setup system tray
-        self.setup_tray_icon()
-        
+        self.hash_cache = HashCache()
+        self.hash_worker = None
+        self.settings_dialog = None
+        self.applied_dark_mode = None
+        self.device_monitor = None
+        self.detect_requested = False
+        self.startup_finished = False
+        self.profile.mark("load settings")
+        
+        # Styling the empty window first polishes each widget once as it is created
+        self.apply_theme()
+        self.profile.mark("apply theme")
         self.init_ui()
         self.apply_theme()
-        
+        self.profile.mark("build widgets")
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.startup_finished:
+            # Tray icon and device detection wait until the first frame is on screen
+            self.startup_finished = True
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        self.profile.mark("first frame")
+        self.setup_tray_icon()
+        self.profile.mark("tray icon")
+        self.tool_registry.refresh(dict(self.settings))
         if self.settings.get("auto_detect", True):
-            QTimer.singleShot(1000, self.detect_devices)
+            self.detect_devices()
+        self.profile.report()
 
     def load_settings(self):
         settings = QSettings("FlashTool", "DeviceFlasher")
-        default_settings = {
-            "mtk_path": "mtk.py",
-            "edl_path": "edl.py",
-            "avb_path": "avbtool",
-            "flash_cmd": "--flash {partition} {file}",
-            "erase_cmd": "--erase {partition}",
-            "read_cmd": "--read {partition} {file}",
-            "patch_cmd": "patch_vbmeta --input {input} --output {output}",
-            "basic_frp_partitions": "frp,metadata,userdata",
-            "advanced_frp_partitions": "frp,metadata,userdata,persist",
-            "dark_mode": False,
-            "backup_enable": True,
-            "auto_detect": True,
-            # SPD Client
-            "spd_path": "spd.py",
-            "spd_flash_cmd": "writepart {partition} {file} --fdl1 {fdl1} --fdl2 {fdl2}",
-            "spd_erase_cmd": "erasepart {partition} --fdl1 {fdl1} --fdl2 {fdl2}",
-            "spd_read_cmd": "readpart {partition} {file} --fdl1 {fdl1} --fdl2 {fdl2}",
-            "spd_extract_cmd": "extractpac {pac_file}",
-            "spd_adv_frp_cmd": "writepart {partition} zero.bin --fdl1 {fdl1} --fdl2 {fdl2}",
-            # XYN Client
-            "xyn_path": "xyn_cli.py",
-            "xyn_flash_cmd": "write {partition} {file}",
-            "xyn_erase_cmd": "erase {partition} --force",
-            "xyn_read_cmd": "read {partition} {file}",
-            "xyn_detect_cmd": "detect",
-            "xyn_partitions_cmd": "partitions",
-            "xyn_adv_frp_cmd": "erase {partition} --force"
-        }
-        
         loaded_settings = {}
-        for key, default_value in default_settings.items():
+        for key, default_value in DEFAULT_SETTINGS.items():
             if isinstance(default_value, bool):
                 loaded_settings[key] = settings.value(key, default_value, type=bool)
+            elif isinstance(default_value, int):
+                loaded_settings[key] = settings.value(key, default_value, type=int)
             else:
                 loaded_settings[key] = settings.value(key, default_value)
                 
@@ -1230,7 +1710,11 @@ class ModernFlashTool(QMainWindow):
         self.browse_btn.clicked.connect(self.browse_directory)
         self.dir_label = QLabel("No directory selected")
         self.dir_label.setStyleSheet("color: #888; font-style: italic;")
+        self.archive_btn = QPushButton("🗜️ Open Archive")
+        self.archive_btn.setToolTip("Flash straight from a zip, tar, 7z or PAC file without extracting it")
+        self.archive_btn.clicked.connect(self.browse_archive)
         dir_top_layout.addWidget(self.browse_btn)
+        dir_top_layout.addWidget(self.archive_btn)
         dir_top_layout.addWidget(self.dir_label)
         dir_top_layout.addStretch()
         dir_layout.addLayout(dir_top_layout)
@@ -1298,9 +1782,8 @@ class ModernFlashTool(QMainWindow):
         log_tab = QWidget()
         log_layout = QVBoxLayout(log_tab)
         
-        self.log_text = QTextEdit()
+        self.log_text = LogView(int(self.settings.get("log_max_lines", 5000)))
         self.log_text.setFont(QFont("Consolas", 9))
-        self.log_text.setReadOnly(True)
         log_layout.addWidget(self.log_text)
         
         # Log controls
@@ -1353,7 +1836,7 @@ class ModernFlashTool(QMainWindow):
         # Validate tools action
         validate_action = QAction("✅ Validate Tools", self)
         validate_action.setToolTip("Validate Tools")
-        validate_action.triggered.connect(self.validate_tools)
+        validate_action.triggered.connect(lambda: self.validate_tools(recheck=True))
         toolbar.addAction(validate_action)
         
         toolbar.addSeparator()
@@ -1364,6 +1847,21 @@ class ModernFlashTool(QMainWindow):
         select_device_action.triggered.connect(self.select_device)
         toolbar.addAction(select_device_action)
         
+        station_action = QAction("🏭 Station Mode", self)
+        station_action.setToolTip("Flash all detected devices in parallel")
+        station_action.triggered.connect(self.show_station)
+        toolbar.addAction(station_action)
+        
+        catalog_action = QAction("🗂️ ROM Catalog", self)
+        catalog_action.setToolTip("Browse firmware found by the ROM scraper")
+        catalog_action.triggered.connect(self.show_rom_catalog)
+        toolbar.addAction(catalog_action)
+        
+        resume_action = QAction("⏩ Resume Job", self)
+        resume_action.setToolTip("Continue an interrupted flash from its first incomplete partition")
+        resume_action.triggered.connect(self.resume_job)
+        toolbar.addAction(resume_action)
+        
         toolbar.addSeparator()
         
         # Terminal actions
@@ -1384,12 +1882,16 @@ class ModernFlashTool(QMainWindow):
         self.log_terminal_tabs.setCurrentIndex(0)  # Switch to log tab
 
     def apply_theme(self):
-        if self.settings.get("dark_mode", False):
-            self.apply_dark_theme()
-            self.theme_action.setText("☀️ Light Mode")
-        else:
-            self.apply_light_theme()
-            self.theme_action.setText("🌙 Dark Mode")
+        dark_mode = self.settings.get("dark_mode", False)
+        # Re-applying an unchanged stylesheet re-polishes every widget
+        if dark_mode != self.applied_dark_mode:
+            if dark_mode:
+                self.apply_dark_theme()
+            else:
+                self.apply_light_theme()
+            self.applied_dark_mode = dark_mode
+        if hasattr(self, 'theme_action'):
+            self.theme_action.setText("☀️ Light Mode" if dark_mode else "🌙 Dark Mode")
 
     def apply_dark_theme(self):
         # Apply dark palette
@@ -1413,231 +1915,12 @@ class ModernFlashTool(QMainWindow):
         self.setPalette(dark_palette)
         
         # Enhanced dark stylesheet
-        dark_stylesheet = """
-            QMainWindow {
-                background-color: #1e1e1e;
-            }
-            QWidget {
-                background-color: #1e1e1e;
-                color: #ffffff;
-            }
-            QGroupBox {
-                font-weight: bold;
-                border: 2px solid #444;
-                border-radius: 8px;
-                margin-top: 1ex;
-                padding-top: 12px;
-                background-color: #2d2d2d;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 12px;
-                padding: 0 8px 0 8px;
-                color: #ffffff;
-                background-color: #2d2d2d;
-            }
-            QPushButton {
-                background-color: #404040;
-                border: 2px solid #555;
-                border-radius: 6px;
-                color: white;
-                padding: 8px 12px;
-                font-weight: bold;
-                min-width: 80px;
-            }
-            QPushButton:hover {
-                background-color: #4a4a4a;
-                border: 2px solid #666;
-            }
-            QPushButton:pressed {
-                background-color: #303030;
-            }
-            QPushButton:disabled {
-                background-color: #2a2a2a;
-                color: #666;
-                border: 2px solid #333;
-            }
-            QListWidget {
-                background-color: #252525;
-                color: white;
-                border: 1px solid #444;
-                border-radius: 4px;
-                outline: none;
-            }
-            QListWidget::item {
-                padding: 2px;
-                border-bottom: 1px solid #333;
-            }
-            QListWidget::item:selected {
-                background-color: #3a3a3a;
-            }
-            QListWidget::item:alternate {
-                background-color: #2a2a2a;
-            }
-            QTextEdit {
-                background-color: #1a1a1a;
-                color: #00ff00;
-                border: 1px solid #444;
-                border-radius: 4px;
-                font-family: Consolas, monospace;
-            }
-            QLineEdit {
-                background-color: #2b2b2b;
-                color: white;
-                border: 1px solid #555;
-                border-radius: 4px;
-                padding: 6px;
-                selection-background-color: #0078D7;
-            }
-            QLineEdit:focus {
-                border: 1px solid #0078D7;
-                background-color: #333333;
-            }
-            QLabel {
-                color: #ffffff;
-            }
-            QProgressBar {
-                border: 2px solid #444;
-                border-radius: 8px;
-                text-align: center;
-                background-color: #252525;
-                color: white;
-                font-weight: bold;
-            }
-            QProgressBar::chunk {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
-                    stop:0 #0078D7, stop:0.5 #0091FF, stop:1 #00B7FF);
-                border-radius: 6px;
-            }
-            QToolBar {
-                background-color: #2d2d2d;
-                border: none;
-                spacing: 5px;
-            }
-            QToolButton {
-                background-color: transparent;
-                border: 1px solid transparent;
-                border-radius: 4px;
-                padding: 5px;
-            }
-            QToolButton:hover {
-                background-color: #404040;
-                border: 1px solid #555;
-            }
-            QSplitter::handle {
-                background-color: #444;
-            }
-            QSplitter::handle:hover {
-                background-color: #555;
-            }
-            QStatusBar {
-                background-color: #2d2d2d;
-                color: #cccccc;
-            }
-            QTabWidget::pane {
-                border: 1px solid #444;
-                background-color: #2d2d2d;
-            }
-            QTabBar::tab {
-                background-color: #404040;
-                color: white;
-                padding: 8px 16px;
-                border: 1px solid #555;
-                border-bottom: none;
-                border-top-left-radius: 4px;
-                border-top-right-radius: 4px;
-            }
-            QTabBar::tab:selected {
-                background-color: #0078D7;
-                color: white;
-            }
-            QTabBar::tab:hover {
-                background-color: #4a4a4a;
-            }
-        """
-        self.setStyleSheet(dark_stylesheet)
+        self.setStyleSheet(DARK_STYLESHEET)
 
     def apply_light_theme(self):
         self.setPalette(self.style().standardPalette())
         
-        light_stylesheet = """
-            QGroupBox {
-                font-weight: bold;
-                border: 2px solid #ccc;
-                border-radius: 8px;
-                margin-top: 1ex;
-                padding-top: 12px;
-                background-color: #f9f9f9;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 12px;
-                padding: 0 8px 0 8px;
-                background-color: #f9f9f9;
-            }
-            QPushButton {
-                background-color: #f0f0f0;
-                border: 2px solid #ccc;
-                border-radius: 6px;
-                padding: 8px 12px;
-                font-weight: bold;
-                min-width: 80px;
-            }
-            QPushButton:hover {
-                background-color: #e0e0e0;
-                border: 2px solid #bbb;
-            }
-            QPushButton:pressed {
-                background-color: #d0d0d0;
-            }
-            QPushButton:disabled {
-                background-color: #f8f8f8;
-                color: #aaa;
-                border: 2px solid #e0e0e0;
-            }
-            QListWidget, QTextEdit, QLineEdit {
-                border: 1px solid #ccc;
-                border-radius: 4px;
-                padding: 5px;
-            }
-            QListWidget {
-                background-color: white;
-            }
-            QListWidget::item:alternate {
-                background-color: #f6f6f6;
-            }
-            QProgressBar {
-                border: 2px solid #ccc;
-                border-radius: 8px;
-                background-color: #f0f0f0;
-            }
-            QProgressBar::chunk {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
-                    stop:0 #0078D7, stop:0.5 #0091FF, stop:1 #00B7FF);
-                border-radius: 6px;
-            }
-            QTabWidget::pane {
-                border: 1px solid #ccc;
-                background-color: #f9f9f9;
-            }
-            QTabBar::tab {
-                background-color: #e0e0e0;
-                color: #333;
-                padding: 8px 16px;
-                border: 1px solid #ccc;
-                border-bottom: none;
-                border-top-left-radius: 4px;
-                border-top-right-radius: 4px;
-            }
-            QTabBar::tab:selected {
-                background-color: #0078D7;
-                color: white;
-            }
-            QTabBar::tab:hover {
-                background-color: #d0d0d0;
-            }
-        """
-        self.setStyleSheet(light_stylesheet)
+        self.setStyleSheet(LIGHT_STYLESHEET)
 
     def toggle_theme(self):
         self.settings["dark_mode"] = not self.settings.get("dark_mode", False)
@@ -1649,10 +1932,51 @@ class ModernFlashTool(QMainWindow):
         self.device_btn.setEnabled(False)
         self.device_info.setText("Scanning...")
         
-        self.detection_thread = DeviceDetectionThread(self.settings)
-        self.detection_thread.com_ports_signal.connect(self.on_devices_detected)
-        self.detection_thread.log_signal.connect(self.log_text.append)
-        self.detection_thread.start()
+        # The next scan result is reported like the old one-shot detection
+        self.detect_requested = True
+        if self.device_monitor is None:
+            self.start_device_monitor()
+        else:
+            self.device_monitor.rescan()
+
+    def start_device_monitor(self):
+        """Watch for ports coming and going for the rest of the session"""
+        self.device_monitor = DeviceMonitor(self)
+        self.device_monitor.port_added.connect(self.on_port_added)
+        self.device_monitor.port_removed.connect(self.on_port_removed)
+        self.device_monitor.ports_scanned.connect(self.on_ports_scanned)
+        self.device_monitor.log_signal.connect(self.log_text.append, Qt.DirectConnection)
+        self.device_monitor.start()
+
+    def on_ports_scanned(self, ports):
+        devices = [port_label(port) for port in ports]
+        if self.detect_requested:
+            self.detect_requested = False
+            self.log_text.append("🔍 Scanning for connected devices...")
+            for device in devices:
+                self.log_text.append(f"📡 Found: {device}")
+            self.on_devices_detected(devices)
+            return
+        self.available_devices = devices
+        if devices:
+            self.device_info.setText(f"✅ Found {len(devices)} device(s)\nClick 'Select Device' to choose")
+        else:
+            self.device_info.setText("❌ No devices found")
+
+    def on_port_added(self, port):
+        device = port_label(port)
+        self.log_text.append(f"🔌 Connected: {device}")
+        busy = self.current_flash_thread and self.current_flash_thread.isRunning()
+        selected_com = self.selected_device.split(' - ')[0] if self.selected_device else None
+        if selected_com == port["device"] and device != self.selected_device and not busy:
+            # Same port re-enumerated in another mode
+            self.selected_device = device
+            self.determine_device_type()
+        elif not self.selected_device and not self.detect_requested:
+            self.auto_select_device(device)
+
+    def on_port_removed(self, port):
+        self.log_text.append(f"⏏️ Disconnected: {port_label(port)}")
 
     def on_devices_detected(self, devices):
         self.available_devices = devices
@@ -1689,6 +2013,14 @@ class ModernFlashTool(QMainWindow):
             self.dir_label.setText(os.path.basename(directory))
             self.load_flash_files()
 
+    def browse_archive(self):
+        archive, _ = QFileDialog.getOpenFileName(self, "Select Firmware Archive", "",
+                                                 "Firmware archives (*.zip *.tar *.tgz *.tar.gz *.tar.xz *.tar.bz2 *.7z *.pac)")
+        if archive:
+            self.selected_directory = archive
+            self.dir_label.setText(os.path.basename(archive))
+            self.load_flash_files()
+
     def load_flash_files(self):
         self.file_list_widget.clear()
         self.flash_files = []
@@ -1696,27 +2028,97 @@ class ModernFlashTool(QMainWindow):
         if not self.selected_directory:
             return
         
-        img_files = glob.glob(os.path.join(self.selected_directory, "*.img"))
-        
-        if not img_files:
-            self.log_text.append("❌ No .img files found in selected directory")
-            QMessageBox.information(self, "No Files", "No .img files found in the selected directory.")
+        try:
+            index = index_firmware(self.selected_directory)
+        except Exception as e:
+            self.log_text.append(f"❌ Cannot read {os.path.basename(self.selected_directory)}: {str(e)}")
+            QMessageBox.warning(self, "Cannot Open", f"Cannot read {os.path.basename(self.selected_directory)}:\n{str(e)}")
+            return
+        if index["cached"]:
+            self.log_text.append("⚡ Using cached partition map")
+        
+        entries = index["partitions"]
+        missing = [entry for entry in entries if entry["missing"]]
+        for entry in missing:
+            self.log_text.append(f"⚠️ {entry['partition']}: {entry['file']} listed in {entry['source']} is missing")
+        entries = [entry for entry in entries if not entry["missing"]]
+        
+        if not entries:
+            self.log_text.append("❌ No flashable images found in selected directory")
+            QMessageBox.information(self, "No Files", "No flashable images found in the selected directory.")
             return
         
-        for img_file in img_files:
-            filename = os.path.basename(img_file)
-            partition_name = filename.replace('.img', '')
+        if index["layout"] != "images":
+            self.log_text.append(f"🗺️ Partition map from {index['layout']} layout")
+        
+        for entry in entries:
+            img_file = firmware_entry_path(self.selected_directory, entry)
             
             item = QListWidgetItem()
-            item_widget = FileListItemWidget(img_file, partition_name)
+            item_widget = FileListItemWidget(img_file, entry["partition"], entry.get("image_size"))
+            if entry.get("size"):
+                item_widget.setToolTip(f"{entry['file']}\nPartition size: {format_size(entry['size'])}")
             item.setSizeHint(item_widget.sizeHint())
             self.file_list_widget.addItem(item)
             self.file_list_widget.setItemWidget(item, item_widget)
             
             self.flash_files.append(item_widget)
         
-        self.log_text.append(f"✅ Loaded {len(img_files)} flash files")
+        self.log_text.append(f"✅ Loaded {len(entries)} flash files")
         self.update_buttons_state()
+        self.start_hashing()
+
+    def start_hashing(self):
+        """Hash the loaded files in the background and check them against any manifest"""
+        if self.hash_worker and self.hash_worker.isRunning():
+            self.hash_worker.stop()
+            self.hash_worker.file_hashed.disconnect()
+            
+        manifest = load_manifest(self.selected_directory)
+        if manifest:
+            self.log_text.append(f"🔒 Found checksums for {len(manifest)} files")
+            
+        self.hash_worker = HashWorker([w.file_path for w in self.flash_files], manifest, self.hash_cache, self)
+        self.hash_worker.file_hashed.connect(self.on_file_hashed)
+        self.hash_worker.log_signal.connect(self.log_text.append, Qt.DirectConnection)
+        self.hash_worker.start()
+
+    def on_file_hashed(self, file_path, status, digest):
+        for file_widget in self.flash_files:
+            if file_widget.file_path == file_path:
+                file_widget.set_hash_status(status, digest)
+        if status == "mismatch":
+            self.log_text.append(f"❌ Checksum mismatch: {os.path.basename(file_path)}")
+        elif status == "truncated":
+            self.log_text.append(f"❌ Truncated sparse image: {os.path.basename(file_path)}")
+
+    def check_integrity(self, selected_files):
+        """Refuse damaged images and confirm unverified ones. Returns True to continue."""
+        statuses = {w.file_path: w.hash_status for w in self.flash_files}
+        bad = [path for path, _ in selected_files if statuses.get(path) in ("mismatch", "truncated")]
+        if bad:
+            names = "\n".join(os.path.basename(path) for path in bad)
+            QMessageBox.critical(self, "Integrity Check Failed",
+                               f"These images do not match their checksum or are truncated:\n\n{names}")
+            return False
+            
+        unverified = []
+        for path, _ in selected_files:
+            # Journaled archive members are not in the file list when a job is resumed
+            status = statuses.get(path, "archived" if split_member_path(path)[1] is not None else "pending")
+            if status == "archived":
+                continue
+            # A file edited after hashing no longer matches its cached digest
+            if status == "pending" or self.hash_cache.lookup(path) is None:
+                unverified.append(path)
+        if unverified:
+            names = "\n".join(os.path.basename(path) for path in unverified)
+            reply = QMessageBox.warning(self, "Integrity Not Verified",
+                                      f"These images have not been verified yet or changed since hashing:\n\n{names}\n\n"
+                                      "Flash anyway?",
+                                      QMessageBox.Yes | QMessageBox.No)
+            return reply == QMessageBox.Yes
+        return True
 
     def select_device(self):
         if not hasattr(self, 'available_devices') or not self.available_devices:
@@ -1733,23 +2135,15 @@ class ModernFlashTool(QMainWindow):
             self.update_buttons_state()
             self.log_text.append(f"✅ Selected device: {device}")
 
+    def port_for(self, device):
+        """Port dict (VID/PID etc.) for a "PORT - description" string, if the monitor has seen it"""
+        if not self.device_monitor or not device:
+            return None
+        return self.device_monitor.table.get(device.split(' - ')[0])
+
     def determine_device_type(self):
-        device_lower = self.selected_device.lower()
-        if "qualcomm" in device_lower or "9008" in device_lower:
-            self.device_type = "qualcomm"
-            self.device_info.setText("📱 Qualcomm Device (EDL Mode)\nReady for flashing")
-        elif "mediatek" in device_lower or "mtk" in device_lower:
-            self.device_type = "mtk"
-            self.device_info.setText("📱 MediaTek Device\nReady for flashing")
-        elif "spreadtrum" in device_lower or "unisoc" in device_lower or "sprd" in device_lower:
-            self.device_type = "spreadtrum"
-            self.device_info.setText("📱 Spreadtrum/Unisoc Device\nFDL files required for flashing")
-        elif "xynos" in device_lower or "exynos" in device_lower or "samsung" in device_lower:
-            self.device_type = "xynos"
-            self.device_info.setText("📱 Exynos Device\nReady for flashing")
-        else:
-            self.device_type = "unknown"
-            self.device_info.setText("⚠️ Unknown Device Type\nProceed with caution")
+        self.device_type, info = classify_device(self.selected_device, self.port_for(self.selected_device))
+        self.device_info.setText(info)
 
     def update_buttons_state(self):
         has_device = bool(self.selected_device)
@@ -1770,20 +2164,18 @@ class ModernFlashTool(QMainWindow):
                 selected_files.append((file_widget.file_path, partition_name))
         return selected_files
 
-    def validate_tools(self):
+    def validate_tools(self, recheck=False):
+        """Report the registry's view of every tool; recheck stats them again first"""
         self.log_text.append("🔧 Validating tools...")
         
-        tools_to_check = [
-            (self.settings.get("mtk_path", "mtk.py"), "MediaTek Tool"),
-            (self.settings.get("edl_path", "edl.py"), "Qualcomm EDL Tool"),
-            (self.settings.get("avb_path", "avbtool"), "AVB Tool"),
-            (self.settings.get("spd_path", "spd.py"), "SPD Client"),
-            (self.settings.get("xyn_path", "xyn_cli.py"), "XYN Client")
-        ]
+        tools_to_check = [(self.settings.get(key, default), name)
+                          for key, (name, default) in TOOL_SETTINGS.items()]
         
         all_valid = True
         for tool_path, tool_name in tools_to_check:
-            valid, message = ToolValidator.validate_tool(tool_path, tool_name)
+            if recheck:
+                self.tool_registry.resolve(tool_path)
+            valid, message = self.tool_registry.validate(tool_path, tool_name)
             self.log_text.append(message)
             if not valid:
                 all_valid = False
@@ -1795,11 +2187,54 @@ class ModernFlashTool(QMainWindow):
         
         return all_valid
 
+    def on_tools_refreshed(self, settings):
+        missing = [name for key, (name, default) in TOOL_SETTINGS.items()
+                   if not self.tool_registry.exists(settings.get(key, default))]
+        if missing:
+            self.log_text.append(f"⚠️ Tools not found: {', '.join(missing)}")
+
+    def show_rom_catalog(self):
+        RomCatalogDialog(rom_catalog(), self).exec()
+
+    def show_station(self):
+        if not getattr(self, 'available_devices', None):
+            QMessageBox.warning(self, "No Devices", "No devices found. Please scan for devices first.")
+            return
+            
+        selected_files = self.get_selected_files()
+        if not selected_files:
+            QMessageBox.warning(self, "No Files", "Please select at least one file to flash!")
+            return
+        
+        if not self.check_integrity(selected_files):
+            return
+        
+        if not self.validate_tools():
+            QMessageBox.critical(self, "Tools Missing", "Required tools are not available. Please check settings.")
+            return
+        
+        # SPD ports all share the FDL/PAC selection of the main window
+        if any(classify_device(device, self.port_for(device))[0] == "spreadtrum" for device in self.available_devices):
+            if not self.setup_spd_operation():
+                return
+        
+        dialog = StationDialog(self.available_devices, selected_files, self.settings,
+                               self.fdl1_path, self.fdl2_path, self.pac_file_path,
+                               self.device_monitor.table if self.device_monitor else None, self)
+        dialog.finished.connect(lambda _: self.save_settings())
+        dialog.show()
+
     def show_settings(self):
-        dialog = SettingsDialog(self.settings, self)
-        if dialog.exec() == QDialog.Accepted:
+        # Built on first use and reused afterwards
+        if self.settings_dialog is None:
+            self.settings_dialog = SettingsDialog(self.settings, self)
+        else:
+            self.settings_dialog.load_settings()
+        if self.settings_dialog.exec() == QDialog.Accepted:
             self.save_settings()
             self.apply_theme()
+            self.log_text.set_max_lines(int(self.settings["log_max_lines"]))
+            self.tool_registry.refresh(dict(self.settings))
             self.log_text.append("✅ Settings updated")
 
     def setup_spd_operation(self):
@@ -1884,6 +2319,9 @@ class ModernFlashTool(QMainWindow):
             QMessageBox.warning(self, "No Files", "Please select at least one file to flash!")
             return
         
+        if not self.check_integrity(selected_files):
+            return
+        
         if not self.validate_tools():
             QMessageBox.critical(self, "Tools Missing", "Required tools are not available. Please check settings.")
             return
@@ -1906,6 +2344,8 @@ class ModernFlashTool(QMainWindow):
         
         self.log_text.append(f"🚀 Starting flash process on {com_port}...")
         self.current_flash_thread = FlashThread(self.device_type, selected_files, com_port, "flash", self.settings)
+        if self.settings.get("journal_enable", True):
+            self.current_flash_thread.set_journal(job_journal())
         
         # Set FDL files for SPD operations
         if self.device_type == "spreadtrum":
@@ -1918,6 +2358,60 @@ class ModernFlashTool(QMainWindow):
         
         self.set_operation_buttons(False)
 
+    def resume_job(self):
+        if self.current_flash_thread:
+            QMessageBox.warning(self, "Busy", "Wait for the current operation to finish first.")
+            return
+        jobs = job_journal().incomplete_jobs()
+        if not jobs:
+            QMessageBox.information(self, "Resume Job", "There are no interrupted flash jobs.")
+            return
+        
+        labels = [describe_job(job) for job in jobs]
+        label, ok = QInputDialog.getItem(self, "Resume Job", "Interrupted flash jobs:", labels, 0, False)
+        if not ok:
+            return
+        job = job_journal().get_job(jobs[labels.index(label)]["id"])
+        if job_journal().is_live(job):
+            QMessageBox.warning(self, "Resume Job", f"Job #{job['id']} is still running.")
+            return
+        
+        # A device that dropped off usually comes back on a new port
+        com_port = job["com_port"]
+        if self.selected_device:
+            device_type, _ = classify_device(self.selected_device, self.port_for(self.selected_device))
+            if device_type == job["device_type"]:
+                com_port = self.selected_device.split(' - ')[0]
+        
+        completed_steps = job_journal().completed_steps(job["id"])
+        remaining_files = [entry for i, entry in enumerate(job["files"]) if i not in completed_steps]
+        if not self.check_integrity(remaining_files):
+            return
+        remaining = len(remaining_files)
+        reply = QMessageBox.question(self, "Confirm Resume",
+                                   f"Resume job #{job['id']} on {com_port}?\n\n"
+                                   f"{remaining} of {len(job['files'])} partitions left to flash.",
+                                   QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        
+        self.device_type = job["device_type"]
+        if not self.validate_tools():
+            QMessageBox.critical(self, "Tools Missing", "Required tools are not available. Please check settings.")
+            return
+        
+        self.log_text.append(f"⏩ Resuming job #{job['id']} on {com_port}...")
+        self.current_flash_thread = FlashThread(job["device_type"], job["files"], com_port, "flash", self.settings)
+        self.current_flash_thread.set_journal(job_journal(), job["id"])
+        if job["device_type"] == "spreadtrum":
+            self.current_flash_thread.set_fdl_files(job["fdl1"], job["fdl2"])
+            if job["pac"]:
+                self.current_flash_thread.set_pac_file(job["pac"])
+        
+        self.connect_flash_thread()
+        self.current_flash_thread.start()
+        self.set_operation_buttons(False)
+
     def frp_erase(self):
         if not self.validate_tools():
             QMessageBox.critical(self, "Tools Missing", "Required tools are not available. Please check settings.")
@@ -1992,8 +2486,11 @@ class ModernFlashTool(QMainWindow):
         self.set_operation_buttons(False)
 
     def connect_flash_thread(self):
-        self.current_flash_thread.log_signal.connect(self.log_text.append)
+        if self.device_monitor:
+            self.current_flash_thread.set_device_table(self.device_monitor.table)
+        self.current_flash_thread.log_signal.connect(self.log_text.append, Qt.DirectConnection)
         self.current_flash_thread.progress_signal.connect(self.progress_bar.setValue)
+        self.current_flash_thread.transfer_signal.connect(self.progress_bar.set_transfer)
         self.current_flash_thread.finished_signal.connect(self.operation_finished)
         self.current_flash_thread.operation_started.connect(self.operation_started)
 
@@ -2004,6 +2501,7 @@ class ModernFlashTool(QMainWindow):
         self.stop_btn.setEnabled(True)
 
     def operation_finished(self, success, message):
+        self.progress_bar.clear_transfer()
         self.progress_bar.setVisible(False)
         self.set_operation_buttons(True)
         self.stop_btn.setEnabled(False)
@@ -2014,6 +2512,8 @@ class ModernFlashTool(QMainWindow):
             QMessageBox.information(self, "Success", message)
         else:
             self.log_text.append(f"❌ {message}")
+            if self.current_flash_thread and self.current_flash_thread.job_id:
+                self.log_text.append(f"💾 Job #{self.current_flash_thread.job_id} can be continued with ⏩ Resume Job")
             self.status_label.setText("Operation failed")
             QMessageBox.critical(self, "Error", message)
         
@@ -2035,6 +2535,7 @@ class ModernFlashTool(QMainWindow):
         self.frp_btn.setEnabled(enabled and bool(self.selected_device))
         self.adv_frp_btn.setEnabled(enabled and bool(self.selected_device))
         self.browse_btn.setEnabled(enabled)
+        self.archive_btn.setEnabled(enabled)
         self.device_btn.setEnabled(enabled)
 
     def closeEvent(self, event):
@@ -2042,6 +2543,10 @@ class ModernFlashTool(QMainWindow):
         if hasattr(self, 'terminal_widget'):
             self.terminal_widget.closeEvent(event)
         
+        if self.hash_worker and self.hash_worker.isRunning():
+            self.hash_worker.stop()
+            self.hash_worker.wait(2000)
+        
         # Close flash thread if running
         if self.current_flash_thread and self.current_flash_thread.isRunning():
             reply = QMessageBox.question(self, "Operation in Progress", 
@@ -2055,8 +2560,13 @@ class ModernFlashTool(QMainWindow):
                 event.ignore()
         else:
             event.accept()
+        
+        if event.isAccepted() and self.device_monitor:
+            self.device_monitor.stop()
 
 def main():
+    profile = StartupProfile("--startup-profile" in sys.argv)
+    profile.mark("imports")
     app = QApplication(sys.argv)
     app.setApplicationName("devtical Flash Tool")
     app.setApplicationVersion("3.1")
@@ -2067,8 +2577,9 @@ def main():
     
     # Set modern fusion style
     app.setStyle('Fusion')
+    profile.mark("QApplication")
     
-    window = ModernFlashTool()
+    window = ModernFlashTool(profile)
     window.show()
     
     sys.exit(app.exec())
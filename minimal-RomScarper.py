@@ -2,193 +2,341 @@
   maybe we gonna enhance this piece to include more firmware websites to create bulk link exifliration and integrate it with ffdm & devtical core later 
 """
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import argparse
+import asyncio
+import gzip
+import hashlib
+import json
 import os
+import queue
 import re
+import threading
 import time
 import sys
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
+from rom_catalog import ROM_CATALOG_PATH, RomCatalog
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml
+except ImportError:
+    lxml = None
+
+# Fastest first; BeautifulSoup with html.parser is always available
+HTML_BACKENDS = tuple(name for name, available in (("selectolax", HTMLParser), ("lxml", lxml),
+                                                    ("html.parser", True)) if available)
+PAGE_NUMBER = re.compile(r'/page/(\d+)\?s=')
+DRIVE_FILE_ID = re.compile(r'/file/d/([a-zA-Z0-9_-]+)')
+UNSAFE_FILE_CHARS = re.compile(r'[<>:"/\\|?*]')
+MEDIAFIRE_DOWNLOAD_PATTERNS = (
+    re.compile(r'<a class="input popsok" aria-label="Download file" href="([^"]+)"', re.IGNORECASE),
+    re.compile(r'download_link.*?href="([^"]+)"', re.IGNORECASE),
+    re.compile(r'href="(https://download[^"]+mediafire.com[^"]+)"', re.IGNORECASE),
+)
+# With BeautifulSoup only these parts of a page are built into a tree
+SEARCH_PAGE_STRAINER = SoupStrainer('div', attrs={'class': 'fa-grid-post-column-bg'})
+PAGINATION_STRAINER = SoupStrainer('a')
+MEDIAFIRE_STRAINER = SoupStrainer('a', attrs={'aria-label': 'Download file'})
+
+class HtmlPage:
+    """One parsed page behind a small CSS-selector interface.
+
+    Uses selectolax when installed, otherwise BeautifulSoup on lxml or
+    html.parser restricted to `only` (a SoupStrainer). Page-level values
+    such as the firmware file name are computed once per page.
+    """
+    def __init__(self, content, backend=HTML_BACKENDS[0], only=None):
+        self.backend = backend
+        self._file_name = None
+        if backend == "selectolax":
+            self.tree = HTMLParser(content)
+        else:
+            self.tree = BeautifulSoup(content, backend, parse_only=only)
+    
+    def select(self, selector, text=True):
+        """(attributes, text) of every element matching a CSS selector, in document order; text is None unless asked for"""
+        if self.backend == "selectolax":
+            return [(node.attributes, node.text(strip=True) if text else None) for node in self.tree.css(selector)]
+        return [(element.attrs, element.get_text(strip=True) if text else None)
+                for element in self.tree.select(selector)]
+    
+    def hrefs(self, selector, text=True):
+        """(href, text) of the elements matching selector that have an href"""
+        return [(attrs['href'], content) for attrs, content in self.select(selector, text)
+                if attrs.get('href') is not None]
+    
+    def file_name(self):
+        """Firmware file name for the downloads on this page, from its headings or <title>"""
+        if self._file_name is None:
+            self._file_name = "firmware_download.zip"
+            for _, text in self.select('div#article-block h2, div#article-block strong'):
+                if 'Stock Firmware' in text or 'Flash File' in text:
+                    self._file_name = f"{UNSAFE_FILE_CHARS.sub('_', text)}.zip"
+                    break
+            else:
+                titles = self.select('title')
+                if titles:
+                    self._file_name = f"{UNSAFE_FILE_CHARS.sub('_', titles[0][1])}.zip"
+        return self._file_name
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".devtical", "http-cache")
+CACHE_TTL = 12 * 3600
+
+class PageCache:
+    """gzip-compressed on-disk cache of HTML pages, keyed by URL.
+
+    Entries younger than ttl are served without a request. Older ones
+    are revalidated with If-None-Match / If-Modified-Since, so an
+    unchanged page only costs a 304.
+    """
+    def __init__(self, cache_dir=CACHE_DIR, ttl=CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.stats = {'fresh': 0, 'revalidated': 0, 'fetched': 0}
+    
+    def path(self, url):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + '.gz')
+    
+    def load(self, url):
+        """Cached entry (metadata dict with 'body' bytes) for url, or None"""
+        try:
+            with gzip.open(self.path(url), 'rb') as f:
+                header, _, body = f.read().partition(b'\n')
+            entry = json.loads(header)
+        except (OSError, ValueError, EOFError):
+            return None
+        if entry.get('url') != url:
+            return None
+        entry['body'] = body
+        return entry
+    
+    def is_fresh(self, entry):
+        return time.time() - entry['stored'] < self.ttl
+    
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def store(self, url, body, headers):
+        entry = {'url': url, 'stored': time.time(),
+                 'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}
+        self.write(entry, body)
+    
+    def refresh(self, entry):
+        """Restart the TTL of an entry the server confirmed with a 304"""
+        entry = dict(entry, stored=time.time())
+        self.write(entry, entry.pop('body'))
+    
+    def write(self, entry, body):
+        path = self.path(entry['url'])
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+                f.write(json.dumps(entry).encode('utf-8') + b'\n' + body)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing page cache: {e}")
+    
+    def summary(self):
+        return (f"{self.stats['fresh']} cached, {self.stats['revalidated']} not modified, "
+                f"{self.stats['fetched']} downloaded")
 
 class ROMScraper:
-    def __init__(self, base_delay=1):
+    def __init__(self, base_delay=1, cache=None, catalog=None, revisit=False, html_backend=None):
         self.session = requests.Session()
         self.base_delay = base_delay
+        self.html_backend = html_backend or HTML_BACKENDS[0]
+        self.cache = cache
+        self.catalog = catalog
+        self.revisit = revisit
+        self.last_request_cached = False
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
     
     def intelligent_delay(self):
         """Add delay to be respectful to the server"""
+        # Pages served from the cache did not touch the server
+        if self.last_request_cached:
+            self.last_request_cached = False
+            return
         time.sleep(self.base_delay)
     
+    def fetch_page(self, url, cached=True):
+        """HTML of url as bytes, through the page cache when one is set and cached is True"""
+        cache = self.cache if cached else None
+        entry = cache.load(url) if cache else None
+        if entry and self.cache.is_fresh(entry):
+            self.cache.stats['fresh'] += 1
+            self.last_request_cached = True
+            return entry['body']
+        
+        self.last_request_cached = False
+        response = self.session.get(url, headers=cache.conditional_headers(entry) if cache else None)
+        if entry and response.status_code == 304:
+            cache.stats['revalidated'] += 1
+            cache.refresh(entry)
+            return entry['body']
+        response.raise_for_status()
+        if cache:
+            cache.stats['fetched'] += 1
+            cache.store(url, response.content, response.headers)
+        return response.content
+    
     def get_max_page(self, brand):
         """Extract maximum page number from pagination"""
         url = f"https://firmwarefile.com/?s={brand}"
         try:
-            response = self.session.get(url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            last_page_element = soup.find('a', {'aria-label': 'Last Page'})
-            if last_page_element and 'href' in last_page_element.attrs:
-                last_page_url = last_page_element['href']
-                page_match = re.search(r'/page/(\d+)\?s=', last_page_url)
-                if page_match:
-                    return int(page_match.group(1))
-            
-            page_links = soup.select('a.page.larger, a.page')
-            page_numbers = []
-            for link in page_links:
-                if 'href' in link.attrs:
-                    page_match = re.search(r'/page/(\d+)\?s=', link['href'])
-                    if page_match:
-                        page_numbers.append(int(page_match.group(1)))
-            
-            return max(page_numbers) if page_numbers else 1
+            return self.parse_max_page(self.fetch_page(url))
             
         except Exception as e:
             print(f"Error getting max page for {brand}: {e}")
             return 1
     
+    def parse_max_page(self, content):
+        """Maximum page number from the pagination of a search results page"""
+        page = HtmlPage(content, self.html_backend, PAGINATION_STRAINER)
+        
+        for href, _ in page.hrefs('a[aria-label="Last Page"]', text=False)[:1]:
+            page_match = PAGE_NUMBER.search(href)
+            if page_match:
+                return int(page_match.group(1))
+        
+        page_numbers = []
+        for href, _ in page.hrefs('a.page.larger, a.page', text=False):
+            page_match = PAGE_NUMBER.search(href)
+            if page_match:
+                page_numbers.append(int(page_match.group(1)))
+        
+        return max(page_numbers) if page_numbers else 1
+    
     def extract_device_links(self, url):
         """Extract all device links from a search results page"""
-        device_links = []
         try:
-            response = self.session.get(url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            device_elements = soup.select('div.fa-grid-post-column-bg h3.fa-grid-post-heading a')
-            
-            for element in device_elements:
-                if 'href' in element.attrs:
-                    device_links.append({
-                        'url': element['href'],
-                        'name': element.get_text(strip=True)
-                    })
-            
-            return device_links
+            return self.parse_device_links(self.fetch_page(url))
             
         except Exception as e:
             print(f"Error extracting device links from {url}: {e}")
             return []
     
+    def parse_device_links(self, content):
+        """Device links from the content of a search results page"""
+        page = HtmlPage(content, self.html_backend, SEARCH_PAGE_STRAINER)
+        return [{'url': href, 'name': text}
+                for href, text in page.hrefs('div.fa-grid-post-column-bg h3.fa-grid-post-heading a')]
+    
     def extract_download_links(self, device_url):
-        """Extract Google Drive, MediaFire, and Mega.nz download links from device page"""
+        """Extract Google Drive, MediaFire, and Mega.nz download links from device page; None if it failed"""
         try:
-            response = self.session.get(device_url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            download_links = []
-            all_links = soup.find_all('a', href=True)
+            return self.parse_download_links(self.fetch_page(device_url), device_url)
             
-            for link in all_links:
-                href = link['href']
-                
-                # Google Drive links
-                if 'drive.google.com' in href and '/file/d/' in href:
-                    file_id_match = re.search(r'/file/d/([a-zA-Z0-9_-]+)', href)
-                    if file_id_match:
-                        file_id = file_id_match.group(1)
-                        direct_download = f"https://drive.google.com/uc?export=download&id={file_id}"
-                        
-                        file_name = self.extract_file_name(soup, link)
-                        
-                        download_links.append({
-                            'view_url': href,
-                            'download_url': direct_download,
-                            'file_name': file_name,
-                            'source': device_url,
-                            'type': 'google_drive'
-                        })
-                        
-                        print(f"URL: {href}")
-                
-                # MediaFire links
-                elif 'mediafire.com' in href:
-                    file_name = self.extract_file_name(soup, link)
+        except Exception as e:
+            print(f"Error extracting download links from {device_url}: {e}")
+            return None
+    
+    def parse_download_links(self, content, device_url):
+        """Google Drive, MediaFire and Mega.nz download links from the content of a device page"""
+        page = HtmlPage(content, self.html_backend)
+        
+        download_links = []
+        
+        for href, _ in page.hrefs('a', text=False):
+            # Google Drive links
+            if 'drive.google.com' in href and '/file/d/' in href:
+                file_id_match = DRIVE_FILE_ID.search(href)
+                if file_id_match:
+                    file_id = file_id_match.group(1)
+                    direct_download = f"https://drive.google.com/uc?export=download&id={file_id}"
                     
-                    download_links.append({
-                        'view_url': href,
-                        'download_url': href,  # MediaFire requires special handling
-                        'file_name': file_name,
-                        'source': device_url,
-                        'type': 'mediafire'
-                    })
-                    
-                    print(f"URL: {href}")
-                
-                # Mega.nz links
-                elif 'mega.nz' in href or 'mega.co.nz' in href:
-                    file_name = self.extract_file_name(soup, link)
+                    file_name = self.extract_file_name(page)
                     
                     download_links.append({
                         'view_url': href,
-                        'download_url': href,  # Mega.nz requires special handling
+                        'download_url': direct_download,
                         'file_name': file_name,
                         'source': device_url,
-                        'type': 'mega_nz'
+                        'type': 'google_drive'
                     })
                     
                     print(f"URL: {href}")
             
-            return download_links
+            # MediaFire links
+            elif 'mediafire.com' in href:
+                file_name = self.extract_file_name(page)
+                
+                download_links.append({
+                    'view_url': href,
+                    'download_url': href,  # MediaFire requires special handling
+                    'file_name': file_name,
+                    'source': device_url,
+                    'type': 'mediafire'
+                })
+                
+                print(f"URL: {href}")
             
-        except Exception as e:
-            print(f"Error extracting download links from {device_url}: {e}")
-            return []
+            # Mega.nz links
+            elif 'mega.nz' in href or 'mega.co.nz' in href:
+                file_name = self.extract_file_name(page)
+                
+                download_links.append({
+                    'view_url': href,
+                    'download_url': href,  # Mega.nz requires special handling
+                    'file_name': file_name,
+                    'source': device_url,
+                    'type': 'mega_nz'
+                })
+                
+                print(f"URL: {href}")
+        
+        return download_links
     
     def extract_mediafire_direct_url(self, mediafire_url):
         """Extract direct download URL from MediaFire page"""
         try:
-            response = self.session.get(mediafire_url)
-            response.raise_for_status()
-            
-            # Updated pattern for MediaFire HTML structure
-            download_patterns = [
-                r'<a class="input popsok" aria-label="Download file" href="([^"]+)"',
-                r'download_link.*?href="([^"]+)"',
-                r'href="(https://download[^"]+mediafire.com[^"]+)"'
-            ]
-            
-            for pattern in download_patterns:
-                match = re.search(pattern, response.text, re.IGNORECASE)
-                if match:
-                    return match.group(1)
-            
-            # Alternative approach using BeautifulSoup
-            soup = BeautifulSoup(response.content, 'html.parser')
-            download_button = soup.find('a', {'aria-label': 'Download file'})
-            if download_button and download_button.get('href'):
-                return download_button['href']
-                
-            print(f"Could not find direct download URL for MediaFire link: {mediafire_url}")
-            return None
+            # Direct links are tied to the visit, so a cached page would hand out an expired one
+            direct_url = self.parse_mediafire_direct_url(
+                self.fetch_page(mediafire_url, cached=False).decode('utf-8', 'replace'))
+            if not direct_url:
+                print(f"Could not find direct download URL for MediaFire link: {mediafire_url}")
+            return direct_url
             
         except Exception as e:
             print(f"Error extracting MediaFire direct URL: {e}")
             return None
     
-    def extract_file_name(self, soup, download_link):
-        """Extract appropriate filename from the page content"""
+    def parse_mediafire_direct_url(self, text):
+        """Direct download URL from the HTML of a MediaFire file page, or None"""
+        # Updated pattern for MediaFire HTML structure
+        for pattern in MEDIAFIRE_DOWNLOAD_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                return match.group(1)
+        
+        # Fall back to the download button, parsing nothing else of the page
+        page = HtmlPage(text, self.html_backend, MEDIAFIRE_STRAINER)
+        buttons = page.hrefs('a[aria-label="Download file"]', text=False)
+        return (buttons[0][0] or None) if buttons else None
+    
+    def extract_file_name(self, page):
+        """Extract appropriate filename from the page content (computed once per HtmlPage)"""
         try:
-            article_block = soup.find('div', id='article-block')
-            if article_block:
-                file_name_elements = article_block.find_all(['h2', 'strong'])
-                for element in file_name_elements:
-                    text = element.get_text(strip=True)
-                    if 'Stock Firmware' in text or 'Flash File' in text:
-                        clean_name = re.sub(r'[<>:"/\\|?*]', '_', text)
-                        return f"{clean_name}.zip"
-            
-            title = soup.find('title')
-            if title:
-                clean_name = re.sub(r'[<>:"/\\|?*]', '_', title.get_text(strip=True))
-                return f"{clean_name}.zip"
-                
-            return "firmware_download.zip"
+            return page.file_name()
             
         except Exception as e:
             print(f"Error extracting filename: {e}")
@@ -226,6 +374,7 @@ class ROMScraper:
         """Download from Google Drive"""
         try:
             response = self.session.get(download_info['download_url'], stream=True)
+            self.last_request_cached = False
             response.raise_for_status()
             
             # Handle Google Drive virus scan warning
@@ -257,8 +406,10 @@ class ROMScraper:
             direct_url = self.extract_mediafire_direct_url(download_info['view_url'])
             if not direct_url:
                 return False
+            download_info['direct_url'] = direct_url
             
             response = self.session.get(direct_url, stream=True)
+            self.last_request_cached = False
             response.raise_for_status()
             
             with open(file_path, 'wb') as f:
@@ -273,51 +424,484 @@ class ROMScraper:
             print(f"Error downloading MediaFire file: {e}")
             return False
     
-    def scrape_brand(self, brand, output_dir="downloads", max_pages=None):
-        """Main method to scrape all ROMs for a brand"""
-        all_devices = []
-        all_downloads = []
+    def iter_brand(self, brand, output_dir="downloads", max_pages=None, download=True):
+        """Crawl a brand as a generator of event dicts, downloading as links are found.
+
+        Events: "page" (search page done), "device" (device page done, with
+        "failed" set when it could not be loaded),
+        "link" (download link found) and, unless download is False,
+        "download" with its "success". Nothing is collected, so memory
+        stays flat however large the brand is.
         
+        With a catalog, devices visited on earlier runs and links already
+        downloaded are skipped, and a re-crawl stops paging at the first
+        page without new devices.
+        """
         if max_pages is None:
             max_pages = self.get_max_page(brand)
         
         print(f"Scraping {brand}, found {max_pages} pages")
+        stop_at_known = self.stops_at_known_devices(brand)
         
         for page in range(1, max_pages + 1):
-            if page == 1:
-                url = f"https://firmwarefile.com/?s={brand}"
-            else:
-                url = f"https://firmwarefile.com/page/{page}?s={brand}"
-            
+            url = self.search_url(brand, page)
             print(f"Scraping page {page}: {url}")
             devices = self.extract_device_links(url)
-            all_devices.extend(devices)
             self.intelligent_delay()
+            new_devices = self.new_devices(brand, devices)
+            yield {'event': 'page', 'url': url, 'devices': len(devices), 'new': len(new_devices)}
+            
+            for device in new_devices:
+                print(f"Processing: {device['name']}")
+                downloads = self.extract_download_links(device['url'])
+                self.intelligent_delay()
+                # A device whose page failed to load stays unvisited for the next run
+                if downloads is None:
+                    yield dict(device, event='device', links=0, failed=True)
+                    continue
+                if self.catalog:
+                    self.catalog.device_visited(device['url'], len(downloads))
+                yield dict(device, event='device', links=len(downloads))
+                
+                for download_info in downloads:
+                    key, status = self.catalog.add_link(download_info) if self.catalog else (None, 'new')
+                    yield dict(download_info, event='link', key=key, status=status)
+                    if download and status != 'done':
+                        success = self.download_file(download_info, output_dir)
+                        self.intelligent_delay()
+                        self.record_download(key, download_info, output_dir, success)
+                        yield dict(download_info, event='download', success=success)
+            
+            if stop_at_known and devices and not new_devices:
+                print(f"No new devices on page {page}, stopping (use --full to crawl every page)")
+                break
         
-        print(f"Found {len(all_devices)} devices, extracting download links...")
-        
-        for device in all_devices:
-            print(f"Processing: {device['name']}")
-            downloads = self.extract_download_links(device['url'])
-            all_downloads.extend(downloads)
-            self.intelligent_delay()
-        
-        print(f"Found {len(all_downloads)} download links, starting downloads...")
-        
-        successful_downloads = 0
-        for download in all_downloads:
-            if self.download_file(download, output_dir):
+        if self.catalog:
+            self.catalog.finish_crawl(brand, max_pages)
+    
+    def stops_at_known_devices(self, brand):
+        """Whether paging can stop at the first page without unvisited devices.
+
+        Search results carry no reliable per-device date, so "newer than
+        the last crawl" means "not visited before"; since results are
+        newest first, that holds once the brand has been crawled at all.
+        """
+        return bool(self.catalog) and not self.revisit and self.catalog.last_crawl(brand) is not None
+    
+    def new_devices(self, brand, devices):
+        """Devices whose pages were not visited on an earlier run (all of them without a catalog)"""
+        if not self.catalog:
+            return devices
+        return [device for device in devices if self.catalog.add_device(brand, device) or self.revisit]
+    
+    def record_download(self, key, download_info, output_dir, success):
+        if self.catalog:
+            self.catalog.finish_download(key, success, os.path.join(output_dir, download_info['file_name']),
+                                         download_info.get('direct_url'))
+    
+    def search_url(self, brand, page):
+        if page == 1:
+            return f"https://firmwarefile.com/?s={brand}"
+        return f"https://firmwarefile.com/page/{page}?s={brand}"
+    
+    def scrape_brand(self, brand, output_dir="downloads", max_pages=None):
+        """Main method to scrape all ROMs for a brand"""
+        devices_found = downloads_found = successful_downloads = 0
+        for event in self.iter_brand(brand, output_dir, max_pages):
+            if event['event'] == 'device':
+                devices_found += 1
+            elif event['event'] == 'link':
+                downloads_found += 1
+            elif event['event'] == 'download' and event['success']:
                 successful_downloads += 1
-            self.intelligent_delay()
         
-        print(f"Download completed: {successful_downloads}/{len(all_downloads)} files successful")
+        print(f"Download completed: {successful_downloads}/{downloads_found} files successful")
         
         return {
-            'devices_found': len(all_devices),
-            'downloads_found': len(all_downloads),
+            'devices_found': devices_found,
+            'downloads_found': downloads_found,
             'successful_downloads': successful_downloads
         }
 
+class TokenBucket:
+    """Allows `rate` requests per second with bursts of up to `capacity`"""
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class HostRateLimiter:
+    """One token bucket per host, so each server keeps the sequential scraper's request budget"""
+    def __init__(self, delay):
+        self.rate = 1.0 / delay if delay > 0 else 0
+        self.buckets = {}
+        self.loop = None
+    
+    async def wait(self, url):
+        # Bucket locks belong to one event loop, and every iter_brand() runs its own
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            self.loop = loop
+            self.buckets = {}
+        host = urlparse(url).hostname or ""
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate)
+        await self.buckets[host].acquire()
+
+# End of a stage's input in the crawl pipeline
+STAGE_DONE = object()
+
+class AsyncROMScraper(ROMScraper):
+    """ROMScraper on aiohttp: pages and downloads run in a bounded worker pool.
+
+    Requests to one host are spaced by base_delay like the sequential
+    scraper; requests to different hosts (firmwarefile.com,
+    drive.google.com, mediafire.com) overlap.
+    """
+    CHUNK_SIZE = 64 * 1024
+    
+    def __init__(self, base_delay=1, concurrency=8, queue_size=64, cache=None, catalog=None, revisit=False,
+                 html_backend=None):
+        super().__init__(base_delay, cache, catalog, revisit, html_backend)
+        self.concurrency = max(1, concurrency)
+        self.queue_size = queue_size
+        self.limiter = HostRateLimiter(base_delay)
+        self.http = None
+        # file path -> future with the result of the download in progress
+        self.in_flight = {}
+    
+    async def fetch(self, url, cached=True):
+        """HTML of url as bytes, from the page cache unless cached is False, after waiting for the host's rate limit"""
+        cache = self.cache if cached else None
+        entry = cache.load(url) if cache else None
+        if entry and cache.is_fresh(entry):
+            cache.stats['fresh'] += 1
+            return entry['body']
+        
+        await self.limiter.wait(url)
+        headers = cache.conditional_headers(entry) if cache else None
+        async with self.http.get(url, headers=headers) as response:
+            if entry and response.status == 304:
+                cache.stats['revalidated'] += 1
+                cache.refresh(entry)
+                return entry['body']
+            response.raise_for_status()
+            body = await response.read()
+        if cache:
+            cache.stats['fetched'] += 1
+            cache.store(url, body, response.headers)
+        return body
+    
+    async def run_pool(self, items, handler):
+        """Run handler on every item with at most `concurrency` in flight; results keep item order"""
+        queue = asyncio.Queue()
+        for index, item in enumerate(items):
+            queue.put_nowait((index, item))
+        results = [None] * len(items)
+        
+        async def worker():
+            while True:
+                try:
+                    index, item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                results[index] = await handler(item)
+        
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(items)))))
+        return results
+    
+    async def get_max_page_async(self, brand):
+        url = f"https://firmwarefile.com/?s={brand}"
+        try:
+            return self.parse_max_page(await self.fetch(url))
+        except Exception as e:
+            print(f"Error getting max page for {brand}: {e}")
+            return 1
+    
+    async def extract_device_links_async(self, url):
+        print(f"Scraping page: {url}")
+        try:
+            return self.parse_device_links(await self.fetch(url))
+        except Exception as e:
+            print(f"Error extracting device links from {url}: {e}")
+            return []
+    
+    async def extract_download_links_async(self, device):
+        print(f"Processing: {device['name']}")
+        try:
+            return self.parse_download_links(await self.fetch(device['url']), device['url'])
+        except Exception as e:
+            print(f"Error extracting download links from {device['url']}: {e}")
+            return None
+    
+    async def stream_to_file(self, response, file_path, first_chunk=b""):
+        # Written to a temporary name so an interrupted download is not taken as complete
+        tmp_path = file_path + ".part"
+        with open(tmp_path, 'wb') as f:
+            f.write(first_chunk)
+            async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                f.write(chunk)
+        os.replace(tmp_path, file_path)
+    
+    async def download_file_async(self, download_info, output_dir):
+        """Download a file based on its type.
+
+        Mirrors of one firmware share its file name: a link whose file is
+        already being downloaded waits for that download, and only tries
+        its own mirror if the other one failed.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        file_path = os.path.join(output_dir, download_info['file_name'])
+        
+        while file_path in self.in_flight:
+            if await asyncio.shield(self.in_flight[file_path]):
+                print(f"File already exists: {download_info['file_name']}")
+                return True
+        if os.path.exists(file_path):
+            print(f"File already exists: {download_info['file_name']}")
+            return True
+        
+        result = asyncio.get_running_loop().create_future()
+        self.in_flight[file_path] = result
+        success = False
+        try:
+            success = await self.fetch_file_async(download_info, file_path)
+            return success
+        finally:
+            del self.in_flight[file_path]
+            result.set_result(success)
+    
+    async def fetch_file_async(self, download_info, file_path):
+        try:
+            print(f"Downloading: {download_info['file_name']}")
+            
+            if download_info['type'] == 'google_drive':
+                url = download_info['download_url']
+            elif download_info['type'] == 'mediafire':
+                try:
+                    # Direct links are tied to the visit, so a cached page would hand out an expired one
+                    url = self.parse_mediafire_direct_url(
+                        (await self.fetch(download_info['view_url'], cached=False)).decode('utf-8', 'replace'))
+                except Exception as e:
+                    print(f"Error extracting MediaFire direct URL: {e}")
+                    return False
+                if not url:
+                    print(f"Could not find direct download URL for MediaFire link: {download_info['view_url']}")
+                    return False
+                download_info['direct_url'] = url
+            elif download_info['type'] == 'mega_nz':
+                print(f"Mega.nz download requires manual handling: {download_info['view_url']}")
+                return False
+            else:
+                print(f"Unknown download type: {download_info['type']}")
+                return False
+            
+            await self.limiter.wait(url)
+            async with self.http.get(url) as response:
+                response.raise_for_status()
+                first_chunk = await response.content.read(self.CHUNK_SIZE)
+                # Handle Google Drive virus scan warning
+                if download_info['type'] == 'google_drive' and response.content_type == 'text/html':
+                    page = first_chunk + await response.read()
+                    if b"Google Drive - Virus scan warning" in page:
+                        form = BeautifulSoup(page, 'html.parser').find('form')
+                        if form and 'action' in form.attrs:
+                            confirm_url = urljoin(url, form['action'])
+                            await self.limiter.wait(confirm_url)
+                            async with self.http.get(confirm_url) as confirmed:
+                                confirmed.raise_for_status()
+                                await self.stream_to_file(confirmed, file_path)
+                            print(f"Successfully downloaded: {download_info['file_name']}")
+                            return True
+                    first_chunk = page
+                await self.stream_to_file(response, file_path, first_chunk)
+            
+            print(f"Successfully downloaded: {download_info['file_name']}")
+            return True
+            
+        except Exception as e:
+            print(f"Error downloading {download_info['file_name']}: {e}")
+            return False
+    
+    def open_http(self):
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=120)
+        return aiohttp.ClientSession(headers=dict(self.session.headers), timeout=timeout)
+    
+    async def run_stage(self, inbox, handler, outbox):
+        """Feed items from inbox to `concurrency` handlers, then pass the end marker on to outbox"""
+        async def worker():
+            while True:
+                item = await inbox.get()
+                if item is STAGE_DONE:
+                    # Put it back for the other workers of this stage
+                    await inbox.put(STAGE_DONE)
+                    return
+                await handler(item)
+        
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        await outbox.put(STAGE_DONE)
+    
+    async def crawl(self, brand, output_dir="downloads", max_pages=None, download=True):
+        """Async generator with the same events as iter_brand().
+
+        Pagination, device pages and downloads run as concurrent stages
+        linked by bounded queues, so the first download starts as soon as
+        the first link is found and a slow consumer holds the crawl back
+        instead of letting results pile up.
+        """
+        own_http = self.http is None
+        if own_http:
+            self.http = self.open_http()
+        devices = asyncio.Queue(self.queue_size)
+        links = asyncio.Queue(self.queue_size)
+        events = asyncio.Queue(self.queue_size)
+        
+        async def crawl_pages():
+            pages = max_pages if max_pages is not None else await self.get_max_page_async(brand)
+            print(f"Scraping {brand}, found {pages} pages")
+            
+            async def scrape_page(page):
+                url = self.search_url(brand, page)
+                found = await self.extract_device_links_async(url)
+                new_devices = self.new_devices(brand, found)
+                for device in new_devices:
+                    await devices.put(device)
+                await events.put({'event': 'page', 'url': url, 'devices': len(found), 'new': len(new_devices)})
+                return bool(new_devices) or not found
+            
+            if self.stops_at_known_devices(brand):
+                # Newest devices come first, so paging in order can stop at the first known page
+                for page in range(1, pages + 1):
+                    if not await scrape_page(page):
+                        print(f"No new devices on page {page}, stopping (use --full to crawl every page)")
+                        break
+            else:
+                await self.run_pool(range(1, pages + 1), scrape_page)
+            if self.catalog:
+                self.catalog.finish_crawl(brand, pages)
+            await devices.put(STAGE_DONE)
+        
+        async def scrape_device(device):
+            found = await self.extract_download_links_async(device)
+            # A device whose page failed to load stays unvisited for the next run
+            if found is None:
+                await events.put(dict(device, event='device', links=0, failed=True))
+                return
+            if self.catalog:
+                self.catalog.device_visited(device['url'], len(found))
+            await events.put(dict(device, event='device', links=len(found)))
+            for download_info in found:
+                key, status = self.catalog.add_link(download_info) if self.catalog else (None, 'new')
+                await events.put(dict(download_info, event='link', key=key, status=status))
+                if download and status != 'done':
+                    await links.put((key, download_info))
+        
+        async def download_link(item):
+            key, download_info = item
+            success = await self.download_file_async(download_info, output_dir)
+            # Hashing a multi-GB download would stall every other fetch on the loop
+            await asyncio.to_thread(self.record_download, key, download_info, output_dir, success)
+            await events.put(dict(download_info, event='download', success=success))
+        
+        stages = [asyncio.ensure_future(crawl_pages()),
+                  asyncio.ensure_future(self.run_stage(devices, scrape_device, links if download else events))]
+        if download:
+            stages.append(asyncio.ensure_future(self.run_stage(links, download_link, events)))
+        try:
+            while True:
+                getter = asyncio.ensure_future(events.get())
+                # A crashed stage would otherwise leave the consumer waiting forever
+                await asyncio.wait([getter] + stages, return_when=asyncio.FIRST_COMPLETED)
+                failed = next((stage for stage in stages if stage.done() and stage.exception()), None)
+                if failed:
+                    getter.cancel()
+                    raise failed.exception()
+                event = await getter
+                if event is STAGE_DONE:
+                    break
+                yield event
+        finally:
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            if own_http:
+                await self.http.close()
+                self.http = None
+    
+    def iter_brand(self, brand, output_dir="downloads", max_pages=None, download=True):
+        """crawl() as a plain generator: the event loop runs in a worker thread.
+
+        Safe to consume from any thread (a GUI worker, a download manager);
+        closing the generator early cancels the crawl's stages right away.
+        """
+        handoff = queue.Queue(self.queue_size)
+        stop = threading.Event()
+        running = {}
+        
+        def hand_over(item):
+            while not stop.is_set():
+                try:
+                    handoff.put(item, timeout=0.2)
+                    return
+                except queue.Full:
+                    pass
+        
+        async def pump():
+            running['loop'], running['task'] = asyncio.get_running_loop(), asyncio.current_task()
+            # Closed before the loop was up: nothing to cancel from outside
+            if stop.is_set():
+                return
+            agen = self.crawl(brand, output_dir, max_pages, download)
+            try:
+                async for event in agen:
+                    await asyncio.to_thread(hand_over, event)
+                    if stop.is_set():
+                        break
+            finally:
+                await agen.aclose()
+        
+        def run():
+            try:
+                asyncio.run(pump())
+                hand_over(STAGE_DONE)
+            except BaseException as e:
+                hand_over(e)
+        
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = handoff.get()
+                if item is STAGE_DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            if 'task' in running:
+                try:
+                    running['loop'].call_soon_threadsafe(running['task'].cancel)
+                except RuntimeError:
+                    # The loop already finished
+                    pass
+            thread.join(timeout=5)
+
 def main():
     parser = argparse.ArgumentParser(description='ROM File Auto-Downloader')
     parser.add_argument('brand', help='Device brand to search for (e.g., realme)')
@@ -326,11 +910,48 @@ def main():
     parser.add_argument('-p', '--pages', type=int, 
                        help='Maximum pages to scrape (auto-detected if not specified)')
     parser.add_argument('-d', '--delay', type=float, default=1,
-                       help='Delay between requests in seconds')
+                       help='Delay between requests to the same host in seconds')
+    parser.add_argument('-c', '--concurrency', type=int, default=8,
+                       help='Requests in flight at once with the async engine (default: 8)')
+    parser.add_argument('--sync', action='store_true',
+                       help='Fetch one request at a time with requests instead of aiohttp')
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                       help=f'Where search and device pages are cached (default: {CACHE_DIR})')
+    parser.add_argument('--cache-ttl', type=float, default=CACHE_TTL / 3600,
+                       help='Hours a cached page is used without asking the server (default: 12)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Fetch every page from the server')
+    parser.add_argument('--html-parser', choices=HTML_BACKENDS, default=HTML_BACKENDS[0],
+                       help=f'HTML parsing backend (default: {HTML_BACKENDS[0]}; pip install selectolax or lxml '
+                            'for faster parsing)')
+    parser.add_argument('--catalog', default=ROM_CATALOG_PATH,
+                       help=f'Crawl state database shared with the GUI (default: {ROM_CATALOG_PATH})')
+    parser.add_argument('--no-catalog', action='store_true',
+                       help='Keep no crawl state; every device page is visited again')
+    parser.add_argument('--full', action='store_true',
+                       help='Visit every page and device again, still skipping completed downloads')
+    parser.add_argument('--list', nargs='?', const='', metavar='TEXT',
+                       help='Print catalogued links of the brand matching TEXT instead of crawling')
     
     args = parser.parse_args()
     
-    scraper = ROMScraper(base_delay=args.delay)
+    catalog = None if args.no_catalog else RomCatalog(args.catalog)
+    if args.list is not None:
+        if not catalog:
+            sys.exit("--list needs the catalog")
+        for row in catalog.search(args.list, brand=args.brand):
+            print(f"[{row['status']}] {row['device'] or row['device_url']}: {row['file_name']} {row['view_url']}")
+        return
+    
+    cache = None if args.no_cache else PageCache(args.cache_dir, args.cache_ttl * 3600)
+    if args.sync or aiohttp is None:
+        if not args.sync:
+            print("aiohttp is not installed, fetching sequentially (pip install aiohttp for concurrent scraping)")
+        scraper = ROMScraper(base_delay=args.delay, cache=cache, catalog=catalog, revisit=args.full,
+                             html_backend=args.html_parser)
+    else:
+        scraper = AsyncROMScraper(base_delay=args.delay, concurrency=args.concurrency, cache=cache,
+                                  catalog=catalog, revisit=args.full, html_backend=args.html_parser)
     results = scraper.scrape_brand(args.brand, args.output, args.pages)
     
     print("\n=== Summary ===")
@@ -339,6 +960,11 @@ def main():
     print(f"Download links found: {results['downloads_found']}")
     print(f"Successful downloads: {results['successful_downloads']}")
     print(f"Files saved to: {args.output}")
+    if cache:
+        print(f"Pages: {cache.summary()}")
+    if catalog:
+        print(f"Catalog: {catalog.summary()}")
+        catalog.close()
 
 if __name__ == "__main__":
     main()
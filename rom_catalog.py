@@ -0,0 +1,175 @@
+"""ROM catalog: what the firmware scraper (minimal-RomScarper.py) has seen and
+downloaded, kept across runs in SQLite and browsed from the GUI (main.py).
+
+Only the standard library is used, so the scraper does not pull in the
+flashing core to record its crawl state.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+HASH_READ_SIZE = 8 * 1024 * 1024
+
+ROM_CATALOG_PATH = os.path.join(os.path.expanduser("~"), ".devtical", "roms.sqlite")
+ROM_CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS brands (
+    name TEXT PRIMARY KEY,
+    last_crawl REAL, pages INTEGER
+);
+CREATE TABLE IF NOT EXISTS devices (
+    url TEXT PRIMARY KEY,
+    brand TEXT, name TEXT,
+    first_seen REAL, visited REAL, links INTEGER
+);
+CREATE TABLE IF NOT EXISTS links (
+    key TEXT PRIMARY KEY,
+    device_url TEXT, type TEXT,
+    view_url TEXT, download_url TEXT, direct_url TEXT,
+    file_name TEXT, path TEXT, size INTEGER, sha256 TEXT,
+    status TEXT, attempts INTEGER DEFAULT 0,
+    first_seen REAL, updated REAL
+);
+CREATE INDEX IF NOT EXISTS devices_brand ON devices (brand);
+CREATE INDEX IF NOT EXISTS links_device ON links (device_url);
+"""
+ROM_LINK_STATUSES = ("new", "done", "failed", "manual")
+DRIVE_FILE_ID = re.compile(r"/file/d/([a-zA-Z0-9_-]+)|[?&]id=([a-zA-Z0-9_-]+)")
+MEDIAFIRE_KEY = re.compile(r"mediafire\.com/(?:file|download|view)/([a-zA-Z0-9]+)")
+MEGA_KEY = re.compile(r"mega(?:\.co)?\.nz/(?:file/|#!)([a-zA-Z0-9_-]+)")
+
+def sha256_file(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_READ_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def rom_link_key(link):
+    """Stable identity of a scraped download link: the Drive file ID, MediaFire key or Mega handle"""
+    url = link.get("view_url") or link.get("download_url") or ""
+    for kind, pattern in (("gdrive", DRIVE_FILE_ID), ("mediafire", MEDIAFIRE_KEY), ("mega", MEGA_KEY)):
+        match = pattern.search(url)
+        if match:
+            return f"{kind}:{next(group for group in match.groups() if group)}"
+    return f"url:{url}"
+
+class RomCatalog:
+    """What the ROM scraper has seen and downloaded, kept across runs in SQLite.
+
+    Devices are visited once and links are keyed on their file ID, so a
+    re-crawl only opens new device pages and only fetches links that
+    never completed. The GUI reads the same database with search().
+    """
+    def __init__(self, db_path=ROM_CATALOG_PATH):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self.db.row_factory = sqlite3.Row
+        with self.lock, self.db:
+            if db_path != ":memory:":
+                self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(ROM_CATALOG_SCHEMA)
+
+    def last_crawl(self, brand):
+        with self.lock:
+            row = self.db.execute("SELECT last_crawl FROM brands WHERE name = ?", (brand,)).fetchone()
+        return row["last_crawl"] if row else None
+
+    def finish_crawl(self, brand, pages):
+        with self.lock, self.db:
+            self.db.execute("INSERT INTO brands (name, last_crawl, pages) VALUES (?, ?, ?) "
+                            "ON CONFLICT(name) DO UPDATE SET last_crawl = excluded.last_crawl, pages = excluded.pages",
+                            (brand, time.time(), pages))
+
+    def add_device(self, brand, device):
+        """Record a device from a search page; True if its page still has to be visited"""
+        with self.lock, self.db:
+            self.db.execute("INSERT OR IGNORE INTO devices (url, brand, name, first_seen) VALUES (?, ?, ?, ?)",
+                            (device["url"], brand, device.get("name"), time.time()))
+            row = self.db.execute("SELECT visited FROM devices WHERE url = ?", (device["url"],)).fetchone()
+        return row["visited"] is None
+
+    def device_visited(self, url, links):
+        with self.lock, self.db:
+            self.db.execute("UPDATE devices SET visited = ?, links = ? WHERE url = ?", (time.time(), links, url))
+
+    def add_link(self, link):
+        """Record a download link; returns its key and status ("new" for unseen links, "done" if on disk)"""
+        key = rom_link_key(link)
+        now = time.time()
+        status = "manual" if link.get("type") == "mega_nz" else "new"
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR IGNORE INTO links (key, device_url, type, view_url, download_url, file_name, status, "
+                "first_seen, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, link.get("source"), link.get("type"), link.get("view_url"), link.get("download_url"),
+                 link.get("file_name"), status, now, now))
+            row = self.db.execute("SELECT status, path FROM links WHERE key = ?", (key,)).fetchone()
+        # A completed file that was since deleted is fetched again
+        if row["status"] == "done" and not (row["path"] and os.path.exists(row["path"])):
+            return key, "new"
+        return key, row["status"]
+
+    def finish_download(self, key, success, path=None, direct_url=None):
+        """Record a download attempt; a finished file gets its size and sha256, Mega links stay "manual" """
+        size = digest = None
+        if success and path and os.path.isfile(path):
+            size = os.path.getsize(path)
+            digest = sha256_file(path)
+        with self.lock, self.db:
+            self.db.execute(
+                "UPDATE links SET status = CASE WHEN ? THEN 'done' WHEN status = 'manual' THEN 'manual' "
+                "ELSE 'failed' END, path = COALESCE(?, path), size = COALESCE(?, size), "
+                "sha256 = COALESCE(?, sha256), direct_url = COALESCE(?, direct_url), "
+                "attempts = attempts + 1, updated = ? WHERE key = ?",
+                (bool(success), path if success else None, size, digest, direct_url, time.time(), key))
+
+    def search(self, text="", status=None, brand=None, limit=500):
+        """Links joined with their device, newest first, filtered by text (device or file name), status and brand"""
+        query = ("SELECT links.*, devices.name AS device, devices.brand AS brand FROM links "
+                 "LEFT JOIN devices ON devices.url = links.device_url WHERE 1 = 1")
+        params = []
+        if text:
+            query += " AND (devices.name LIKE ? OR links.file_name LIKE ?)"
+            params += [f"%{text}%", f"%{text}%"]
+        if status:
+            query += " AND links.status = ?"
+            params.append(status)
+        if brand:
+            query += " AND devices.brand = ?"
+            params.append(brand)
+        query += " ORDER BY links.first_seen DESC LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            return [dict(row) for row in self.db.execute(query, params).fetchall()]
+
+    def brands(self):
+        with self.lock:
+            return [dict(row) for row in self.db.execute("SELECT * FROM brands ORDER BY name").fetchall()]
+
+    def summary(self):
+        """Counts of brands, devices and links per status"""
+        with self.lock:
+            counts = {"brands": self.db.execute("SELECT COUNT(*) FROM brands").fetchone()[0],
+                      "devices": self.db.execute("SELECT COUNT(*) FROM devices").fetchone()[0]}
+            for row in self.db.execute("SELECT status, COUNT(*) AS n FROM links GROUP BY status"):
+                counts[row["status"]] = row["n"]
+        return counts
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+_rom_catalog = None
+
+def rom_catalog():
+    """Shared RomCatalog, opened on first use"""
+    global _rom_catalog
+    if _rom_catalog is None:
+        _rom_catalog = RomCatalog()
+    return _rom_catalog